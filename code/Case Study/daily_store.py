@@ -0,0 +1,297 @@
+"""daily_store module: contains the DailyStore class.
+
+After parse_line() the case study keeps only each month's max, min and
+mean, so the daily values are gone, and storing every day as a SQLite row
+would take far more space than the .dly file itself. A DailyStore keeps
+the 31 daily values of every month in one compressed file per station and
+element:
+
+    <root>/<element>/<station>.tsd
+
+Each file holds the station's months in blocks of BLOCK_MONTHS. In a block
+the values are integers in tenths, as in the .dly file, stored as:
+
+    month numbers       deltas from the previous month (almost all 1)
+    validity bitmap     one bit per day, 0 for MISSING
+    values              the valid values only, as deltas from the
+                        previous one, high and low bytes split apart
+
+all compressed together with zstd (if the zstandard package is installed)
+or zlib. An index at the end of the file gives every block's months and
+the lowest and highest value in it, so reads skip the blocks outside the
+months asked for, and find() skips the blocks that can't hold a value
+above or below a limit. Blocks decode straight into NumPy arrays, in the
+RECORD_DTYPE layout parse_dly() uses:
+
+    store = DailyStore('daily')
+    store.write_dly(open('USC00110338.dly', 'rb').read())
+    records = store.read('USC00110338', 'TMAX', start=(1990, 1))
+"""
+
+import os
+import struct
+import zlib
+
+import numpy as np
+
+from ghcn_dly import DAYS, MISSING, RECORD_DTYPE, parse_dly
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+BLOCK_MONTHS = 120
+MAGIC = b'TSD1'
+ZLIB, ZSTD = 0, 1
+ZLIB_LEVEL = 9
+ZSTD_LEVEL = 9
+
+INDEX_DTYPE = np.dtype([('offset', '<u8'), ('length', '<u4'),
+                        ('first', '<i4'), ('last', '<i4'),
+                        ('months', '<u4'), ('valid', '<u4'),
+                        ('min', '<i2'), ('max', '<i2')])
+_HEADER = struct.Struct('<4sB3x')
+_FOOTER = struct.Struct('<QI4s')
+
+
+def month_number(year, month):
+    """Return the number of a month counting from January of year 0."""
+    return year * 12 + month - 1
+
+
+def _compress(data, codec):
+    if codec == ZSTD:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return zlib.compress(data, ZLIB_LEVEL)
+
+
+def _decompress(data, codec):
+    if codec == ZSTD:
+        if zstandard is None:
+            raise ValueError("file is zstd compressed and zstandard isn't "
+                             "installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def _encode_block(months, values):
+    """Return the uncompressed bytes of a block and its min and max."""
+    valid = values != MISSING
+    kept = values[valid]
+    month_deltas = np.diff(months, prepend=months[0]).astype('<i2')
+    # int16 arithmetic wraps, so the deltas decode exactly with cumsum.
+    deltas = np.diff(kept, prepend=np.int16(0)).astype('<i2')
+    shuffled = deltas.view(np.uint8).reshape(-1, 2).T
+    data = (month_deltas.tobytes() + np.packbits(valid).tobytes()
+            + shuffled.tobytes())
+    if len(kept):
+        return data, int(kept.min()), int(kept.max())
+    return data, np.iinfo(np.int16).max, np.iinfo(np.int16).min
+
+
+def _decode_block(data, entry):
+    """Return (month numbers, values) of a decompressed block."""
+    months, valid_count = int(entry['months']), int(entry['valid'])
+    position = 2 * months
+    month_numbers = (np.cumsum(np.frombuffer(data[:position], '<i2'),
+                               dtype=np.int32) + entry['first'])
+    days = months * DAYS
+    bitmap_length = (days + 7) // 8
+    valid = np.unpackbits(np.frombuffer(data, np.uint8, bitmap_length,
+                                        position), count=days).astype(bool)
+    position += bitmap_length
+    planes = np.frombuffer(data, np.uint8, 2 * valid_count, position)
+    deltas = planes.reshape(2, -1).T.copy().view('<i2').ravel()
+    values = np.full(days, MISSING, dtype=np.int16)
+    values[valid] = np.cumsum(deltas, dtype=np.int16)
+    return month_numbers, values.reshape(months, DAYS)
+
+
+class DailyStore:
+    """Compressed daily values by station and element.
+
+    Args:
+        root: Directory of the store, created if needed.
+        codec: ZSTD or ZLIB for new files (default: ZSTD if the
+            zstandard package is installed).
+        block_months: Months per block in new files.
+    """
+    def __init__(self, root="daily", codec=None, block_months=BLOCK_MONTHS):
+        self.root = root
+        if codec is None:
+            codec = ZSTD if zstandard is not None else ZLIB
+        if codec == ZSTD and zstandard is None:
+            raise ValueError("zstd needs the zstandard package")
+        self.codec = codec
+        self.block_months = block_months
+
+    def path(self, station, element):
+        return os.path.join(self.root, element, f"{station}.tsd")
+
+    # ---- writing -------------------------------------------------------------
+
+    def write(self, records):
+        """Store RECORD_DTYPE records, replacing the files of every
+        station and element among them.
+
+        Returns:
+            The number of files written.
+        """
+        keys = np.unique(records[['station', 'element']])
+        for station, element in keys.tolist():
+            mine = records[(records['station'] == station)
+                           & (records['element'] == element)]
+            self._write_series(station.decode(), element.decode(), mine)
+        return len(keys)
+
+    def write_dly(self, data):
+        """Parse the bytes of a .dly file and store its daily values."""
+        return self.write(parse_dly(data))
+
+    def _write_series(self, station, element, records):
+        months = month_number(records['year'].astype(np.int32),
+                              records['month'].astype(np.int32))
+        order = np.argsort(months, kind='stable')
+        months, values = months[order], records['values'][order]
+        path = self.path(station, element)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        index = np.zeros((len(months) + self.block_months - 1)
+                         // self.block_months, dtype=INDEX_DTYPE)
+        with open(path + '.tmp', 'wb') as outfile:
+            outfile.write(_HEADER.pack(MAGIC, self.codec))
+            for block, start in enumerate(range(0, len(months),
+                                                self.block_months)):
+                block_months = months[start:start + self.block_months]
+                block_values = values[start:start + self.block_months]
+                data, low, high = _encode_block(block_months, block_values)
+                data = _compress(data, self.codec)
+                index[block] = (outfile.tell(), len(data), block_months[0],
+                                block_months[-1], len(block_months),
+                                (block_values != MISSING).sum(), low, high)
+                outfile.write(data)
+            index_offset = outfile.tell()
+            outfile.write(index.tobytes())
+            outfile.write(_FOOTER.pack(index_offset, len(index), MAGIC))
+        os.replace(path + '.tmp', path)
+
+    # ---- reading -------------------------------------------------------------
+
+    def _open(self, station, element):
+        """Return (file contents, codec, block index) for a series."""
+        with open(self.path(station, element), 'rb') as infile:
+            data = infile.read()
+        magic, codec = _HEADER.unpack_from(data)
+        index_offset, blocks, end_magic = _FOOTER.unpack_from(
+            data, len(data) - _FOOTER.size)
+        if magic != MAGIC or end_magic != MAGIC:
+            raise ValueError(f"{self.path(station, element)} isn't a "
+                             "DailyStore file")
+        index = np.frombuffer(data, INDEX_DTYPE, blocks, index_offset)
+        return data, codec, index
+
+    def _records(self, station, element, blocks):
+        """Decode (data, codec, entry) blocks into one RECORD_DTYPE array."""
+        parts = []
+        for data, codec, entry in blocks:
+            offset = int(entry['offset'])
+            block = _decompress(data[offset:offset + int(entry['length'])],
+                                codec)
+            parts.append(_decode_block(block, entry))
+        months = np.concatenate([m for m, _ in parts]) if parts else []
+        records = np.zeros(len(months), dtype=RECORD_DTYPE)
+        records['station'] = station
+        records['element'] = element
+        if parts:
+            records['year'], records['month'] = np.divmod(months, 12)
+            records['month'] += 1
+            records['values'] = np.concatenate([v for _, v in parts])
+        return records
+
+    def read(self, station, element, start=None, end=None):
+        """Return a station's daily values for an element as RECORD_DTYPE
+        records, one per month, oldest first.
+
+        Args:
+            start, end: Optional (year, month) of the first and last
+                month to return; blocks outside them aren't decoded.
+
+        Raises:
+            FileNotFoundError: If the store has no such series.
+        """
+        data, codec, index = self._open(station, element)
+        first = month_number(*start) if start else -2 ** 31
+        last = month_number(*end) if end else 2 ** 31 - 1
+        wanted = (index['last'] >= first) & (index['first'] <= last)
+        records = self._records(station, element,
+                                [(data, codec, entry)
+                                 for entry in index[wanted]])
+        months = month_number(records['year'].astype(np.int32),
+                              records['month'].astype(np.int32))
+        return records[(months >= first) & (months <= last)]
+
+    def stations(self, element):
+        """Return the stations stored for an element."""
+        directory = os.path.join(self.root, element)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name[:-4] for name in os.listdir(directory)
+                      if name.endswith('.tsd'))
+
+    def find(self, element, above=None, below=None, stations=None):
+        """Yield (station, records) for the months with a day above (or
+        below) a value in tenths, e.g. find('TMAX', above=350) for days
+        over 35 C. Blocks whose min and max rule them out aren't decoded.
+        """
+        for station in stations or self.stations(element):
+            data, codec, index = self._open(station, element)
+            wanted = np.ones(len(index), dtype=bool)
+            if above is not None:
+                wanted &= index['max'] > above
+            if below is not None:
+                wanted &= index['min'] < below
+            if not wanted.any():
+                continue
+            records = self._records(station, element,
+                                    [(data, codec, entry)
+                                     for entry in index[wanted]])
+            values = records['values']
+            match = np.zeros(len(records), dtype=bool)
+            if above is not None:
+                match |= (values > above).any(axis=1)
+            if below is not None:
+                match |= ((values < below) & (values != MISSING)).any(axis=1)
+            if match.any():
+                yield station, records[match]
+
+    def nbytes(self):
+        """Return the total size of the store's files."""
+        return sum(os.path.getsize(os.path.join(directory, name))
+                   for directory, _, names in os.walk(self.root)
+                   for name in names)
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+
+    paths = sys.argv[1:] or ['USC00110338.dly']
+    store = DailyStore()
+    text_bytes = 0
+    for path in paths:
+        with open(path, 'rb') as infile:
+            data = infile.read()
+        text_bytes += len(data)
+        store.write_dly(data)
+    print(f".dly files {text_bytes:,} bytes, store {store.nbytes():,} bytes "
+          f"({text_bytes / store.nbytes():.1f}x smaller)")
+    start = time.perf_counter()
+    days = 0
+    for element in os.listdir(store.root):
+        for station in store.stations(element):
+            days += store.read(station, element)['values'].size
+    seconds = time.perf_counter() - start
+    print(f"read {days:,} days in {seconds:.3f} s "
+          f"({text_bytes / seconds / 1e6:.0f} MB/s of .dly text)")
+    hot = sum(len(records) for _, records in store.find('TMAX', above=350))
+    print(f"{hot} months with a day over 35 C")
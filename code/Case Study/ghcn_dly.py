@@ -0,0 +1,164 @@
+"""ghcn_dly module: contains parse_dly and monthly_summary.
+
+The case study's parse_line() slices one line of a GHCN-Daily .dly file at
+a time and builds a list of floats for its 31 days. parse_dly() parses a
+whole file's bytes at once with NumPy: every line is a row of a 2-D byte
+array, and each field is a fixed column range of that array, so the 31
+values of every line are converted in a handful of array operations.
+
+Each line of a .dly file is 269 characters:
+
+    columns   field
+     0-10     station id
+    11-14     year
+    15-16     month
+    17-20     element (TMAX, TMIN, PRCP, ...)
+    21-268    31 days of VALUE (5 characters) + MFLAG, QFLAG, SFLAG
+
+Values are integers in tenths of a unit (tenths of a degree C for
+temperatures), with MISSING for days that weren't recorded or don't exist.
+
+    records = parse_dly(open('USC00110338.dly', 'rb').read())
+    monthly = monthly_summary(records[records['element'] == b'TMAX'])
+"""
+
+import numpy as np
+
+LINE_LENGTH = 269
+DAYS = 31
+MISSING = -9999
+VALUE_START = 21
+VALUE_WIDTH = 5
+DAY_WIDTH = 8
+
+RECORD_DTYPE = np.dtype([('station', 'S11'), ('year', np.int16),
+                         ('month', np.int8), ('element', 'S4'),
+                         ('values', np.int16, (DAYS,))])
+SUMMARY_DTYPE = np.dtype([('station', 'S11'), ('year', np.int16),
+                          ('month', np.int8), ('element', 'S4'),
+                          ('max', np.float32), ('min', np.float32),
+                          ('mean', np.float32), ('days', np.int8)])
+
+# Byte offsets of every character of every day's value, shape (31, 5).
+_VALUE_COLUMNS = (VALUE_START + DAY_WIDTH * np.arange(DAYS)[:, None]
+                  + np.arange(VALUE_WIDTH))
+_PLACES = 10 ** np.arange(VALUE_WIDTH - 1, -1, -1)
+
+_HASH_WIDTH = 272               # LINE_LENGTH rounded up to 8 bytes
+_HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+def split_lines(data):
+    """Return the non-blank lines of a .dly file's bytes as a 2-D uint8
+    array with one LINE_LENGTH row per line.
+
+    Raises:
+        ValueError: If a line is shorter than LINE_LENGTH.
+    """
+    n, extra = divmod(len(data), LINE_LENGTH + 1)
+    if not extra and n:
+        lines = np.frombuffer(data, dtype=np.uint8).reshape(n, -1)
+        if (lines[:, -1] == ord('\n')).all():
+            return lines[:, :LINE_LENGTH]
+    # Not the usual layout (CRLF line ends, blank lines, no final
+    # newline...): normalize line by line.
+    rows = [line.rstrip(b'\r\n') for line in data.splitlines()]
+    rows = [row for row in rows if row.strip()]
+    short = [row for row in rows if len(row) < LINE_LENGTH]
+    if short:
+        raise ValueError(f"line too short: {short[0][:30]!r}...")
+    joined = b"".join(row[:LINE_LENGTH] for row in rows)
+    return np.frombuffer(joined, dtype=np.uint8).reshape(-1, LINE_LENGTH)
+
+
+def _ints(columns):
+    """Convert right-aligned decimal fields (the last axis of a uint8
+    array) to integers; a field of spaces becomes MISSING."""
+    digits = columns.astype(np.int32) - ord('0')
+    is_digit = (digits >= 0) & (digits <= 9)
+    places = _PLACES[-columns.shape[-1]:]
+    values = (np.where(is_digit, digits, 0) * places).sum(axis=-1)
+    values = np.where((columns == ord('-')).any(axis=-1), -values, values)
+    return np.where(is_digit.any(axis=-1), values, MISSING)
+
+
+def parse_keys(lines):
+    """Return the station, year, month and element of each row of
+    split_lines() as a RECORD_DTYPE array with the values left empty."""
+    records = np.zeros(len(lines), dtype=RECORD_DTYPE)
+    records['station'] = lines[:, :11].copy().view('S11').ravel()
+    records['year'] = _ints(lines[:, 11:15])
+    records['month'] = _ints(lines[:, 15:17])
+    records['element'] = lines[:, 17:21].copy().view('S4').ravel()
+    return records
+
+
+def parse_lines(lines):
+    """Parse the rows of split_lines() into a RECORD_DTYPE array."""
+    records = parse_keys(lines)
+    records['values'] = _ints(lines[:, _VALUE_COLUMNS])
+    return records
+
+
+def parse_dly(data):
+    """Parse the bytes of a .dly file into a RECORD_DTYPE array, one
+    record per line."""
+    return parse_lines(split_lines(data))
+
+
+def line_hashes(lines):
+    """Return a 64-bit hash of each row of split_lines(), for noticing
+    which lines changed between two versions of a file. (Fast, but not a
+    cryptographic hash.)"""
+    padded = np.zeros((len(lines), _HASH_WIDTH), dtype=np.uint8)
+    padded[:, :LINE_LENGTH] = lines
+    words = padded.view(np.uint64)
+    hashes = np.full(len(lines), np.uint64(LINE_LENGTH))
+    with np.errstate(over='ignore'):
+        for column in words.T:
+            hashes = (hashes ^ column) * _HASH_MULTIPLIER
+            hashes ^= hashes >> np.uint64(29)
+    return hashes
+
+
+def monthly_summary(records):
+    """Summarize each record's month as parse_line() does: the highest,
+    lowest and mean value in whole units (rounded to one place) and the
+    number of days recorded. Months with no days get NaN. (A mean that
+    falls halfway between tenths can round the other way from
+    parse_line()'s, which sums the floats one by one.)
+
+    Returns:
+        A SUMMARY_DTYPE array, one entry per record.
+    """
+    values = records['values']
+    valid = values != MISSING
+    days = valid.sum(axis=1)
+    tenths = np.where(valid, values, 0).sum(axis=1)
+    summary = np.zeros(len(records), dtype=SUMMARY_DTYPE)
+    for name in ('station', 'year', 'month', 'element'):
+        summary[name] = records[name]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        summary['max'] = np.where(days, np.where(valid, values, MISSING)
+                                  .max(axis=1) / 10, np.nan)
+        summary['min'] = np.where(days, np.where(valid, values, -MISSING)
+                                  .min(axis=1) / 10, np.nan)
+        summary['mean'] = np.round(tenths / days / 10, 1)
+    summary['days'] = days
+    return summary
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+
+    with open(sys.argv[1] if len(sys.argv) > 1 else 'weather_USC00110338.txt',
+              'rb') as infile:
+        data = infile.read()
+    start = time.perf_counter()
+    records = parse_dly(data)
+    summary = monthly_summary(records)
+    seconds = time.perf_counter() - start
+    print(f"{len(records):,} lines in {seconds * 1000:.1f} ms "
+          f"({len(data) / seconds / 1e6:.0f} MB/s)")
+    print(summary[summary['element'] == b'TMAX'][:5])
@@ -0,0 +1,294 @@
+"""ghcn_download module: contains download_stations and the Manifest class.
+
+The case study fetches a single station with requests.get(...).text and then
+writes the text to disk. download_stations() fetches any number of GHCN-Daily
+.dly files concurrently with aiohttp, streaming each body to disk in chunks
+instead of holding it in memory. An interrupted download is resumed with an
+HTTP Range request, and every file is checked against the size the server
+reported and, when known, its SHA-256. Files are requested without content
+encoding, so sizes and Range offsets always refer to the bytes written to
+disk. A station that fails for any reason is recorded in the report and
+doesn't stop the others. A manifest in the download directory
+records each file's size, checksum and HTTP validators. On later runs each
+station is fetched with a conditional request, so only files that changed
+on the server are downloaded again.
+
+    report = download_stations(['USC00110338'], "ghcnd_all")
+    print(report)
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+from dataclasses import dataclass, field
+
+import aiohttp
+
+GHCN_DAILY = "https://www.ncei.noaa.gov/pub/data/ghcn/daily"
+CHUNK_SIZE = 256 * 1024
+MANIFEST_FILE = "manifest.json"
+# Save the manifest after this many completed files, as well as at the end.
+MANIFEST_SAVE_EVERY = 500
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class DownloadError(Exception):
+    """Raised when a station file can't be downloaded or fails its checks."""
+    def __init__(self, message, retryable=False):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+@dataclass
+class DownloadReport:
+    downloaded: int = 0
+    resumed: int = 0
+    unchanged: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    failed: dict = field(default_factory=dict)
+
+    def __str__(self):
+        rate = self.bytes / self.seconds / 1e6 if self.seconds else 0.0
+        return (f"{self.downloaded} downloaded ({self.resumed} resumed), "
+                f"{self.unchanged} unchanged, {len(self.failed)} failed; "
+                f"{self.bytes / 1e6:.1f} MB in {self.seconds:.1f} s "
+                f"({rate:.1f} MB/s)")
+
+
+class Manifest:
+    """Per-station record of size, SHA-256, ETag and Last-Modified."""
+    def __init__(self, path):
+        self.path = path
+        try:
+            with open(path) as manifest_file:
+                self.entries = json.load(manifest_file)
+        except FileNotFoundError:
+            self.entries = {}
+
+    def save(self):
+        with open(self.path + ".tmp", 'w') as manifest_file:
+            json.dump(self.entries, manifest_file)
+        os.replace(self.path + ".tmp", self.path)
+
+
+def file_sha256(path):
+    """Return the SHA-256 hex digest of a file, read in chunks."""
+    return _hash_file(hashlib.sha256(), path).hexdigest()
+
+
+def _hash_file(digest, path):
+    """Update digest with the contents of a file and return it."""
+    with open(path, 'rb') as infile:
+        while chunk := infile.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest
+
+
+def _write_chunk(part, digest, chunk):
+    part.write(chunk)
+    digest.update(chunk)
+
+
+class _Downloader:
+    def __init__(self, session, dest_dir, base, manifest, checksums,
+                 retries, backoff, verify, report):
+        self.session = session
+        self.dest_dir = dest_dir
+        self.base = base
+        self.manifest = manifest
+        self.checksums = checksums or {}
+        self.retries = retries
+        self.backoff = backoff
+        self.verify = verify
+        self.report = report
+        self.completed = 0
+
+    def _local_ok(self, station_id, path, entry):
+        """True if the file on disk still matches its manifest entry."""
+        try:
+            if os.path.getsize(path) != entry['size']:
+                return False
+        except (OSError, KeyError):
+            return False
+        expected = self.checksums.get(station_id)
+        if expected and entry.get('sha256') != expected:
+            return False
+        return not self.verify or file_sha256(path) == entry.get('sha256')
+
+    async def fetch(self, station_id):
+        path = os.path.join(self.dest_dir, f"{station_id}.dly")
+        for attempt in range(self.retries + 1):
+            # Re-read each attempt: a failed attempt may have left a
+            # partial file and the validator needed to resume it.
+            entry = self.manifest.entries.get(station_id)
+            try:
+                await self._fetch_once(station_id, path, entry)
+                break
+            except (aiohttp.ClientError, asyncio.TimeoutError,
+                    DownloadError) as e:
+                if attempt == self.retries or not getattr(e, 'retryable', True):
+                    self.report.failed[station_id] = str(e) or repr(e)
+                    return
+                await asyncio.sleep(self.backoff * 2 ** attempt
+                                    * random.uniform(0.5, 1.5))
+        self.completed += 1
+        if self.completed % MANIFEST_SAVE_EVERY == 0:
+            self.manifest.save()
+
+    async def _fetch_once(self, station_id, path, entry):
+        url = f"{self.base}/all/{station_id}.dly"
+        part_path = path + ".part"
+        # A compressed response would make Content-Length and the Range
+        # offsets refer to different bytes from those on disk.
+        headers = {'Accept-Encoding': 'identity'}
+        # Hashing and file I/O run in worker threads throughout, so they
+        # don't hold up the other downloads on the event loop.
+        if entry and await asyncio.to_thread(self._local_ok, station_id,
+                                             path, entry):
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if offset:
+            # Only resume if the partial file came from the same version.
+            validator = (entry or {}).get('partial_validator')
+            if validator:
+                headers['Range'] = f"bytes={offset}-"
+                headers['If-Range'] = validator
+            else:
+                offset = 0
+
+        async with self.session.get(url, headers=headers) as response:
+            if response.status == 304:
+                self.report.unchanged += 1
+                return
+            if response.status in RETRY_STATUSES:
+                raise DownloadError(f"HTTP {response.status}", True)
+            if response.status not in (200, 206):
+                raise DownloadError(f"HTTP {response.status}")
+            encoding = response.headers.get('Content-Encoding', 'identity')
+            if encoding != 'identity':
+                raise DownloadError(f"unexpected Content-Encoding {encoding}")
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            if response.status == 206:
+                content_range = response.headers.get('Content-Range', '')
+                start, _, total = content_range.partition('/')
+                if (not total.isdigit()
+                        or not start.startswith(f"bytes {offset}-")):
+                    # Start over rather than append to the wrong place.
+                    os.remove(part_path)
+                    raise DownloadError(
+                        f"bad Content-Range {content_range!r}", True)
+                total = int(total)
+                resumed = True
+            else:
+                offset = 0
+                total = response.content_length
+                resumed = False
+
+            # Remember the validator now, so an interrupted download can
+            # be resumed by a later attempt or run.
+            new_entry = dict(entry or {})
+            new_entry['partial_validator'] = etag or last_modified
+            self.manifest.entries[station_id] = new_entry
+
+            digest = hashlib.sha256()
+            if offset:
+                await asyncio.to_thread(_hash_file, digest, part_path)
+            part = await asyncio.to_thread(open, part_path,
+                                           'ab' if offset else 'wb')
+            with part:
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    await asyncio.to_thread(_write_chunk, part, digest, chunk)
+                    self.report.bytes += len(chunk)
+                size = part.tell()
+
+        if total is not None and size != total:
+            if size > total:
+                os.remove(part_path)
+            raise DownloadError(f"size {size} != expected {total}", True)
+        sha256 = digest.hexdigest()
+        expected = self.checksums.get(station_id)
+        if expected and sha256 != expected:
+            os.remove(part_path)
+            raise DownloadError("SHA-256 mismatch", True)
+        os.replace(part_path, path)
+        self.manifest.entries[station_id] = {
+            'size': size, 'sha256': sha256, 'etag': etag,
+            'last_modified': last_modified,
+            'fetched': time.time()}
+        self.report.downloaded += 1
+        if resumed:
+            self.report.resumed += 1
+
+
+async def download_stations_async(station_ids, dest_dir, base=GHCN_DAILY,
+                                  concurrency=16, checksums=None, retries=4,
+                                  backoff=1.0, timeout=300, verify=False):
+    """Coroutine version of download_stations."""
+    os.makedirs(dest_dir, exist_ok=True)
+    manifest = Manifest(os.path.join(dest_dir, MANIFEST_FILE))
+    report = DownloadReport()
+    start = time.perf_counter()
+    connector = aiohttp.TCPConnector(limit=concurrency,
+                                     limit_per_host=concurrency)
+    async with aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        downloader = _Downloader(session, dest_dir, base, manifest, checksums,
+                                 retries, backoff, verify, report)
+        queue = asyncio.Queue()
+        for station_id in station_ids:
+            queue.put_nowait(station_id)
+
+        # A fixed set of workers pulling from a queue keeps only
+        # 'concurrency' tasks alive, however many stations there are.
+        async def worker():
+            while not queue.empty():
+                station_id = queue.get_nowait()
+                # fetch() handles the expected network errors; anything
+                # else (e.g. a full disk) fails this station only.
+                try:
+                    await downloader.fetch(station_id)
+                except Exception as e:
+                    report.failed[station_id] = f"{type(e).__name__}: {e}"
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+        finally:
+            manifest.save()
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def download_stations(station_ids, dest_dir="ghcnd_all", **kwargs):
+    """Download GHCN-Daily .dly files for station_ids into dest_dir.
+
+    Args:
+        station_ids: Iterable of station IDs, e.g. 'USC00110338'.
+        dest_dir: Directory for the .dly files and the manifest.
+        base: GHCN-Daily base URL (a local stand-in server for testing).
+        concurrency: Number of simultaneous downloads.
+        checksums: Optional dict of station ID -> expected SHA-256.
+        retries, backoff: Retry count and base backoff delay in seconds.
+        timeout: Seconds allowed for a single file.
+        verify: If True, re-hash files already on disk against the
+            manifest before trusting them, instead of only checking sizes.
+
+    Returns:
+        A DownloadReport; stations that still failed after retrying are in
+        its failed dict with the reason.
+    """
+    return asyncio.run(download_stations_async(station_ids, dest_dir,
+                                               **kwargs))
+
+
+if __name__ == '__main__':
+    print(download_stations(['USC00110338']))
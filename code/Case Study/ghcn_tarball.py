@@ -0,0 +1,236 @@
+"""ghcn_tarball module: contains process_tarball and load_monthly.
+
+The case study downloads one station's .dly file and works on it after
+saving it to disk. The whole of GHCN-Daily is also published as a single
+ghcnd_all.tar.gz holding about 120,000 .dly files. process_tarball() reads
+that archive as a stream, member by member, without extracting it: each
+member's bytes go to a process pool that parses and summarizes them with
+ghcn_dly, and the monthly summaries are written to a Parquet dataset
+partitioned by element:
+
+    monthly/element=TMAX/part-00000.parquet
+    monthly/element=TMIN/part-00000.parquet
+    ...
+
+A run writes into a staging directory beside the partitions and, once it
+finishes, swaps its partitions in for those of earlier runs, so processing
+the same archive again replaces the rows rather than duplicating them. A
+member that can't be parsed is recorded in the report's errors and
+skipped, rather than stopping the run.
+
+At most max_pending members are held in memory at once; when that many
+are waiting for the pool, reading the archive pauses until one finishes.
+
+    report = process_tarball('ghcnd_all.tar.gz', 'monthly')
+    tmax = load_monthly('monthly', 'TMAX', station='USC00110338')
+"""
+
+import os
+import shutil
+import sys
+import tarfile
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from ghcn_dly import monthly_summary, parse_dly
+
+ELEMENTS = (b'TMAX', b'TMIN')
+# Rows buffered for an element before they're written as one Parquet file.
+BATCH_ROWS = 1_000_000
+# Print progress after this many members.
+PROGRESS_EVERY = 1000
+
+
+@dataclass
+class TarballReport:
+    """Progress of a process_tarball() run."""
+    members: int = 0
+    bytes: int = 0
+    rows: int = 0
+    files: int = 0
+    seconds: float = 0.0
+    # (member name, error message) for members that couldn't be parsed
+    errors: list = field(default_factory=list)
+
+    def __str__(self):
+        seconds = self.seconds or 1e-9
+        return (f"{self.members:,} members, {self.bytes / 1e6:,.0f} MB, "
+                f"{self.rows:,} monthly rows in {self.seconds:.1f} s "
+                f"({self.members / seconds:,.0f} members/s, "
+                f"{self.bytes / seconds / 1e6:,.1f} MB/s)"
+                + (f", {len(self.errors):,} failed" if self.errors else ""))
+
+
+def summarize_member(data, elements=ELEMENTS):
+    """Parse one .dly file's bytes and return its monthly summaries for
+    elements (all elements if None). Runs in the worker processes."""
+    records = parse_dly(data)
+    if elements is not None:
+        records = records[np.isin(records['element'], elements)]
+    return monthly_summary(records)
+
+
+class PartitionedWriter:
+    """Buffers monthly summaries and writes them to a Parquet dataset
+    partitioned by element, one file per BATCH_ROWS rows.
+
+    Files go to a staging directory, _staging-<run id>, inside directory
+    (readers of the dataset skip names starting with '_'). commit() moves
+    each element's partition into place, replacing the one from an
+    earlier run; until then the dataset is unchanged.
+    """
+    def __init__(self, directory, batch_rows=BATCH_ROWS):
+        self.directory = directory
+        self.batch_rows = batch_rows
+        self._buffers = {}          # element -> list of summary arrays
+        self._counts = {}
+        self._parts = {}
+        self.run_id = uuid.uuid4().hex[:12]
+        self.staging = os.path.join(directory, f"_staging-{self.run_id}")
+        self.files = 0
+
+    def add(self, summary):
+        for element in np.unique(summary['element']):
+            rows = summary[summary['element'] == element]
+            self._buffers.setdefault(element, []).append(rows)
+            self._counts[element] = self._counts.get(element, 0) + len(rows)
+            if self._counts[element] >= self.batch_rows:
+                self._flush(element)
+
+    def _flush(self, element):
+        rows = np.concatenate(self._buffers.pop(element))
+        self._counts[element] = 0
+        if not len(rows):
+            return
+        table = pa.table({
+            'station': pa.array(rows['station'].astype('U11')),
+            'year': rows['year'], 'month': rows['month'],
+            'max': rows['max'], 'min': rows['min'], 'mean': rows['mean'],
+            'days': rows['days']})
+        partition = os.path.join(self.staging, f"element={element.decode()}")
+        os.makedirs(partition, exist_ok=True)
+        part = self._parts.get(element, 0)
+        self._parts[element] = part + 1
+        pq.write_table(table,
+                       os.path.join(partition, f"part-{part:05d}.parquet"))
+        self.files += 1
+
+    def close(self):
+        """Write out everything still buffered, to the staging directory."""
+        for element in list(self._buffers):
+            self._flush(element)
+
+    def commit(self):
+        """close(), then replace the dataset's partitions with the ones
+        this writer staged and remove the staging directory."""
+        self.close()
+        if not os.path.isdir(self.staging):
+            return
+        for name in os.listdir(self.staging):
+            target = os.path.join(self.directory, name)
+            replaced = os.path.join(self.staging, f"_replaced-{name}")
+            if os.path.exists(target):
+                os.rename(target, replaced)
+            os.rename(os.path.join(self.staging, name), target)
+        shutil.rmtree(self.staging)
+
+
+def _print_progress(report):
+    print(report, file=sys.stderr)
+
+
+def process_tarball(source, directory, elements=ELEMENTS, workers=None,
+                    max_pending=None, batch_rows=BATCH_ROWS,
+                    progress=_print_progress, progress_every=PROGRESS_EVERY):
+    """Summarize every .dly member of a GHCN-Daily tarball into a Parquet
+    dataset, streaming the archive.
+
+    Args:
+        source: Path of the archive, or a binary file object (for example
+            an HTTP response body); any tarfile compression is accepted.
+        directory: Directory of the Parquet dataset. The partitions of
+            the elements written replace any from earlier runs; if the
+            run fails, the dataset is left as it was and what had been
+            summarized stays in the writer's staging directory.
+        elements: Elements to keep, as bytes (None keeps all).
+        workers: Processes parsing members (default: CPU count).
+        max_pending: Members read but not yet summarized, at most
+            (default: 2 per worker).
+        batch_rows: Rows per Parquet file and element.
+        progress: Called with the TarballReport every progress_every
+            members and at the end; None for no progress.
+
+    Returns:
+        A TarballReport.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+    writer = PartitionedWriter(directory, batch_rows)
+    report = TarballReport()
+    start = time.perf_counter()
+    if isinstance(source, (str, os.PathLike)):
+        archive = tarfile.open(source, mode='r|*')
+    else:
+        archive = tarfile.open(fileobj=source, mode='r|*')
+    names = {}                      # future -> member name
+
+    def collect(done):
+        for future in done:
+            name = names.pop(future)
+            try:
+                summary = future.result()
+            except Exception as e:
+                report.errors.append((name, f"{type(e).__name__}: {e}"))
+                continue
+            writer.add(summary)
+            report.rows += len(summary)
+
+    try:
+        with archive, ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = set()
+            for member in archive:
+                if not (member.isfile() and member.name.endswith('.dly')):
+                    continue
+                data = archive.extractfile(member).read()
+                if len(pending) >= max_pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+                future = pool.submit(summarize_member, data, elements)
+                names[future] = member.name
+                pending.add(future)
+                report.members += 1
+                report.bytes += len(data)
+                if progress and report.members % progress_every == 0:
+                    report.seconds = time.perf_counter() - start
+                    progress(report)
+            collect(wait(pending).done)
+    finally:
+        # Write out whatever was summarized, even if reading the archive
+        # failed part way; it's only swapped in if the run finished.
+        writer.close()
+    writer.commit()
+    report.files = writer.files
+    report.seconds = time.perf_counter() - start
+    if progress:
+        progress(report)
+    return report
+
+
+def load_monthly(directory, element='TMAX', station=None):
+    """Return the monthly summaries of one element, optionally for one
+    station, from a dataset written by process_tarball()."""
+    filters = [('station', '==', station)] if station else None
+    table = pq.read_table(os.path.join(directory, f"element={element}"),
+                          filters=filters)
+    return table.to_pandas()
+
+
+if __name__ == '__main__':
+    print(process_tarball(sys.argv[1] if len(sys.argv) > 1
+                          else 'ghcnd_all.tar.gz', 'monthly', progress=None))
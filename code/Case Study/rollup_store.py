@@ -0,0 +1,228 @@
+"""rollup_store module: contains the RollupStore class.
+
+The case study parses a station's whole .dly file every session, builds
+tmax_df and tmin_df from lists and runs groupby('Year').mean() before it
+can plot anything. A RollupStore keeps the results in SQLite instead:
+
+    monthly   max, min, mean and days of every station, element and month
+              (parse_line()'s summary), with a hash of the raw line
+    yearly    the mean of the monthly max, min and mean (what the case
+              study plots), the year's highest and lowest values, and the
+              number of months
+
+When a refreshed .dly file is loaded, every line is hashed and compared
+with the stored hashes, and only the lines that changed are parsed; the
+yearly rows are recomputed only for the years those lines fall in. Reading
+a plot-ready yearly series is one indexed query:
+
+    store = RollupStore('rollups.db')
+    store.update_file('USC00110338.dly')
+    store.yearly('USC00110338', 'TMIN').plot(kind='line', figsize=(16, 8))
+"""
+
+import sqlite3
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from ghcn_dly import (line_hashes, monthly_summary, parse_keys, parse_lines,
+                      split_lines)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS monthly (
+    station text NOT NULL,
+    element text NOT NULL,
+    year integer NOT NULL,
+    month integer NOT NULL,
+    hash integer NOT NULL,
+    max real,
+    min real,
+    mean real,
+    days integer NOT NULL,
+    PRIMARY KEY (station, element, year, month)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS yearly (
+    station text NOT NULL,
+    element text NOT NULL,
+    year integer NOT NULL,
+    max real,
+    min real,
+    mean real,
+    high real,
+    low real,
+    months integer NOT NULL,
+    PRIMARY KEY (station, element, year)) WITHOUT ROWID;
+"""
+
+_YEARLY_ROLLUP = """
+INSERT INTO yearly
+SELECT station, element, year, avg(max), avg(min), avg(mean), max(max),
+       min(min), count(*)
+FROM monthly WHERE station = ? AND element = ? AND year = ?
+GROUP BY station, element, year"""
+
+
+@dataclass
+class UpdateReport:
+    """What an update changed."""
+    lines: int = 0
+    changed: int = 0
+    removed: int = 0
+    years: int = 0
+
+    def __iadd__(self, other):
+        self.lines += other.lines
+        self.changed += other.changed
+        self.removed += other.removed
+        self.years += other.years
+        return self
+
+    def __str__(self):
+        return (f"{self.lines:,} lines: {self.changed:,} months changed, "
+                f"{self.removed:,} removed, {self.years:,} years recomputed")
+
+
+class RollupStore:
+    """Monthly and yearly temperature rollups kept in a SQLite file.
+
+    Args:
+        path: Database file, created if needed.
+        elements: Elements to keep (default: TMAX and TMIN); None keeps
+            every element.
+    """
+    def __init__(self, path="rollups.db", elements=(b'TMAX', b'TMIN')):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.elements = elements
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _stored_hashes(self, station):
+        rows = self.conn.execute("SELECT element, year, month, hash "
+                                 "FROM monthly WHERE station = ?", (station,))
+        return {(element, year, month): hash_
+                for element, year, month, hash_ in rows}
+
+    def update(self, data):
+        """Bring the store up to date with the bytes of a .dly file (one
+        or more stations), parsing only the lines that changed.
+
+        Months no longer in the file are removed, so data must be a
+        station's complete file.
+
+        Returns:
+            An UpdateReport.
+        """
+        lines = split_lines(data)
+        keys = parse_keys(lines)
+        if self.elements is not None:
+            keep = np.isin(keys['element'], self.elements)
+            lines, keys = lines[keep], keys[keep]
+        # SQLite integers are signed.
+        hashes = line_hashes(lines).view(np.int64)
+        report = UpdateReport(lines=len(lines))
+        with self.conn:
+            for station in np.unique(keys['station']):
+                mine = np.flatnonzero(keys['station'] == station)
+                report += self._update_station(station.decode(), lines[mine],
+                                               keys[mine], hashes[mine])
+        return report
+
+    def _update_station(self, station, lines, keys, hashes):
+        stored = self._stored_hashes(station)
+        changed = []
+        for index, (element, year, month, hash_) in enumerate(zip(
+                keys['element'].tolist(), keys['year'].tolist(),
+                keys['month'].tolist(), hashes.tolist())):
+            key = (element.decode(), year, month)
+            if stored.pop(key, None) != hash_:
+                changed.append(index)
+        # Whatever is left in stored is no longer in the file.
+        removed = list(stored)
+        summary = monthly_summary(parse_lines(lines[changed]))
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO monthly VALUES (?,?,?,?,?,?,?,?,?)",
+            ((station, row['element'].decode(), int(row['year']),
+              int(row['month']), int(hash_), _real(row['max']),
+              _real(row['min']), _real(row['mean']), int(row['days']))
+             for row, hash_ in zip(summary, hashes[changed])))
+        self.conn.executemany(
+            "DELETE FROM monthly WHERE station = ? AND element = ? "
+            "AND year = ? AND month = ?",
+            ((station, *key) for key in removed))
+        years = ({(row['element'].decode(), int(row['year']))
+                  for row in summary}
+                 | {(element, year) for element, year, _ in removed})
+        params = [(station, element, year) for element, year in years]
+        self.conn.executemany("DELETE FROM yearly WHERE station = ? AND "
+                              "element = ? AND year = ?", params)
+        self.conn.executemany(_YEARLY_ROLLUP, params)
+        return UpdateReport(changed=len(changed), removed=len(removed),
+                            years=len(years))
+
+    def update_file(self, path):
+        """update() from a .dly file on disk."""
+        with open(path, 'rb') as infile:
+            return self.update(infile.read())
+
+    def update_files(self, paths):
+        """update_file() for each of paths; return the combined report."""
+        report = UpdateReport()
+        for path in paths:
+            report += self.update_file(path)
+        return report
+
+    def monthly(self, station, element='TMAX'):
+        """Return a station's monthly rollups, like the case study's
+        tmax_df, indexed by (Year, Month)."""
+        return pd.read_sql_query(
+            "SELECT year AS Year, month AS Month, max AS Max, min AS Min, "
+            "mean AS Mean, days AS Days FROM monthly WHERE station = ? AND "
+            "element = ? ORDER BY year, month", self.conn,
+            params=(station, element), index_col=['Year', 'Month'])
+
+    def yearly(self, station, element='TMAX'):
+        """Return a station's yearly Min, Mean and Max (means of the
+        monthly values), indexed by Year: the case study's
+        df[['Year', 'Min', 'Mean', 'Max']].groupby('Year').mean()."""
+        rows = self.conn.execute(
+            "SELECT year, min, mean, max FROM yearly WHERE station = ? "
+            "AND element = ? ORDER BY year", (station, element)).fetchall()
+        frame = pd.DataFrame(rows, columns=['Year', 'Min', 'Mean', 'Max'])
+        return frame.set_index('Year')
+
+    def stations(self):
+        """Return the ids of the stations in the store."""
+        return [station for station, in self.conn.execute(
+            "SELECT DISTINCT station FROM yearly ORDER BY station")]
+
+
+def _real(value):
+    """A float for SQLite, or None for NaN."""
+    return None if np.isnan(value) else round(float(value), 1)
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+
+    paths = sys.argv[1:] or ['USC00110338.dly']
+    with RollupStore() as store:
+        for attempt in ('first', 'again'):
+            start = time.perf_counter()
+            report = store.update_files(paths)
+            print(f"{attempt}: {report} in "
+                  f"{time.perf_counter() - start:.3f} s")
+        start = time.perf_counter()
+        yearly = store.yearly(store.stations()[0], 'TMIN')
+        print(f"yearly series of {len(yearly)} years in "
+              f"{(time.perf_counter() - start) * 1000:.2f} ms")
+        print(yearly.tail())
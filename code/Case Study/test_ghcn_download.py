@@ -0,0 +1,184 @@
+"""Tests for ghcn_download against a local stand-in for the GHCN-Daily server.
+
+Run with: python -m unittest test_ghcn_download
+"""
+
+import hashlib
+import http.server
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from ghcn_download import MANIFEST_FILE, download_stations
+
+
+class StationHandler(http.server.BaseHTTPRequestHandler):
+    """Serves the server's files as <base>/all/<station>.dly, with ETags,
+    If-None-Match and Range/If-Range like the real server."""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, headers=(), body=b""):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        station = self.path.rsplit('/', 1)[1].removesuffix('.dly')
+        server.requests.append((station, dict(self.headers)))
+        if station not in server.files:
+            self._send(404)
+            return
+        body = server.files[station]
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if self.headers.get('If-None-Match') == etag:
+            self._send(304, [('ETag', etag)])
+            return
+        range_ = self.headers.get('Range')
+        if range_ and self.headers.get('If-Range') == etag:
+            start = int(range_.removeprefix('bytes=').removesuffix('-'))
+            headers = [('ETag', etag)]
+            if station not in server.no_content_range:
+                headers.append(('Content-Range',
+                                f"bytes {start}-{len(body) - 1}/{len(body)}"))
+            self._send(206, headers, body[start:])
+            return
+        if station in server.truncate_once:
+            # Promise the whole file, send half and drop the connection a
+            # little later, once the client has read what was sent.
+            server.truncate_once.discard(station)
+            self.send_response(200)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body[:len(body) // 2])
+            self.wfile.flush()
+            time.sleep(0.2)
+            self.close_connection = True
+            return
+        self._send(200, [('ETag', etag)], body)
+
+
+class DownloadStationsTest(unittest.TestCase):
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0),
+                                                      StationHandler)
+        self.server.files = {
+            'USC00000001': b"USC00000001199001TMAX  100  " * 4000,
+            'USC00000002': b"USC00000002199001TMIN  -50  " * 3000,
+        }
+        self.server.truncate_once = set()
+        self.server.no_content_range = set()
+        self.server.requests = []
+        threading.Thread(target=self.server.serve_forever,
+                         daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_port}"
+        self.directory = tempfile.TemporaryDirectory()
+        self.dest = self.directory.name
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.directory.cleanup()
+
+    def download(self, station_ids, **kwargs):
+        return download_stations(station_ids, self.dest, base=self.base,
+                                 backoff=0.01, **kwargs)
+
+    def read(self, station):
+        with open(os.path.join(self.dest, f"{station}.dly"), 'rb') as infile:
+            return infile.read()
+
+    def test_download_requests_identity_encoding(self):
+        report = self.download(['USC00000001', 'USC00000002'])
+        self.assertEqual(report.downloaded, 2)
+        self.assertEqual(report.failed, {})
+        for station in ('USC00000001', 'USC00000002'):
+            self.assertEqual(self.read(station), self.server.files[station])
+        for _, headers in self.server.requests:
+            self.assertEqual(headers['Accept-Encoding'], 'identity')
+        self.assertTrue(os.path.exists(os.path.join(self.dest,
+                                                    MANIFEST_FILE)))
+
+    def test_interrupted_download_resumes_with_range(self):
+        self.server.truncate_once.add('USC00000001')
+        report = self.download(['USC00000001'])
+        self.assertEqual((report.downloaded, report.resumed), (1, 1))
+        self.assertEqual(self.read('USC00000001'),
+                         self.server.files['USC00000001'])
+        (_, first), (_, second) = self.server.requests
+        self.assertNotIn('Range', first)
+        half = len(self.server.files['USC00000001']) // 2
+        self.assertEqual(second['Range'], f"bytes={half}-")
+        body = self.server.files['USC00000001']
+        self.assertEqual(second['If-Range'],
+                         f'"{hashlib.md5(body).hexdigest()}"')
+        self.assertFalse(os.path.exists(
+            os.path.join(self.dest, 'USC00000001.dly.part')))
+
+    def test_resume_without_content_range_starts_over(self):
+        self.server.truncate_once.add('USC00000001')
+        self.server.no_content_range.add('USC00000001')
+        report = self.download(['USC00000001'])
+        self.assertEqual((report.downloaded, report.resumed), (1, 0))
+        self.assertEqual(self.read('USC00000001'),
+                         self.server.files['USC00000001'])
+        self.assertNotIn('Range', self.server.requests[-1][1])
+
+    def test_unchanged_file_is_skipped_with_304(self):
+        self.download(['USC00000001'])
+        report = self.download(['USC00000001'])
+        self.assertEqual((report.downloaded, report.unchanged), (0, 1))
+        self.assertEqual(report.bytes, 0)
+        _, headers = self.server.requests[-1]
+        self.assertIn('If-None-Match', headers)
+        self.assertEqual(self.read('USC00000001'),
+                         self.server.files['USC00000001'])
+
+    def test_changed_file_is_downloaded_again(self):
+        self.download(['USC00000001'])
+        self.server.files['USC00000001'] += b"USC00000001199002TMAX  120  "
+        report = self.download(['USC00000001'])
+        self.assertEqual((report.downloaded, report.unchanged), (1, 0))
+        self.assertEqual(self.read('USC00000001'),
+                         self.server.files['USC00000001'])
+
+    def test_checksum_mismatch_fails_station_only(self):
+        expected = hashlib.sha256(
+            self.server.files['USC00000002']).hexdigest()
+        report = self.download(['USC00000001', 'USC00000002'], retries=1,
+                               checksums={'USC00000001': '0' * 64,
+                                          'USC00000002': expected})
+        self.assertEqual(report.failed, {'USC00000001': "SHA-256 mismatch"})
+        self.assertEqual(report.downloaded, 1)
+        self.assertFalse(os.path.exists(
+            os.path.join(self.dest, 'USC00000001.dly')))
+        self.assertFalse(os.path.exists(
+            os.path.join(self.dest, 'USC00000001.dly.part')))
+        self.assertEqual(self.read('USC00000002'),
+                         self.server.files['USC00000002'])
+
+    def test_missing_station_does_not_stop_others(self):
+        report = self.download(['USC00000009', 'USC00000002'])
+        self.assertEqual(report.failed, {'USC00000009': "HTTP 404"})
+        self.assertEqual(report.downloaded, 1)
+
+    def test_local_error_does_not_stop_others(self):
+        # A directory in the way makes saving the file raise OSError.
+        os.mkdir(os.path.join(self.dest, 'USC00000001.dly'))
+        report = self.download(['USC00000001', 'USC00000002'])
+        self.assertEqual(list(report.failed), ['USC00000001'])
+        self.assertEqual(self.read('USC00000002'),
+                         self.server.files['USC00000002'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+"""Tests for ghcn_tarball with small generated GHCN-Daily archives.
+
+Run with: python -m unittest test_ghcn_tarball
+"""
+
+import io
+import os
+import tarfile
+import tempfile
+import unittest
+
+from ghcn_tarball import load_monthly, process_tarball
+
+
+def make_dly(station, years, elements=('TMAX', 'TMIN')):
+    """Return the bytes of a .dly file with a value for every day."""
+    lines = []
+    for year in years:
+        for month in range(1, 13):
+            for number, element in enumerate(elements):
+                values = "".join(f"{(day + month + number) * 10:5d}   "
+                                 for day in range(31))
+                lines.append(f"{station}{year:4d}{month:02d}{element}{values}")
+    return ("\n".join(lines) + "\n").encode()
+
+
+def make_tarball(path, members):
+    """Write a .tar.gz of (name, bytes) members."""
+    with tarfile.open(path, 'w:gz') as archive:
+        for name, data in members:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+
+
+class ProcessTarballTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.archive = os.path.join(self.directory.name, 'ghcnd.tar.gz')
+        self.dataset = os.path.join(self.directory.name, 'monthly')
+        make_tarball(self.archive, [
+            ('ghcnd_all/USC00000001.dly',
+             make_dly('USC00000001', [2000, 2001, 2002])),
+            ('ghcnd_all/USC00000002.dly', make_dly('USC00000002', [2000])),
+            ('ghcnd_all/USC00000003.dly', b"not a dly file\n"),
+            ('ghcnd_all/readme.txt', b"skipped"),
+        ])
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def process(self, archive=None):
+        return process_tarball(archive or self.archive, self.dataset,
+                               workers=1, progress=None)
+
+    def test_summaries_are_written_by_element(self):
+        report = self.process()
+        self.assertEqual(report.members, 3)
+        self.assertEqual([name for name, _ in report.errors],
+                         ['ghcnd_all/USC00000003.dly'])
+        self.assertEqual(len(load_monthly(self.dataset, 'TMAX')), 48)
+        station = load_monthly(self.dataset, 'TMIN', station='USC00000001')
+        self.assertEqual(len(station), 36)
+        self.assertEqual(sorted(os.listdir(self.dataset)),
+                         ['element=TMAX', 'element=TMIN'])
+
+    def test_running_twice_does_not_duplicate_rows(self):
+        self.process()
+        self.process()
+        self.assertEqual(len(load_monthly(self.dataset, 'TMAX',
+                                          station='USC00000001')), 36)
+        self.assertEqual(len(load_monthly(self.dataset, 'TMIN')), 48)
+        self.assertFalse([name for name in os.listdir(self.dataset)
+                          if name.startswith('_')])
+
+    def test_new_run_replaces_earlier_one(self):
+        self.process()
+        smaller = os.path.join(self.directory.name, 'smaller.tar.gz')
+        make_tarball(smaller, [('USC00000002.dly',
+                                make_dly('USC00000002', [2000, 2001]))])
+        self.process(smaller)
+        monthly = load_monthly(self.dataset, 'TMAX')
+        self.assertEqual(list(monthly['station'].unique()), ['USC00000002'])
+        self.assertEqual(len(monthly), 24)
+
+    def test_failed_run_leaves_dataset_unchanged(self):
+        self.process()
+        truncated = os.path.join(self.directory.name, 'truncated.tar.gz')
+        with open(self.archive, 'rb') as infile:
+            data = infile.read()
+        with open(truncated, 'wb') as outfile:
+            outfile.write(data[:len(data) // 2])
+        with self.assertRaises(Exception):
+            self.process(truncated)
+        self.assertEqual(len(load_monthly(self.dataset, 'TMAX')), 48)
+
+
+if __name__ == '__main__':
+    unittest.main()
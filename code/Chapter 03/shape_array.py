@@ -0,0 +1,284 @@
+"""shape_array module. Contains the ShapeArray class and its proxies.
+
+shape.py keeps every Square and Circle as a separate object with its own
+__dict__, and move() and area() handle one shape at a time. A ShapeArray
+holds any number of squares and circles as NumPy columns instead: x, y,
+size (the side of a square or the radius of a circle) and a kind tag, so
+moving, measuring or searching all of them is one vectorized operation.
+
+Indexing a ShapeArray gives a small proxy object that reads and writes the
+arrays. The proxies have the same attributes and methods as Square and
+Circle, so code written for the classes in shape.py still works on single
+shapes, but they don't inherit from them: Shape has no __slots__, so a
+subclass would carry a __dict__ of its own.
+"""
+
+import numpy as np
+
+from shape import Circle, Square
+
+SQUARE = 0
+CIRCLE = 1
+INITIAL_CAPACITY = 16
+
+
+class _ShapeProxy:
+    """Position attributes read from and written to a ShapeArray row."""
+    __slots__ = ('_shapes', '_index')
+
+    def __init__(self, shapes, index):
+        self._shapes = shapes
+        self._index = index
+
+    @property
+    def x(self):
+        return float(self._shapes.x[self._index])
+
+    @x.setter
+    def x(self, value):
+        self._shapes.x[self._index] = value
+
+    @property
+    def y(self):
+        return float(self._shapes.y[self._index])
+
+    @y.setter
+    def y(self, value):
+        self._shapes.y[self._index] = value
+
+    def move(self, deltaX, deltaY):
+        self.x = self.x + deltaX
+        self.y = self.y + deltaY
+
+
+class SquareProxy(_ShapeProxy):
+    """A Square stored in a ShapeArray."""
+    __slots__ = ()
+
+    @property
+    def side(self):
+        return float(self._shapes.size[self._index])
+
+    @side.setter
+    def side(self, value):
+        self._shapes.size[self._index] = value
+
+    def __str__(self):
+        return f"Square of side {self.side} at ({self.x}, {self.y})"
+
+
+class CircleProxy(_ShapeProxy):
+    """A Circle stored in a ShapeArray."""
+    __slots__ = ()
+    pi = Circle.pi
+
+    @property
+    def radius(self):
+        return float(self._shapes.size[self._index])
+
+    @radius.setter
+    def radius(self, value):
+        self._shapes.size[self._index] = value
+
+    area = Circle.area
+    __str__ = Circle.__str__
+
+
+class ShapeArray:
+    """Struct-of-arrays collection of squares and circles.
+
+    Each shape's (x, y) is taken as its center. The columns x, y, size
+    and kind are NumPy arrays holding exactly len(self) entries, so they
+    can be used directly in NumPy expressions, e.g. shapes.kind == CIRCLE.
+    """
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        capacity = max(capacity, 1)
+        self._x = np.empty(capacity)
+        self._y = np.empty(capacity)
+        self._size = np.empty(capacity)
+        self._kind = np.empty(capacity, dtype=np.int8)
+        self._count = 0
+
+    @classmethod
+    def from_shapes(cls, shapes):
+        """Build a ShapeArray from Square and Circle objects."""
+        shapes = list(shapes)
+        array = cls(len(shapes))
+        for shape in shapes:
+            array.append(shape)
+        return array
+
+    # ---- storage -------------------------------------------------------------
+
+    @property
+    def x(self):
+        return self._x[:self._count]
+
+    @property
+    def y(self):
+        return self._y[:self._count]
+
+    @property
+    def size(self):
+        return self._size[:self._count]
+
+    @property
+    def kind(self):
+        return self._kind[:self._count]
+
+    def __len__(self):
+        return self._count
+
+    def _reserve(self, extra):
+        needed = self._count + extra
+        if needed <= len(self._x):
+            return
+        capacity = max(needed, 2 * len(self._x))
+        for name in ('_x', '_y', '_size', '_kind'):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self._count] = old[:self._count]
+            setattr(self, name, new)
+
+    def _add(self, kind, size, x, y):
+        size, x, y = np.broadcast_arrays(np.atleast_1d(size), x, y)
+        start = self._count
+        self._reserve(len(size))
+        end = start + len(size)
+        self._x[start:end] = x
+        self._y[start:end] = y
+        self._size[start:end] = size
+        self._kind[start:end] = kind
+        self._count = end
+        return range(start, end)
+
+    def add_squares(self, side, x=0, y=0):
+        """Add squares from arrays (or scalars) of sides and centers.
+
+        Returns:
+            The range of indexes of the new squares.
+        """
+        return self._add(SQUARE, side, x, y)
+
+    def add_circles(self, r, x=0, y=0):
+        """Add circles from arrays (or scalars) of radii and centers.
+
+        Returns:
+            The range of indexes of the new circles.
+        """
+        return self._add(CIRCLE, r, x, y)
+
+    def append(self, shape):
+        """Add a copy of a Square or Circle object, or of a proxy."""
+        if isinstance(shape, (Circle, CircleProxy)):
+            self.add_circles(shape.radius, shape.x, shape.y)
+        elif isinstance(shape, (Square, SquareProxy)):
+            self.add_squares(shape.side, shape.x, shape.y)
+        else:
+            raise TypeError(f"can't store {type(shape).__name__} in a "
+                            "ShapeArray")
+
+    def __getitem__(self, index):
+        if not -self._count <= index < self._count:
+            raise IndexError("ShapeArray index out of range")
+        index %= self._count
+        if self._kind[index] == CIRCLE:
+            return CircleProxy(self, index)
+        return SquareProxy(self, index)
+
+    def __iter__(self):
+        for index in range(self._count):
+            yield self[index]
+
+    # ---- geometry ------------------------------------------------------------
+
+    def move(self, delta_x, delta_y, where=None):
+        """Move shapes by (delta_x, delta_y), like Shape.move().
+
+        Args:
+            delta_x, delta_y: Scalars, or arrays with one value per shape
+                selected.
+            where: Optional boolean mask or array of indexes choosing the
+                shapes to move; by default all of them.
+        """
+        if where is None:
+            self.x[:] += delta_x
+            self.y[:] += delta_y
+        else:
+            self.x[where] += delta_x
+            self.y[where] += delta_y
+
+    def area(self):
+        """Return an array of every shape's area, with the same value of
+        pi as Circle.area()."""
+        size = self.size
+        return np.where(self.kind == CIRCLE, Circle.pi, 1.0) * size * size
+
+    def bounds(self):
+        """Return (x_min, y_min, x_max, y_max) arrays of each shape's
+        bounding box."""
+        half = np.where(self.kind == CIRCLE, self.size, self.size / 2)
+        return self.x - half, self.y - half, self.x + half, self.y + half
+
+    def bounding_box(self):
+        """Return (x_min, y_min, x_max, y_max) enclosing every shape."""
+        if not self._count:
+            raise ValueError("bounding_box() of an empty ShapeArray")
+        x_min, y_min, x_max, y_max = self.bounds()
+        return (float(x_min.min()), float(y_min.min()),
+                float(x_max.max()), float(y_max.max()))
+
+    def in_box(self, x_min, y_min, x_max, y_max, inside=False):
+        """Return a boolean mask of the shapes whose bounding boxes overlap
+        the box, or with inside=True, lie entirely within it."""
+        left, bottom, right, top = self.bounds()
+        if inside:
+            return ((left >= x_min) & (right <= x_max)
+                    & (bottom >= y_min) & (top <= y_max))
+        return ((right >= x_min) & (left <= x_max)
+                & (top >= y_min) & (bottom <= y_max))
+
+    def nbytes(self):
+        """Return the bytes used by the columns' allocated storage."""
+        return (self._x.nbytes + self._y.nbytes + self._size.nbytes
+                + self._kind.nbytes)
+
+
+if __name__ == '__main__':
+    import time
+    import tracemalloc
+
+    n = 1_000_000
+    rng = np.random.default_rng(0)
+    sizes = rng.uniform(0.5, 2.0, n)
+    xs = rng.uniform(-100, 100, n)
+    ys = rng.uniform(-100, 100, n)
+
+    tracemalloc.start()
+    objects = [Circle(r, x, y) if i % 2 else Square(r, x, y)
+               for i, (r, x, y) in enumerate(zip(sizes.tolist(), xs.tolist(),
+                                                 ys.tolist()))]
+    object_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    shapes = ShapeArray(n)
+    shapes.add_squares(sizes[0::2], xs[0::2], ys[0::2])
+    shapes.add_circles(sizes[1::2], xs[1::2], ys[1::2])
+    print(f"memory: objects {object_bytes / 1e6:.0f} MB, "
+          f"ShapeArray {shapes.nbytes() / 1e6:.0f} MB")
+
+    start = time.perf_counter()
+    for shape in objects:
+        if isinstance(shape, Circle):
+            shape.move(1, 1)
+    total = sum(shape.area() for shape in objects if isinstance(shape, Circle))
+    loop = time.perf_counter() - start
+    start = time.perf_counter()
+    circles = shapes.kind == CIRCLE
+    shapes.move(1, 1, circles)
+    array_total = shapes.area()[circles].sum()
+    vectorized = time.perf_counter() - start
+    print(f"move + area of circles: loop {loop:.3f} s, "
+          f"ShapeArray {vectorized:.3f} s ({loop / vectorized:.0f}x)")
+    print(f"total circle area {total:.1f} vs {array_total:.1f}")
+    print(shapes[1], "|", shapes.in_box(0, 0, 10, 10, inside=True).sum(),
+          "shapes inside (0, 0)-(10, 10)")
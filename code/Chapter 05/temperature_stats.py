@@ -0,0 +1,350 @@
+"""temperature_stats module: contains the TemperatureStats class.
+
+The Lab 5 solution reads every temperature into a list, sorts the list to
+find the median and builds a set to count the unique values. A
+TemperatureStats sees each reading once and keeps only a small, fixed
+amount of state:
+
+    count, mean, variance   Welford's online algorithm
+    min, max                running comparisons
+    median (approximate)    a merging t-digest of at most a few hundred
+                            centroids, accurate to a small fraction of a
+                            percent in rank
+    distinct values         a HyperLogLog sketch (about 1.6% error at the
+                            default precision, exact-ish for small counts)
+
+With exact_median=True the readings are also kept in a compact array and
+the median is found with quickselect, for when memory allows it.
+
+Every part can be merged, so a huge file can be split between processes
+and the partial results combined (see from_file):
+
+    stats = TemperatureStats.from_file('lab_05.txt')
+    print(stats)
+"""
+
+import math
+import os
+import random
+import struct
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+# t-digest compression: a larger value keeps more centroids and is more
+# accurate.
+COMPRESSION = 100
+# Readings buffered before they're folded into the t-digest.
+BUFFER_SIZE = 2000
+# HyperLogLog uses 2 ** HLL_PRECISION one-byte registers.
+HLL_PRECISION = 12
+# Files smaller than this are read in a single process by from_file().
+MIN_PARALLEL_SIZE = 4 * 1024 * 1024
+
+_MASK64 = (1 << 64) - 1
+_DOUBLE = struct.Struct('<d')
+
+
+def _hash64(value):
+    """Return a well-mixed 64-bit hash of a float (splitmix64 finalizer)."""
+    # + 0.0 turns -0.0 into 0.0, which is the same temperature.
+    x = int.from_bytes(_DOUBLE.pack(value + 0.0), 'little')
+    x = ((x ^ (x >> 30)) * 0xbf58476d1ce4e5b9) & _MASK64
+    x = ((x ^ (x >> 27)) * 0x94d049bb133111eb) & _MASK64
+    return x ^ (x >> 31)
+
+
+def quickselect(values, k):
+    """Return the k-th smallest (0-based) of values, reordering values in
+    place, in expected linear time."""
+    low, high = 0, len(values) - 1
+    while low < high:
+        pivot = values[random.randint(low, high)]
+        i, j = low, high
+        while i <= j:
+            while values[i] < pivot:
+                i += 1
+            while values[j] > pivot:
+                j -= 1
+            if i <= j:
+                values[i], values[j] = values[j], values[i]
+                i += 1
+                j -= 1
+        if k <= j:
+            high = j
+        elif k >= i:
+            low = i
+        else:
+            return values[k]
+    return values[k]
+
+
+class TemperatureStats:
+    """Single-pass, mergeable summary statistics for a stream of readings.
+
+    Args:
+        exact_median: Also keep every reading (8 bytes each) so median()
+            is exact instead of estimated.
+        compression: t-digest compression (see COMPRESSION).
+        hll_precision: HyperLogLog precision; error is about
+            1.04 / sqrt(2 ** hll_precision).
+    """
+    def __init__(self, exact_median=False, compression=COMPRESSION,
+                 hll_precision=HLL_PRECISION):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.compression = compression
+        self._means = []            # t-digest centroids, sorted by mean
+        self._weights = []
+        self._buffer = []
+        self.hll_precision = hll_precision
+        self._registers = bytearray(1 << hll_precision)
+        self._values = array('d') if exact_median else None
+
+    # ---- adding readings ---------------------------------------------------
+
+    def add(self, value):
+        """Add one reading."""
+        self.update((value,))
+
+    def update(self, values):
+        """Add every reading in an iterable of numbers."""
+        count, mean, m2 = self.count, self.mean, self._m2
+        low, high = self.min, self.max
+        buffer = self._buffer
+        registers = self._registers
+        shift = 64 - self.hll_precision
+        rank_bits = shift + 1
+        rest_mask = (1 << shift) - 1
+        keep = self._values.append if self._values is not None else None
+        for value in values:
+            value = float(value)
+            count += 1
+            delta = value - mean
+            mean += delta / count
+            m2 += delta * (value - mean)
+            if value < low:
+                low = value
+            if value > high:
+                high = value
+            buffer.append(value)
+            if len(buffer) >= BUFFER_SIZE:
+                self._compress()
+            hashed = _hash64(value)
+            index = hashed >> shift
+            rank = rank_bits - (hashed & rest_mask).bit_length()
+            if rank > registers[index]:
+                registers[index] = rank
+            if keep is not None:
+                keep(value)
+        self.count, self.mean, self._m2 = count, mean, m2
+        self.min, self.max = low, high
+
+    def merge(self, other):
+        """Fold another TemperatureStats into this one, as though its
+        readings had been added here (Chan et al.'s parallel variance).
+
+        Returns:
+            self, so merges can be chained.
+
+        Raises:
+            ValueError: If the two can't be merged; self is left unchanged.
+        """
+        if other.hll_precision != self.hll_precision:
+            raise ValueError("can't merge sketches of different precision")
+        if self._values is not None and other._values is None:
+            raise ValueError("can't merge an estimated median into an "
+                             "exact one")
+        if other.count:
+            total = self.count + other.count
+            delta = other.mean - self.mean
+            self._m2 += (other._m2
+                         + delta * delta * self.count * other.count / total)
+            self.mean += delta * other.count / total
+            self.count = total
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+        self._means.extend(other._means)
+        self._weights.extend(other._weights)
+        self._buffer.extend(other._buffer)
+        self._compress()
+        self._registers = bytearray(map(max, self._registers,
+                                        other._registers))
+        if self._values is not None:
+            self._values.extend(other._values)
+        return self
+
+    # ---- t-digest ------------------------------------------------------------
+
+    def _k(self, q):
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def _k_inverse(self, k):
+        if k >= self.compression / 4:
+            return 1.0
+        return (math.sin(2 * math.pi * k / self.compression) + 1) / 2
+
+    def _compress(self):
+        """Fold buffered readings into the centroids and merge neighbours
+        while the k1 scale function allows."""
+        if not self._buffer and len(self._means) < 2:
+            return
+        items = sorted(zip(self._means + self._buffer,
+                           self._weights + [1] * len(self._buffer)))
+        self._buffer.clear()
+        total = sum(weight for _, weight in items)
+        means, weights = [], []
+        cur_mean, cur_weight = items[0]
+        done = 0
+        limit = self._k_inverse(self._k(0.0) + 1) * total
+        for mean, weight in items[1:]:
+            if done + cur_weight + weight <= limit:
+                cur_weight += weight
+                cur_mean += (mean - cur_mean) * weight / cur_weight
+            else:
+                means.append(cur_mean)
+                weights.append(cur_weight)
+                done += cur_weight
+                limit = self._k_inverse(self._k(done / total) + 1) * total
+                cur_mean, cur_weight = mean, weight
+        means.append(cur_mean)
+        weights.append(cur_weight)
+        self._means, self._weights = means, weights
+
+    def quantile(self, q):
+        """Return an estimate of the q-quantile (0 <= q <= 1)."""
+        if not self.count:
+            raise ValueError("no readings")
+        self._compress()
+        means, weights = self._means, self._weights
+        if len(means) == 1:
+            return means[0]
+        target = q * self.count
+        # Interpolate between centroid centers; the ends run out to the
+        # exact min and max.
+        center = weights[0] / 2
+        if target <= center:
+            return self.min + (means[0] - self.min) * target / center
+        for i in range(1, len(means)):
+            next_center = center + (weights[i - 1] + weights[i]) / 2
+            if target <= next_center:
+                fraction = (target - center) / (next_center - center)
+                return means[i - 1] + (means[i] - means[i - 1]) * fraction
+            center = next_center
+        tail = self.count - center
+        return means[-1] + ((self.max - means[-1])
+                            * (target - center) / tail if tail else 0.0)
+
+    # ---- results ---------------------------------------------------------------
+
+    @property
+    def variance(self):
+        """Sample variance of the readings."""
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def stdev(self):
+        return math.sqrt(self.variance)
+
+    def median(self):
+        """Return the median: exact if exact_median was set (the mean of
+        the middle two for an even count), otherwise estimated."""
+        if self._values is None:
+            return self.quantile(0.5)
+        if not self._values:
+            raise ValueError("no readings")
+        middle = len(self._values) // 2
+        try:
+            import numpy as np
+            values = np.frombuffer(self._values, dtype=np.float64).copy()
+            pair = np.partition(values, [middle - 1, middle])
+            upper, lower = float(pair[middle]), float(pair[middle - 1])
+        except ImportError:
+            values = self._values.tolist()
+            upper = quickselect(values, middle)
+            lower = max(values[:middle]) if middle else upper
+        if len(self._values) % 2:
+            return upper
+        return (lower + upper) / 2
+
+    def distinct(self):
+        """Return the HyperLogLog estimate of the number of unique values."""
+        m = len(self._registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self._registers)
+        zeros = self._registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities.
+            return round(m * math.log(m / zeros))
+        return round(estimate)
+
+    def summary(self):
+        return {'count': self.count, 'min': self.min, 'max': self.max,
+                'mean': self.mean, 'stdev': self.stdev,
+                'median': self.median(), 'distinct': self.distinct()}
+
+    def __str__(self):
+        return ", ".join(f"{name} = {value:.6g}" if isinstance(value, float)
+                         else f"{name} = {value}"
+                         for name, value in self.summary().items())
+
+    # ---- reading files -----------------------------------------------------
+
+    @classmethod
+    def from_file(cls, path, workers=None, **kwargs):
+        """Compute statistics for a file of one reading per line.
+
+        Files of MIN_PARALLEL_SIZE or more are split into byte ranges at
+        line boundaries, each range is summarized in its own process and
+        the results are merged. Blank lines are skipped.
+
+        Args:
+            path: Path of the file.
+            workers: Number of processes (default: CPU count).
+            kwargs: Passed on to TemperatureStats().
+        """
+        size = os.path.getsize(path)
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or size < MIN_PARALLEL_SIZE:
+            return _stats_for_range(path, 0, size, kwargs)
+        bounds = [0]
+        with open(path, 'rb') as infile:
+            for part in range(1, workers):
+                infile.seek(size * part // workers)
+                infile.readline()
+                bounds.append(max(infile.tell(), bounds[-1]))
+        bounds.append(size)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = pool.map(_stats_for_range, [path] * workers, bounds[:-1],
+                             bounds[1:], [kwargs] * workers)
+            stats = next(parts)
+            for part in parts:
+                stats.merge(part)
+        return stats
+
+
+def _stats_for_range(path, start, end, kwargs):
+    """Summarize the lines between byte offsets start and end, which fall
+    on line boundaries."""
+    stats = TemperatureStats(**kwargs)
+    with open(path, 'rb') as infile:
+        infile.seek(start)
+
+        def readings():
+            position = start
+            for line in infile:
+                if position >= end:
+                    return
+                position += len(line)
+                if line.strip():
+                    yield float(line)
+        stats.update(readings())
+    return stats
+
+
+if __name__ == '__main__':
+    stats = TemperatureStats.from_file('lab_05.txt', exact_median=True)
+    print(stats)
+    print(f"estimated median = {stats.quantile(0.5):.3f}")
@@ -207,7 +207,7 @@ if __name__ == "__main__":
 
 !python script6.py 59
 
-!wget https://raw.githubusercontent.com/nceder/qpb4e/main/code/Chapter%2011/n2w.py &> null   && echo Downloaded
+!wget -nc https://raw.githubusercontent.com/nceder/qpb4e/main/code/Chapter%2011/n2w.py &> null   && echo Downloaded
 
 """```python
 # Listing 11.10 File n2w.py
@@ -222,7 +222,7 @@ usage as a script: n2w num
 example: n2w 10,003,103
            for 10,003,103 say: ten million three thousand one hundred three
 '''
-import sys, string, argparse
+import sys
 _1to9dict = {'0': '', '1': 'one', '2': 'two', '3': 'three', '4': 'four',
              '5': 'five', '6': 'six', '7': 'seven', '8': 'eight',
              '9': 'nine'}
@@ -274,6 +274,7 @@ def test():
     for val in values:
         print("{0} = {1}".format(val, num2words(val)))
 def main():
+    import argparse       # only needed when run as a script
     parser = argparse.ArgumentParser(usage=__doc__)
     parser.add_argument("num", nargs='*')
     parser.add_argument("-t", "--test", dest="test",
@@ -291,9 +292,9 @@ def main():
             print("For {0}, say: {1}".format(args.num[0], result))
 if __name__ == '__main__':
     main()
-else:
-    print("n2w  loaded as a module")
 ```
+
+The `n2w.py` in this directory differs from the book's listing: it doesn't print when it's imported, and it imports `argparse` only in `main()`, so importing it as a module is quiet and quick. Run as a script, it behaves the same. The `wget -nc` above keeps that copy rather than downloading over it.
 """
 
 # Listing 11.11 File n2w.tst
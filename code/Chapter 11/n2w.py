@@ -8,7 +8,7 @@ usage as a script: n2w num
 example: n2w 10,003,103
            for 10,003,103 say: ten million three thousand one hundred three
 """
-import sys, string, argparse
+import sys
 _1to9dict = {'0': '', '1': 'one', '2': 'two', '3': 'three', '4': 'four',  #B
              '5': 'five', '6': 'six', '7': 'seven', '8': 'eight',
              '9': 'nine'}
@@ -59,6 +59,7 @@ def test():                                                        #G
     for val in values:
         print("{0} = {1}".format(val, num2words(val)))
 def main():
+    import argparse       # only needed when run as a script
     parser = argparse.ArgumentParser(usage=__doc__)
     parser.add_argument("num", nargs='*')
     parser.add_argument("-t", "--test", dest="test",
@@ -76,5 +77,3 @@ def main():
             print("For {0}, say: {1}".format(args.num[0], result))
 if __name__ == '__main__': 
     main()                                                               #1
-else:                                     
-    print("n2w  loaded as a module")
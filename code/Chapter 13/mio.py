@@ -1,14 +1,26 @@
 """mio: module, (contains functions capture_output, restore_output,
-     print_file, and clear_file )"""
+     print_file, and clear_file, the capture context manager, and the
+     RingBuffer class)"""
+import contextlib
+import os
+import queue
 import sys
+import threading
+
 _file_object = None
+
+# Size of the buffers used for capture files, for the chunks handed to the
+# background writer, and for reading files back in print_file.
+BUFFER_SIZE = 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
 def capture_output(file="capture_file.txt"):
     """capture_output(file='capture_file.txt'): redirect the standard
     output to 'file'."""
     global _file_object
     print("output will be sent to file: {0}".format(file))
     print("restore to normal by calling 'mio.restore_output()'")
-    _file_object = open(file, 'w')
+    _file_object = open(file, 'w', buffering=BUFFER_SIZE)
     sys.stdout = _file_object
 
 def restore_output():
@@ -21,13 +33,166 @@ def restore_output():
 
 def print_file(file="capture_file.txt"):
     """print_file(file="capture_file.txt"): print the given file to the
-         standard output"""
-    f = open(file, 'r')
-    print(f.read())
-    f.close()
+         standard output, a chunk at a time"""
+    with open(file, 'r') as f:
+        while chunk := f.read(CHUNK_SIZE):
+            sys.stdout.write(chunk)
+    sys.stdout.write("\n")
 
 def clear_file(file="capture_file.txt"):
     """clear_file(file="capture_file.txt"): clears the contents of the
          given file"""
     f = open(file, 'w')
     f.close()
+
+
+class RingBuffer:
+    """RingBuffer(size): in-memory buffer keeping only the last 'size'
+         bytes written to it. Can be passed to capture() again to add
+         to the same buffer."""
+    def __init__(self, size=BUFFER_SIZE):
+        self.size = size
+        self._data = bytearray(size)
+        self._end = 0          # next write position
+        self._full = False
+        self._lock = threading.Lock()
+
+    def write(self, data):
+        data = memoryview(data).cast('B')
+        written = len(data)
+        with self._lock:
+            # Only the last 'size' bytes can be kept, but the caller is
+            # told all of them were written, as with a file.
+            data = data[-self.size:]
+            first = min(len(data), self.size - self._end)
+            self._data[self._end:self._end + first] = data[:first]
+            rest = len(data) - first
+            if rest:
+                self._data[:rest] = data[first:]
+                self._full = True
+                self._end = rest
+            else:
+                self._end += first
+                if self._end == self.size:
+                    self._full = True
+                    self._end = 0
+        return written
+
+    def getvalue(self):
+        """getvalue(): return the buffered bytes, oldest first"""
+        with self._lock:
+            if not self._full:
+                return bytes(self._data[:self._end])
+            return bytes(self._data[self._end:] + self._data[:self._end])
+
+    def clear(self):
+        with self._lock:
+            self._end = 0
+            self._full = False
+
+    def flush(self):
+        pass
+
+
+class _QueueStream:
+    """Text stream that collects writes under a lock and hands them to
+         the background writer a chunk at a time."""
+    def __init__(self, chunks, encoding):
+        self.encoding = encoding
+        self._chunks = chunks
+        self._parts = []
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def write(self, text):
+        with self._lock:
+            self._parts.append(text)
+            self._size += len(text)
+            if self._size >= CHUNK_SIZE:
+                self._hand_off()
+        return len(text)
+
+    def _hand_off(self):
+        if self._parts:
+            self._chunks.put("".join(self._parts).encode(self.encoding))
+            self._parts = []
+            self._size = 0
+
+    def flush(self):
+        with self._lock:
+            self._hand_off()
+
+    def writable(self):
+        return True
+
+
+def _drain(chunks, sink):
+    """Background thread: write queued chunks to sink until None arrives."""
+    while (chunk := chunks.get()) is not None:
+        sink.write(chunk)
+    sink.flush()
+
+def _drain_pipe(read_fd, sink):
+    """Background thread: copy everything from the pipe to sink."""
+    with open(read_fd, 'rb', buffering=0) as pipe:
+        while chunk := pipe.read(CHUNK_SIZE):
+            sink.write(chunk)
+    sink.flush()
+
+
+@contextlib.contextmanager
+def capture(into=None, fd_level=False, buffer_size=BUFFER_SIZE):
+    """capture(into=None, fd_level=False): context manager capturing the
+         standard output.
+
+    'into' can be a file name (written through a buffer_size buffer), a
+    RingBuffer (kept between captures), or None for a new RingBuffer of
+    buffer_size bytes. Output is written to it by a background thread, so
+    print() only appends to an in-memory list. With fd_level=True, file
+    descriptor 1 itself is redirected with os.dup2, which also captures
+    output written by C extensions and subprocesses. The context manager
+    yields the RingBuffer or the open capture file."""
+    if into is None:
+        into = RingBuffer(buffer_size)
+    if isinstance(into, RingBuffer):
+        sink = into
+        close_sink = False
+    else:
+        sink = open(into, 'wb', buffering=buffer_size)
+        close_sink = True
+
+    old_stdout = sys.stdout
+    old_stdout.flush()
+    try:
+        if fd_level:
+            read_fd, write_fd = os.pipe()
+            saved_fd = os.dup(1)
+            writer = threading.Thread(target=_drain_pipe,
+                                      args=(read_fd, sink), daemon=True)
+            writer.start()
+            os.dup2(write_fd, 1)
+            os.close(write_fd)
+            try:
+                yield sink
+            finally:
+                sys.stdout.flush()
+                os.dup2(saved_fd, 1)
+                os.close(saved_fd)
+                writer.join()
+        else:
+            chunks = queue.Queue()
+            writer = threading.Thread(target=_drain, args=(chunks, sink),
+                                      daemon=True)
+            writer.start()
+            sys.stdout = _QueueStream(chunks, getattr(old_stdout, 'encoding',
+                                                      None) or 'utf-8')
+            try:
+                yield sink
+            finally:
+                sys.stdout.flush()
+                sys.stdout = old_stdout
+                chunks.put(None)
+                writer.join()
+    finally:
+        if close_sink:
+            sink.close()
@@ -0,0 +1,262 @@
+"""record_file module: contains struct_to_dtype and the RecordFile class.
+
+A RecordFile is a file of fixed-size binary records all packed with the same
+struct format, like the 'hd7s' records in section 13.7. Instead of one read()
+and one struct.unpack() per record, it reads whole files as NumPy structured
+arrays (np.fromfile or a zero-copy np.memmap), or unpacks large chunks with
+struct.iter_unpack when NumPy isn't wanted, and writes records in bulk from a
+preallocated buffer with struct.pack_into.
+"""
+
+import mmap
+import os
+import re
+import struct
+
+# struct codes and the NumPy kind used for a field of that code; the field
+# size always comes from struct.calcsize, so native sizes are respected.
+_SIGNED = set('bhilqn')
+_UNSIGNED = set('BHILQNP')
+_FLOAT = set('efd')
+_TOKEN = re.compile(r'(\d*)([xcbB?hHiIlLqQnNefdsPp])')
+_NUMPY_BYTE_ORDER = {'@': '=', '=': '=', '<': '<', '>': '>', '!': '>'}
+
+# Records processed per read or write call by the non-NumPy paths.
+CHUNK_RECORDS = 65536
+
+
+def _parse_format(record_format):
+    """Split record_format into its byte-order character and a list of
+    (code, count) pairs, with repeated numeric codes expanded so there's
+    one pair per value that struct.unpack returns."""
+    byte_order = '@'
+    body = record_format.replace(' ', '')
+    if body and body[0] in _NUMPY_BYTE_ORDER:
+        byte_order, body = body[0], body[1:]
+    fields = []
+    position = 0
+    for match in _TOKEN.finditer(body):
+        if match.start() != position:
+            break
+        position = match.end()
+        count = int(match.group(1)) if match.group(1) else 1
+        code = match.group(2)
+        if code in 'sp':
+            fields.append((code, count))
+        else:
+            fields.extend([(code, 1)] * count)
+    if position != len(body):
+        raise ValueError(f"can't parse struct format {record_format!r}")
+    return byte_order, fields
+
+
+def struct_to_dtype(record_format, names=None):
+    """Return the NumPy structured dtype matching a struct format.
+
+    Args:
+        record_format: A struct format string, e.g. 'hd7s'.
+        names: Optional field names, one per value struct.unpack returns.
+            Defaults to 'f0', 'f1', ...
+
+    Returns:
+        A numpy.dtype with the same field offsets and item size as the
+        struct format, including any native alignment padding.
+
+    Raises:
+        ValueError: If the format uses a code NumPy can't represent ('p').
+    """
+    import numpy as np
+
+    byte_order, fields = _parse_format(record_format)
+    np_order = _NUMPY_BYTE_ORDER[byte_order]
+    formats, offsets = [], []
+    prefix = byte_order
+    for code, count in fields:
+        token = f"{count}{code}" if count != 1 else code
+        size = struct.calcsize(byte_order + token)
+        offset = struct.calcsize(prefix + token) - size
+        prefix += token
+        if code == 'x':
+            continue
+        if code in _SIGNED:
+            formats.append(f"{np_order}i{size}")
+        elif code in _UNSIGNED:
+            formats.append(f"{np_order}u{size}")
+        elif code in _FLOAT:
+            formats.append(f"{np_order}f{size}")
+        elif code == '?':
+            formats.append('?')
+        elif code in 'cs':
+            formats.append(f"S{count}")
+        else:
+            raise ValueError(f"struct code {code!r} has no NumPy equivalent")
+        offsets.append(offset)
+    if names is None:
+        names = [f"f{i}" for i in range(len(formats))]
+    if len(names) != len(formats):
+        raise ValueError(f"expected {len(formats)} field names, "
+                         f"got {len(names)}")
+    return np.dtype({'names': list(names), 'formats': formats,
+                     'offsets': offsets,
+                     'itemsize': struct.calcsize(record_format)})
+
+
+class RecordFile:
+    """A file of fixed-size records packed with one struct format.
+
+    Use it as a context manager (or call close()) when using random access
+    by record number, which keeps the file memory-mapped between lookups.
+    """
+    def __init__(self, path, record_format, names=None):
+        self.path = path
+        self.record_format = record_format
+        self.names = names
+        self._struct = struct.Struct(record_format)
+        self.record_size = self._struct.size
+        self._file = None
+        self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        """Return the number of complete records in the file."""
+        try:
+            return os.path.getsize(self.path) // self.record_size
+        except FileNotFoundError:
+            return 0
+
+    @property
+    def dtype(self):
+        """The NumPy structured dtype equivalent to the record format."""
+        return struct_to_dtype(self.record_format, self.names)
+
+    # ---- reading -----------------------------------------------------------
+
+    def read_array(self, memmap=True):
+        """Read every record into a NumPy structured array.
+
+        Args:
+            memmap: If True (the default), return a read-only np.memmap, so
+                records are paged in from disk on demand with no copy.
+                Otherwise read the whole file into memory with np.fromfile.
+        """
+        import numpy as np
+
+        count = len(self)
+        if memmap:
+            if count == 0:
+                return np.empty(0, dtype=self.dtype)
+            return np.memmap(self.path, dtype=self.dtype, mode='r',
+                             shape=(count,))
+        return np.fromfile(self.path, dtype=self.dtype, count=count)
+
+    def iter_records(self, chunk_records=CHUNK_RECORDS):
+        """Yield each record as a tuple, without NumPy.
+
+        The file is read chunk_records at a time into one reusable buffer,
+        and each chunk is unpacked with a single struct.iter_unpack call.
+        A read that ends part way through a record (as reads from a pipe
+        can) keeps those bytes for the next one; as with len(), an
+        incomplete record at the end of the file is ignored.
+        """
+        size = self.record_size
+        buffer = bytearray(chunk_records * size)
+        view = memoryview(buffer)
+        filled = 0
+        with open(self.path, 'rb') as input:
+            while nbytes := input.readinto(view[filled:]):
+                filled += nbytes
+                complete = filled - filled % size
+                if complete:
+                    yield from self._struct.iter_unpack(view[:complete])
+                    # Move the start of a partly read record to the front.
+                    buffer[:filled - complete] = view[complete:filled]
+                    filled -= complete
+
+    def read_records(self):
+        """Return a list of every record as a tuple, without NumPy."""
+        with open(self.path, 'rb') as input:
+            data = input.read(len(self) * self.record_size)
+        return list(self._struct.iter_unpack(data))
+
+    def __getitem__(self, index):
+        """Return record number index as a tuple (negative indexes count
+        from the end)."""
+        count = len(self)
+        if index < 0:
+            index += count
+        if not 0 <= index < count:
+            raise IndexError("record index out of range")
+        if self._mmap is None or len(self._mmap) < count * self.record_size:
+            self.close()
+            self._file = open(self.path, 'rb')
+            self._mmap = mmap.mmap(self._file.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+        return self._struct.unpack_from(self._mmap, index * self.record_size)
+
+    # ---- writing -----------------------------------------------------------
+
+    def write(self, records, append=False, chunk_records=CHUNK_RECORDS):
+        """Write records to the file in bulk.
+
+        Args:
+            records: A NumPy array (converted to this file's dtype and
+                written with tofile) or any iterable of tuples.
+            append: If True, add to the end of the file instead of
+                replacing it.
+            chunk_records: How many tuples are packed into the preallocated
+                buffer before each write.
+
+        Returns:
+            The number of records written.
+        """
+        self.close()
+        mode = 'ab' if append else 'wb'
+        if hasattr(records, 'dtype'):
+            array = records.astype(self.dtype, copy=False)
+            with open(self.path, mode) as output:
+                array.tofile(output)
+            return len(array)
+
+        size = self.record_size
+        pack_into = self._struct.pack_into
+        buffer = bytearray(chunk_records * size)
+        view = memoryview(buffer)
+        written = 0
+        offset = 0
+        with open(self.path, mode) as output:
+            for record in records:
+                pack_into(buffer, offset, *record)
+                offset += size
+                if offset == len(buffer):
+                    output.write(buffer)
+                    written += chunk_records
+                    offset = 0
+            if offset:
+                output.write(view[:offset])
+                written += offset // size
+        return written
+
+    def close(self):
+        """Release the memory map used for random access, if any."""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+if __name__ == '__main__':
+    import tempfile
+
+    path = os.path.join(tempfile.mkdtemp(), "data")
+    with RecordFile(path, 'hd7s') as records:
+        records.write((i % 30000, i / 10, b"goodbye") for i in range(100_000))
+        print(len(records), "records of", records.record_size, "bytes")
+        print(records[0], records[-1])
+        print(sum(1 for _ in records.iter_records()), "records iterated")
@@ -0,0 +1,259 @@
+"""sqlite_shelf module: contains the SqliteShelf class and open.
+
+A replacement for the shelve examples in section 13.9 that doesn't depend on
+whichever dbm backend happens to be installed. Values are pickled into an
+SQLite table keyed (and indexed) by the shelf key. Writes are batched into
+transactions, recently read values are kept in a bounded LRU cache, and the
+database runs in WAL mode so other processes can read it while it's being
+written. Values can optionally be compressed with zlib or, if the zstandard
+package is installed, zstd.
+
+    import sqlite_shelf
+    book = sqlite_shelf.open("addresses.db")
+    book['flintstone'] = ('fred', '555-1234', '1233 Bedrock Place')
+    book.close()
+"""
+
+import pickle
+import sqlite3
+import zlib
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Values of the codec column.
+_RAW, _ZLIB, _ZSTD = 0, 1, 2
+_CODECS = {None: _RAW, 'zlib': _ZLIB, 'zstd': _ZSTD}
+# Values shorter than this are stored uncompressed even if compression is on.
+MIN_COMPRESS_SIZE = 256
+# SQLite's default limit on parameters in one statement is 999.
+_MAX_PARAMS = 900
+
+
+class SqliteShelf(MutableMapping):
+    """A shelf whose values are pickled into an SQLite database.
+
+    Supports the same mapping API as shelve.Shelf, plus get_many() and
+    set_many() for bulk reads and writes. Unlike a shelf opened with
+    writeback=True, it never holds more than cache_size values in memory;
+    as with writeback=False, changes to a mutable value must be stored back
+    with an assignment.
+
+    Args:
+        filename: Path of the SQLite database file.
+        flag: 'c' (default) to create the database if needed, 'w' to open
+            an existing one, 'n' to start empty, or 'r' for read-only.
+        protocol: Pickle protocol for values (default: highest).
+        compression: None, 'zlib' or 'zstd'.
+        cache_size: How many recently read values to cache.
+        batch_size: How many writes to collect before committing them.
+    """
+    def __init__(self, filename, flag='c', protocol=None, compression=None,
+                 cache_size=1024, batch_size=1000):
+        if compression not in _CODECS:
+            raise ValueError(f"unknown compression {compression!r}")
+        if compression == 'zstd' and zstandard is None:
+            raise ValueError("zstd compression needs the zstandard package")
+        if flag not in ('r', 'w', 'c', 'n'):
+            raise ValueError("flag must be one of 'r', 'w', 'c' or 'n'")
+        self.filename = filename
+        self.readonly = flag == 'r'
+        self._protocol = pickle.HIGHEST_PROTOCOL if protocol is None else protocol
+        self._codec = _CODECS[compression]
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._batch_size = batch_size
+        self._pending = 0
+        if zstandard is not None:
+            self._zstd_compressor = zstandard.ZstdCompressor()
+            self._zstd_decompressor = zstandard.ZstdDecompressor()
+
+        if flag in ('r', 'w'):
+            mode = 'ro' if flag == 'r' else 'rw'
+            self._conn = sqlite3.connect(f"file:{filename}?mode={mode}",
+                                         uri=True)
+        else:
+            self._conn = sqlite3.connect(filename)
+        if not self.readonly:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            if flag == 'n':
+                self._conn.execute("DROP TABLE IF EXISTS shelf")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS shelf ("
+                               "key TEXT PRIMARY KEY, "
+                               "codec INTEGER NOT NULL, "
+                               "value BLOB NOT NULL) WITHOUT ROWID")
+            self._conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __del__(self):
+        if getattr(self, '_conn', None) is not None:
+            self.close()
+
+    # ---- value encoding ----------------------------------------------------
+
+    def _encode(self, value):
+        data = pickle.dumps(value, self._protocol)
+        if self._codec == _RAW or len(data) < MIN_COMPRESS_SIZE:
+            return _RAW, data
+        if self._codec == _ZLIB:
+            return _ZLIB, zlib.compress(data)
+        return _ZSTD, self._zstd_compressor.compress(data)
+
+    def _decompress(self, codec, data):
+        if codec == _ZLIB:
+            return zlib.decompress(data)
+        if codec == _ZSTD:
+            if zstandard is None:
+                raise ValueError("value is zstd compressed; "
+                                 "install the zstandard package")
+            return self._zstd_decompressor.decompress(data)
+        return data
+
+    # The cache holds pickled bytes rather than values, so every lookup
+    # returns a fresh object, just as shelve does without writeback.
+    def _cache_put(self, key, data):
+        if self._cache_size <= 0:
+            return
+        self._cache[key] = data
+        self._cache.move_to_end(key)
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+
+    # ---- writes --------------------------------------------------------------
+
+    def _check_writable(self):
+        if self.readonly:
+            raise sqlite3.OperationalError("shelf is open read-only")
+
+    def _wrote(self, count):
+        self._pending += count
+        if self._pending >= self._batch_size:
+            self.sync()
+
+    def sync(self):
+        """Commit any batched writes to the database."""
+        if self._pending:
+            self._conn.commit()
+            self._pending = 0
+
+    def __setitem__(self, key, value):
+        self._check_writable()
+        codec, data = self._encode(value)
+        self._conn.execute("INSERT OR REPLACE INTO shelf VALUES (?, ?, ?)",
+                           (key, codec, data))
+        self._cache.pop(key, None)
+        self._wrote(1)
+
+    def set_many(self, items):
+        """Store many values in one batch.
+
+        Args:
+            items: A mapping or an iterable of (key, value) pairs.
+        """
+        self._check_writable()
+        if hasattr(items, 'items'):
+            items = items.items()
+        rows = []
+        for key, value in items:
+            rows.append((key, *self._encode(value)))
+            self._cache.pop(key, None)
+        self._conn.executemany("INSERT OR REPLACE INTO shelf VALUES (?, ?, ?)",
+                               rows)
+        self._wrote(len(rows))
+
+    def __delitem__(self, key):
+        self._check_writable()
+        cursor = self._conn.execute("DELETE FROM shelf WHERE key = ?", (key,))
+        self._cache.pop(key, None)
+        if cursor.rowcount == 0:
+            raise KeyError(key)
+        self._wrote(1)
+
+    # ---- reads -------------------------------------------------------------
+
+    def __getitem__(self, key):
+        try:
+            data = self._cache[key]
+            self._cache.move_to_end(key)
+        except KeyError:
+            row = self._conn.execute("SELECT codec, value FROM shelf "
+                                     "WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                raise KeyError(key) from None
+            data = self._decompress(*row)
+            self._cache_put(key, data)
+        return pickle.loads(data)
+
+    def get_many(self, keys):
+        """Return a dict of the stored values for whichever of keys exist."""
+        result = {}
+        missing = []
+        for key in keys:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                result[key] = pickle.loads(self._cache[key])
+            else:
+                missing.append(key)
+        for start in range(0, len(missing), _MAX_PARAMS):
+            chunk = missing[start:start + _MAX_PARAMS]
+            placeholders = ", ".join("?" * len(chunk))
+            rows = self._conn.execute("SELECT key, codec, value FROM shelf "
+                                      f"WHERE key IN ({placeholders})", chunk)
+            for key, codec, value in rows:
+                data = self._decompress(codec, value)
+                self._cache_put(key, data)
+                result[key] = pickle.loads(data)
+        return result
+
+    def __contains__(self, key):
+        if key in self._cache:
+            return True
+        return self._conn.execute("SELECT 1 FROM shelf WHERE key = ?",
+                                  (key,)).fetchone() is not None
+
+    def __iter__(self):
+        keys = self._conn.execute("SELECT key FROM shelf").fetchall()
+        return (key for (key,) in keys)
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM shelf").fetchone()[0]
+
+    def close(self):
+        """Commit any batched writes and close the database."""
+        if self._conn is None:
+            return
+        try:
+            self.sync()
+        finally:
+            self._conn.close()
+            self._conn = None
+            self._cache.clear()
+
+
+def open(filename, flag='c', protocol=None, **kwargs):
+    """Open an SqliteShelf, with the same arguments as shelve.open."""
+    return SqliteShelf(filename, flag, protocol, **kwargs)
+
+
+if __name__ == '__main__':
+    import os
+    import tempfile
+
+    path = os.path.join(tempfile.mkdtemp(), "addresses.db")
+    with open(path, compression='zlib') as book:
+        book['flintstone'] = ('fred', '555-1234', '1233 Bedrock Place')
+        book['rubble'] = ('barney', '555-4321', '1235 Bedrock Place')
+        book.set_many((f"person{i}", ('name', i)) for i in range(10_000))
+    with open(path, 'r') as book:
+        print(book['flintstone'])
+        print(len(book), book.get_many(['rubble', 'person42', 'nobody']))
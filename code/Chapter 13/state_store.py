@@ -0,0 +1,258 @@
+"""state_store module: contains save_data, restore_data and StateStore.
+
+A drop-in for the save_data/restore_data functions in section 13.8 for large
+state dictionaries. Each value is pickled separately with protocol 5, and any
+large buffer it contains (NumPy arrays, bytearrays, anything else supporting
+out-of-band pickling) is written to a separate buffers file instead of being
+copied into the pickle stream. On loading, those buffers are memory-mapped
+and handed straight back to pickle, so arrays come back without a copy, and
+individual keys can be loaded without reading the rest of the state.
+
+Plain bytes and bytearray objects don't offer pickle their buffers, so
+large ones are written to the buffers file separately (see _Pickler);
+they're copied out of the mapping into a new bytes or bytearray when
+loaded.
+
+A state saved to 'state' is a directory holding three files:
+    index.pickle   key -> where its pickle and buffers live
+    values.pickle  the per-key pickle streams, one after another
+    buffers.bin    the out-of-band buffers, each aligned to ALIGNMENT bytes
+"""
+
+import io
+import mmap
+import os
+import pickle
+import shutil
+
+# Buffers smaller than this stay in the pickle stream; mapping them
+# separately would cost more than copying them.
+MIN_OUT_OF_BAND_SIZE = 64 * 1024
+# Out-of-band buffers start on this boundary so mapped arrays are aligned.
+ALIGNMENT = 64
+
+_INDEX_FILE = "index.pickle"
+_VALUES_FILE = "values.pickle"
+_BUFFERS_FILE = "buffers.bin"
+
+
+class _Pickler(pickle.Pickler):
+    """Protocol 5 pickler that also moves large bytes and bytearray
+    objects out of the stream.
+
+    pickle only offers out-of-band buffers for objects that pickle
+    themselves as a PickleBuffer, which bytes and bytearray don't, and
+    reducer_override() isn't consulted for them either; persistent_id()
+    is, so they are replaced by a persistent id and kept in self.blobs.
+    """
+    def __init__(self, file, min_out_of_band_size, buffer_callback):
+        super().__init__(file, protocol=5, buffer_callback=buffer_callback)
+        self.min_out_of_band_size = min_out_of_band_size
+        self.blobs = []
+        self._numbers = {}          # id(blob) -> its index in self.blobs
+
+    def persistent_id(self, obj):
+        if (type(obj) in (bytes, bytearray)
+                and len(obj) >= self.min_out_of_band_size):
+            # persistent_id() comes before pickle's memo, so a blob that's
+            # referred to twice is only stored once here.
+            number = self._numbers.get(id(obj))
+            if number is None:
+                number = self._numbers[id(obj)] = len(self.blobs)
+                self.blobs.append(obj)
+            return (type(obj) is bytearray, number)
+        return None
+
+
+class _Unpickler(pickle.Unpickler):
+    """Unpickler that rebuilds _Pickler's blobs from views of the
+    buffers file."""
+    def __init__(self, file, buffers, blobs):
+        super().__init__(file, buffers=buffers)
+        self.blobs = blobs
+        self._loaded = {}
+
+    def persistent_load(self, pid):
+        is_bytearray, number = pid
+        if number not in self._loaded:
+            view = self.blobs[number]
+            self._loaded[number] = (bytearray(view) if is_bytearray
+                                    else bytes(view))
+        return self._loaded[number]
+
+
+class StateStore:
+    """Protocol 5 pickle store with memory-mapped out-of-band buffers.
+
+    Loaded arrays share memory with the mapped buffers file. By default the
+    mapping is copy-on-write, so arrays can be modified in memory without
+    changing the checkpoint on disk; pass writable=False for read-only
+    arrays instead.
+    """
+    def __init__(self, path="state", writable=True):
+        self.path = path
+        self._access = mmap.ACCESS_COPY if writable else mmap.ACCESS_READ
+        self._index = None
+        self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # ---- saving ------------------------------------------------------------
+
+    def save(self, data_dict, min_out_of_band_size=MIN_OUT_OF_BAND_SIZE):
+        """Save every key of data_dict, replacing any previous state.
+
+        The new state is written to a temporary directory next to self.path
+        and only swapped in once complete, so an interrupted save leaves the
+        previous checkpoint intact.
+        """
+        self.close()
+        tmp_path = self.path + ".tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        index = {}
+        with open(os.path.join(tmp_path, _VALUES_FILE), 'wb') as values_file, \
+                open(os.path.join(tmp_path, _BUFFERS_FILE), 'wb') as buffers_file:
+            for key, value in data_dict.items():
+                buffers = []
+
+                def buffer_callback(buffer):
+                    # Returning a false value sends the buffer out-of-band.
+                    if buffer.raw().nbytes < min_out_of_band_size:
+                        return True
+                    buffers.append(buffer)
+                    return False
+
+                stream = io.BytesIO()
+                pickler = _Pickler(stream, min_out_of_band_size,
+                                   buffer_callback)
+                pickler.dump(value)
+                data = stream.getvalue()
+                locations = []
+                for buffer in buffers:
+                    raw = buffer.raw()
+                    locations.append(_write_buffer(buffers_file, raw))
+                    raw.release()
+                    buffer.release()
+                blob_locations = [_write_buffer(buffers_file, blob)
+                                  for blob in pickler.blobs]
+                index[key] = (values_file.tell(), len(data), locations,
+                              blob_locations)
+                values_file.write(data)
+
+        with open(os.path.join(tmp_path, _INDEX_FILE), 'wb') as index_file:
+            pickle.dump(index, index_file, protocol=5)
+
+        old_path = self.path + ".old"
+        if os.path.exists(self.path):
+            os.replace(self.path, old_path)
+        os.replace(tmp_path, self.path)
+        shutil.rmtree(old_path, ignore_errors=True)
+        self._index = index
+
+    # ---- loading -----------------------------------------------------------
+
+    def _load_index(self):
+        if self._index is None:
+            with open(os.path.join(self.path, _INDEX_FILE), 'rb') as file:
+                self._index = pickle.load(file)
+        return self._index
+
+    def _buffers_view(self):
+        if self._mmap is None:
+            with open(os.path.join(self.path, _BUFFERS_FILE), 'rb') as file:
+                if os.fstat(file.fileno()).st_size == 0:
+                    return memoryview(b'')
+                self._mmap = mmap.mmap(file.fileno(), 0, access=self._access)
+        return memoryview(self._mmap)
+
+    def keys(self):
+        """Return the keys of the saved state."""
+        return self._load_index().keys()
+
+    def __contains__(self, key):
+        return key in self._load_index()
+
+    def __len__(self):
+        return len(self._load_index())
+
+    def load(self, key):
+        """Load one key from the saved state.
+
+        Raises:
+            KeyError: If key wasn't saved.
+        """
+        offset, length, locations, blob_locations = self._load_index()[key]
+        with open(os.path.join(self.path, _VALUES_FILE), 'rb') as file:
+            file.seek(offset)
+            data = file.read(length)
+        if not locations and not blob_locations:
+            return pickle.loads(data)
+        view = self._buffers_view()
+        return _Unpickler(io.BytesIO(data),
+                          [view[start:start + nbytes]
+                           for start, nbytes in locations],
+                          [view[start:start + nbytes]
+                           for start, nbytes in blob_locations]).load()
+
+    def __getitem__(self, key):
+        return self.load(key)
+
+    def load_all(self, keys=None):
+        """Return a dict of the saved state, or of just the given keys."""
+        if keys is None:
+            keys = self.keys()
+        return {key: self.load(key) for key in keys}
+
+    def close(self):
+        """Forget the cached index and unmap the buffers file.
+
+        If loaded arrays still refer to the mapping, it stays open until
+        they are garbage collected.
+        """
+        self._index = None
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass
+            self._mmap = None
+
+
+def _write_buffer(file, buffer):
+    """Write buffer at the next ALIGNMENT boundary of file; return its
+    (offset, size)."""
+    file.write(b'\0' * (-file.tell() % ALIGNMENT))
+    location = (file.tell(), memoryview(buffer).nbytes)
+    file.write(buffer)
+    return location
+
+
+def save_data(data_dict, path="state"):
+    """Save data_dict to path with out-of-band buffers."""
+    StateStore(path).save(data_dict)
+
+def restore_data(path="state", keys=None):
+    """Restore the state saved to path, or just the given keys of it."""
+    return StateStore(path).load_all(keys)
+
+
+if __name__ == '__main__':
+    import tempfile
+
+    path = os.path.join(tempfile.mkdtemp(), "state")
+    data_dict = {'a': 42,
+                 'b': 3.14,
+                 'c': "test",
+                 'd': bytearray(1024 * 1024)}
+    save_data(data_dict, path)
+    print({name: os.path.getsize(os.path.join(path, name))
+           for name in sorted(os.listdir(path))})
+    print(restore_data(path, keys=['a', 'c']))
+    d = restore_data(path)['d']
+    print(type(d).__name__, len(d))
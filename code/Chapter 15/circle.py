@@ -1,12 +1,34 @@
 """circle module: contains the Circle class."""
+import weakref
+
 class Circle:
     """Circle class"""
-    all_circles = []             #A
+    all_circles = weakref.WeakSet()             #A
     pi = 3.14159
+    _count = 0                 # live circles
+    _radius_squares = 0        # sum of radius * radius over live circles
     def __init__(self, r=1):
         """Create a Circle with the given radius"""
+        self._radius = 0
+        Circle._count += 1
         self.radius = r
-        self.__class__.all_circles.append(self)   #B
+        self.__class__.all_circles.add(self)   #B
+    @property
+    def radius(self):
+        return self._radius
+    @radius.setter
+    def radius(self, r):
+        """Keep the running total up to date as the radius changes"""
+        Circle._radius_squares += r * r - self._radius * self._radius
+        self._radius = r
+    def __del__(self):
+        """Remove a collected Circle from the running total"""
+        Circle._count -= 1
+        if Circle._count:
+            Circle._radius_squares -= self._radius * self._radius
+        else:
+            # reset rather than let float rounding errors build up
+            Circle._radius_squares = 0
     def area(self):
         """determine the area of the Circle"""
         return self.__class__.pi * self.radius * self.radius
@@ -14,8 +36,4 @@ class Circle:
     @staticmethod
     def total_area():
         """Static method to total the areas of all Circles """
-        total = 0
-        for c in Circle.all_circles:
-            total = total + c.area()
-        return total
-        
\ No newline at end of file
+        return Circle.pi * Circle._radius_squares
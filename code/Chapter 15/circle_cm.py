@@ -1,26 +1,45 @@
 """circle_cm module: contains the Circle class."""
+import weakref
+
 class Circle:
     """Circle class"""
-    all_circles = []              #A
+    all_circles = weakref.WeakSet()              #A
     pi = 3.14159
+    _count = 0                 # live circles
+    _radius_sum = 0            # sum of radius over live circles
+    _radius_squares = 0        # sum of radius * radius over live circles
     def __init__(self, r=1):
         """Create a Circle with the given radius"""
+        self._radius = 0
+        Circle._count += 1
         self.radius = r
-        self.__class__.all_circles.append(self)
+        self.__class__.all_circles.add(self)
+    @property
+    def radius(self):
+        return self._radius
+    @radius.setter
+    def radius(self, r):
+        """Keep the running totals up to date as the radius changes"""
+        Circle._radius_sum += r - self._radius
+        Circle._radius_squares += r * r - self._radius * self._radius
+        self._radius = r
+    def __del__(self):
+        """Remove a collected Circle from the running totals"""
+        Circle._count -= 1
+        if Circle._count:
+            Circle._radius_sum -= self._radius
+            Circle._radius_squares -= self._radius * self._radius
+        else:
+            # reset rather than let float rounding errors build up
+            Circle._radius_sum = Circle._radius_squares = 0
     def area(self):
         """determine the area of the Circle"""
         return self.__class__.pi * self.radius * self.radius
 
     @classmethod             #A
     def total_area(cls):              #B
-        total = 0
-        for c in cls.all_circles:          #C
-            total = total + c.area()
-        return total
+        return cls.pi * cls._radius_squares
 
     @classmethod
     def total_circumference(cls):
-        total = 0
-        for c in cls.all_circles:
-            total = total + 2 * cls.pi * c.radius
-        return total
+        return 2 * cls.pi * cls._radius_sum
@@ -0,0 +1,205 @@
+"""typed_list module: contains TypedList, ArrayTypedList and typed_list.
+
+TypedList is the list-backed class from section 17.8 and checks every element
+as it's added. ArrayTypedList stores int, float and bytes elements unboxed in
+an array.array, checks whole batches at once in extend(), and exposes its
+storage through the buffer protocol so NumPy or struct can read it without a
+copy. typed_list() picks the right class for an example element.
+
+ArrayTypedList's int elements are 64-bit and its bytes elements are single
+bytes. typed_list() only uses it for bytes when asked to, and falls back to
+TypedList when the initial ints don't fit in 64 bits.
+"""
+
+from array import array
+
+# Storage type codes for the element types that can be kept unboxed.
+# bytes elements are single bytes, so they are stored one per 'B' slot.
+ARRAY_TYPECODES = {int: 'q', float: 'd', bytes: 'B'}
+
+
+class TypedList:
+    """List-backed typed list that checks each element as it's added."""
+    def __init__(self, example_element, initial_list=[]):
+        self.type = type(example_element)
+        if not isinstance(initial_list, list):
+            raise TypeError("Second argument of TypedList must "
+                            "be a list.")
+        for element in initial_list:
+            self.__check(element)
+        self.elements = initial_list[:]
+    def __check(self, element):
+        if type(element) != self.type:
+            raise TypeError("Attempted to add an element of "
+                            "incorrect type to a typed list.")
+    def __setitem__(self, i, element):
+        self.__check(element)
+        self.elements[i] = element
+    def __getitem__(self, i):
+        return self.elements[i]
+    def __delitem__(self, i):
+        del self.elements[i]
+    def __len__(self):
+        return len(self.elements)
+    def append(self, element):
+        self.__check(element)
+        self.elements.append(element)
+    def extend(self, elements):
+        for element in elements:
+            self.append(element)
+
+
+class ArrayTypedList:
+    """Typed list for int, float or bytes elements, stored in an array.array.
+
+    int elements must fit in a signed 64-bit integer (OverflowError
+    otherwise), and bytes elements must be exactly one byte long.
+
+    Elements are checked with the same exact type() comparison as TypedList,
+    but extend() checks a whole batch in one pass before anything is added,
+    so a bad element leaves the list unchanged. Extending from an array.array
+    of the same type code (or, for bytes, from any bytes-like object) skips
+    the per-element check entirely.
+
+    The storage supports the buffer protocol, so memoryview(x),
+    numpy.frombuffer(x, ...) and struct.unpack_from(fmt, x) all read it in
+    place. As with array.array, the list can't change size while a buffer
+    view is still held.
+    """
+    def __init__(self, example_element, initial_list=()):
+        self.type = type(example_element)
+        if self.type not in ARRAY_TYPECODES:
+            raise TypeError(f"ArrayTypedList can't store "
+                            f"{self.type.__name__} elements; use TypedList.")
+        self.typecode = ARRAY_TYPECODES[self.type]
+        self._data = array(self.typecode)
+        self.extend(initial_list)
+
+    def _check(self, element):
+        if type(element) != self.type:
+            raise TypeError("Attempted to add an element of "
+                            "incorrect type to a typed list.")
+        if self.type is bytes and len(element) != 1:
+            raise ValueError("bytes elements of a typed list must be "
+                             "exactly one byte long.")
+
+    def _unbox(self, element):
+        self._check(element)
+        return element[0] if self.type is bytes else element
+
+    def __len__(self):
+        return len(self._data)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            result = ArrayTypedList.__new__(ArrayTypedList)
+            result.type = self.type
+            result.typecode = self.typecode
+            result._data = self._data[i]
+            return result
+        if self.type is bytes:
+            return bytes((self._data[i],))
+        return self._data[i]
+
+    def __setitem__(self, i, element):
+        if isinstance(i, slice):
+            self._data[i] = self._as_array(element)
+        else:
+            self._data[i] = self._unbox(element)
+
+    def __delitem__(self, i):
+        del self._data[i]
+
+    def __iter__(self):
+        if self.type is bytes:
+            return (bytes((b,)) for b in self._data)
+        return iter(self._data)
+
+    def __eq__(self, other):
+        if isinstance(other, ArrayTypedList):
+            return self.type is other.type and self._data == other._data
+        return NotImplemented
+
+    def __repr__(self):
+        return f"ArrayTypedList({self.type.__name__}, {list(self)!r})"
+
+    def __buffer__(self, flags):
+        return memoryview(self._data)
+
+    def __release_buffer__(self, view):
+        view.release()
+
+    def _as_array(self, elements):
+        """Convert elements to an array of our type code, checking them all
+        before returning."""
+        if isinstance(elements, array) and elements.typecode == self.typecode:
+            return elements
+        if isinstance(elements, ArrayTypedList) and elements.type is self.type:
+            return elements._data
+        if self.type is bytes:
+            if isinstance(elements, (bytes, bytearray, memoryview)):
+                return array('B', elements)
+            elements = list(elements)
+            for element in elements:
+                self._check(element)
+            return array('B', b''.join(elements))
+        elements = list(elements)
+        # map(type, ...) runs in C, so this is one fast pass over the batch
+        # instead of a Python-level check per element.
+        if not set(map(type, elements)) <= {self.type}:
+            raise TypeError("Attempted to add an element of "
+                            "incorrect type to a typed list.")
+        return array(self.typecode, elements)
+
+    def append(self, element):
+        if type(element) != self.type or self.type is bytes:
+            element = self._unbox(element)
+        self._data.append(element)
+
+    def extend(self, elements):
+        self._data.extend(self._as_array(elements))
+
+    def tobytes(self):
+        """Return a copy of the raw storage as bytes."""
+        return self._data.tobytes()
+
+    def to_numpy(self):
+        """Return a NumPy array that shares this list's storage (no copy)."""
+        import numpy as np
+        return np.frombuffer(self._data, dtype=self._data.typecode)
+
+
+def typed_list(example_element, initial_list=(), single_bytes=False):
+    """Return an ArrayTypedList if example_element's type can be stored
+    unboxed, otherwise a list-backed TypedList.
+
+    Args:
+        example_element: An element of the type the list will hold.
+        initial_list: Elements to start with.
+        single_bytes: Store bytes elements one byte each in an
+            ArrayTypedList; without it, bytes of any length are kept in a
+            TypedList.
+    """
+    element_type = type(example_element)
+    initial_list = list(initial_list)
+    if element_type in ARRAY_TYPECODES and (element_type is not bytes
+                                            or single_bytes):
+        try:
+            return ArrayTypedList(example_element, initial_list)
+        except OverflowError:
+            # Some int doesn't fit in 64 bits.
+            pass
+    return TypedList(example_element, initial_list)
+
+
+if __name__ == '__main__':
+    x = typed_list(1.0, [1.0, 2.0, 3.0])
+    x.append(4.0)
+    x.extend(array('d', [5.0, 6.0]))
+    print(x, len(x))
+    view = memoryview(x)
+    print(view.format, view.nbytes, view.tolist())
+    view.release()
+
+    y = typed_list("", ["Hello", "There"])
+    print(type(y).__name__, y[0], y[1])
@@ -0,0 +1,122 @@
+"""
+TypedList benchmark: list-backed TypedList vs array-backed ArrayTypedList
+
+Compares memory use and append/extend throughput for float and int elements.
+
+Run with: python typed_list_benchmark.py
+"""
+
+import time
+import tracemalloc
+from array import array
+
+from typed_list import ArrayTypedList, TypedList
+
+
+def benchmark(func, runs=3):
+    """Run a function multiple times and return average time."""
+    times = []
+    result = None
+    for i in range(runs):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        times.append(elapsed)
+    avg_time = sum(times) / len(times)
+    return avg_time, result
+
+
+def measure_memory(func):
+    """Return the bytes still allocated by the object func() builds."""
+    tracemalloc.start()
+    result = func()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current
+
+
+def print_result(operation, list_value, array_value, higher_is_better=True):
+    """Print one row of results with how much better ArrayTypedList did."""
+    if higher_is_better:
+        ratio = array_value / list_value
+    else:
+        ratio = list_value / array_value
+    print(f"  {operation:32} | {list_value:12,.1f} | {array_value:12,.1f} | "
+          f"{ratio:6.1f}x")
+
+
+def run_benchmarks(example, n):
+    """Run all benchmarks for one element type and size."""
+    values = [example * i for i in range(n)]
+
+    def append_list():
+        x = TypedList(example)
+        for value in values:
+            x.append(value)
+        return x
+
+    def append_array():
+        x = ArrayTypedList(example)
+        for value in values:
+            x.append(value)
+        return x
+
+    def extend_list():
+        x = TypedList(example)
+        x.extend(values)
+        return x
+
+    def extend_array():
+        x = ArrayTypedList(example)
+        x.extend(values)
+        return x
+
+    typecode = 'd' if isinstance(example, float) else 'q'
+    source = array(typecode, values)
+
+    def extend_array_from_array():
+        x = ArrayTypedList(example)
+        x.extend(source)
+        return x
+
+    print(f"\n  {'Operation':32} | {'TypedList':>12} | {'ArrayTyped':>12} | Gain")
+    print("  " + "-" * 75)
+
+    list_mem = measure_memory(lambda: TypedList(example, [example * i for i in range(n)]))
+    array_mem = measure_memory(lambda: ArrayTypedList(example, (example * i for i in range(n))))
+    print_result("Memory (KiB)", list_mem / 1024, array_mem / 1024,
+                 higher_is_better=False)
+
+    list_time, _ = benchmark(append_list)
+    array_time, _ = benchmark(append_array)
+    print_result("append() (k elements/s)", n / list_time / 1000,
+                 n / array_time / 1000)
+
+    list_time, _ = benchmark(extend_list)
+    array_time, _ = benchmark(extend_array)
+    print_result("extend(list) (k elements/s)", n / list_time / 1000,
+                 n / array_time / 1000)
+
+    # Compared against TypedList.extend(list), the nearest equivalent.
+    array_time, _ = benchmark(extend_array_from_array)
+    print_result("extend(array) (k elements/s)", n / list_time / 1000,
+                 n / array_time / 1000)
+
+
+def main():
+    print("=" * 80)
+    print("TypedList benchmark: list storage vs array.array storage")
+    print("=" * 80)
+
+    for example in (1.0, 1):
+        for n in (10_000, 1_000_000):
+            print(f"\n{type(example).__name__} elements, {n:,} elements")
+            run_benchmarks(example, n)
+
+
+if __name__ == "__main__":
+    main()
+    print("\n" + "=" * 80)
+    print("Benchmark complete!")
+    print("=" * 80)
@@ -16,12 +16,32 @@ Original file is located at
 ! mkdir mathproj/comp
 ! mkdir mathproj/comp/numeric
 
-open("mathproj/__init__.py", "w").write("""print("Hello from mathproj init")
+open("mathproj/__init__.py", "w").write("""import importlib
+
 __all__ = ['comp']
-version = 1.03""")
+version = 1.03
+
+
+def __getattr__(name):
+    # Subpackages in __all__ are imported the first time they're used
+    # (PEP 562), not when mathproj is.
+    if name in __all__:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+""")
 
-open("mathproj/comp/__init__.py", "w").write("""__all__ = ['c1']
-print("Hello from mathproj.comp init")""")
+open("mathproj/comp/__init__.py", "w").write("""import importlib
+
+__all__ = ['c1']
+print("Hello from mathproj.comp init")
+
+
+def __getattr__(name):
+    # Submodules in __all__ are imported the first time they're used.
+    if name in __all__:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+""")
 open("mathproj/comp/numeric/__init__.py", "w").write("""print("Hello from numeric init")""")
 open("mathproj/comp/c1.py", "w").write("""x = 1.00""")
 open("mathproj/comp/numeric/n1.py", "w").write("""# File mathproj/comp/numeric/n1.py
@@ -40,16 +60,34 @@ open("mathproj/comp/numeric/n2.py", "w").write("""def h():
 # %%writefile mathproj/__init__.py
 # # File mathproj/__init__.py
 # 
-# print("Hello from mathproj init")
+# import importlib
+# 
 # __all__ = ['comp']
 # version = 1.03
+# 
+# 
+# def __getattr__(name):
+#     # Subpackages in __all__ are imported the first time they're used
+#     # (PEP 562), not when mathproj is.
+#     if name in __all__:
+#         return importlib.import_module(f".{name}", __name__)
+#     raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Commented out IPython magic to ensure Python compatibility.
 # %%writefile mathproj/comp/__init__.py
 # # File mathproj/comp/__init__.py
 # 
+# import importlib
+# 
 # __all__ = ['c1']
 # print("Hello from mathproj.comp init")
+# 
+# 
+# def __getattr__(name):
+#     # Submodules in __all__ are imported the first time they're used.
+#     if name in __all__:
+#         return importlib.import_module(f".{name}", __name__)
+#     raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Commented out IPython magic to ensure Python compatibility.
 # %%writefile mathproj/comp/c1.py
@@ -81,7 +119,9 @@ open("mathproj/comp/numeric/n2.py", "w").write("""def h():
 # def h():
 #     return "Called function h in module n2"
 
-"""## 18.3.2 Basic use of the mathproj package"""
+"""The `mathproj/__init__.py` and `mathproj/comp/__init__.py` above differ from the book's versions: instead of printing when they're imported, they define a module-level `__getattr__` (PEP 562) that imports a subpackage or submodule listed in `__all__` the first time it's used. So `import mathproj` prints nothing, and `mathproj.comp` is loaded on first use, but `numeric`, which isn't in `mathproj.comp.__all__`, still has to be imported explicitly, as below.
+
+## 18.3.2 Basic use of the mathproj package"""
 
 import mathproj
 
@@ -1,5 +1,14 @@
 # File mathproj/__init__.py
 
-print("Hello from mathproj init")
+import importlib
+
 __all__ = ['comp']
 version = 1.03
+
+
+def __getattr__(name):
+    # Subpackages in __all__ are imported the first time they're used
+    # (PEP 562), not when mathproj is.
+    if name in __all__:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,4 +1,13 @@
 # File mathproj/comp/__init__.py
 
+import importlib
+
 __all__ = ['c1']
 print("Hello from mathproj.comp init")
+
+
+def __getattr__(name):
+    # Submodules in __all__ are imported the first time they're used.
+    if name in __all__:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
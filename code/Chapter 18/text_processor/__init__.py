@@ -1,25 +1,41 @@
-"""Text processor package for cleaning and analyzing text files."""
-
-from .exceptions import TextProcessingError, InvalidInputError, InvalidValueError
-from .cleaning import clean_line, write_words_to_file
-from .processing import (
-    count_word_occurrences,
-    print_common_words,
-    print_least_common_words,
-    process_file,
-)
-
-__all__ = [
+"""Text processor package for cleaning and analyzing text files.
+
+The names below are loaded from their submodules on first use (PEP 562),
+so importing the package itself doesn't import any of them.
+"""
+
+import importlib
+
+# Exported name -> submodule that defines it.
+_EXPORTS = {
     # Exceptions
-    'TextProcessingError',
-    'InvalidInputError',
-    'InvalidValueError',
+    'TextProcessingError': 'exceptions',
+    'InvalidInputError': 'exceptions',
+    'InvalidValueError': 'exceptions',
     # Cleaning functions
-    'clean_line',
-    'write_words_to_file',
+    'clean_line': 'cleaning',
+    'write_words_to_file': 'cleaning',
     # Processing functions
-    'count_word_occurrences',
-    'print_common_words',
-    'print_least_common_words',
-    'process_file',
-]
+    'count_word_occurrences': 'processing',
+    'print_common_words': 'processing',
+    'print_least_common_words': 'processing',
+    'process_file': 'processing',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    """Import an exported name's submodule the first time it's used."""
+    try:
+        module_name = _EXPORTS[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute "
+                             f"{name!r}") from None
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1 +1,11 @@
-print("Hello from package_name")
+import importlib
+
+_SUBPACKAGES = ('subpackage1', 'subpackage2')
+
+
+def __getattr__(name):
+    # Subpackages are imported the first time they're used (PEP 562), so
+    # importing package_name itself stays cheap and silent.
+    if name in _SUBPACKAGES:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,197 @@
+"""excel_io module: constant-memory Excel reading and writing.
+
+Section 21.3 loads workbooks with load_workbook('temp_data_01.xlsx'), which
+builds a Cell object for every cell in the file, and section 21.5.2 writes
+with Workbook() and ws.append(), which keeps every written cell in memory
+until save(). The functions here use openpyxl's read-only mode (rows are
+parsed from the XML as they're iterated, and only values are returned) and
+write-only mode (rows are streamed to a temporary file as they're
+appended), so memory use stays flat however many rows there are.
+"""
+
+import csv
+
+from openpyxl import Workbook, load_workbook
+
+# Rows per worksheet allowed by Excel; longer exports continue on a new sheet.
+MAX_SHEET_ROWS = 1_048_576
+# Rows collected before each write when converting to Parquet.
+PARQUET_BATCH_ROWS = 65_536
+# Batches held back while a column is still all empty, waiting for a value
+# to infer its type from.
+MAX_INFER_BATCHES = 16
+
+
+def iter_rows(path, sheet=0, min_row=1, max_row=None):
+    """Yield each row of a worksheet as a tuple of cell values.
+
+    Args:
+        path: Path to the .xlsx file.
+        sheet: Worksheet index or name.
+        min_row, max_row: Optional 1-based range of rows to read.
+    """
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet] if isinstance(sheet, str) else wb.worksheets[sheet]
+        yield from ws.iter_rows(min_row=min_row, max_row=max_row,
+                                values_only=True)
+    finally:
+        # Read-only workbooks keep the file open until closed.
+        wb.close()
+
+
+def read_rows(path, sheet=0):
+    """Return every row of a worksheet as a list of lists."""
+    return [list(row) for row in iter_rows(path, sheet)]
+
+
+def write_rows(path, rows, title="Sheet", header=None):
+    """Write rows to a new workbook in write-only mode.
+
+    If there are more rows than fit on one worksheet, the rest continue on
+    sheets named title_2, title_3 and so on, each starting with header.
+
+    Args:
+        path: Path of the .xlsx file to create.
+        rows: Any iterable of row sequences; it's consumed lazily.
+        title: Name of the first worksheet.
+        header: Optional header row written at the top of every sheet.
+
+    Returns:
+        The number of rows written, not counting headers.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title)
+    sheet_rows = 0
+    sheets = 1
+    if header is not None:
+        ws.append(header)
+        sheet_rows = 1
+    count = 0
+    for row in rows:
+        if sheet_rows == MAX_SHEET_ROWS:
+            sheets += 1
+            ws = wb.create_sheet(f"{title}_{sheets}")
+            sheet_rows = 0
+            if header is not None:
+                ws.append(header)
+                sheet_rows = 1
+        ws.append(row)
+        sheet_rows += 1
+        count += 1
+    wb.save(path)
+    return count
+
+
+def csv_to_xlsx(csv_path, xlsx_path, title="Sheet", **fmtparams):
+    """Stream a CSV file into a new workbook (section 21.5.2 without
+    loading the file into a list first).
+
+    The first row of the CSV file is used as the header of every sheet.
+    """
+    with open(csv_path, newline='') as infile:
+        reader = csv.reader(infile, **fmtparams)
+        header = next(reader, None)
+        return write_rows(xlsx_path, reader, title, header)
+
+
+def xlsx_to_csv(xlsx_path, csv_path, sheet=0, **fmtparams):
+    """Convert a worksheet to CSV in one streaming pass.
+
+    Returns:
+        The number of rows written.
+    """
+    count = 0
+    with open(csv_path, 'w', newline='', buffering=1024 * 1024) as outfile:
+        writer = csv.writer(outfile, **fmtparams)
+        for row in iter_rows(xlsx_path, sheet):
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def xlsx_to_parquet(xlsx_path, parquet_path, sheet=0, schema=None,
+                    na_values=('Missing',), batch_rows=PARQUET_BATCH_ROWS):
+    """Convert a worksheet to a Parquet file in one streaming pass.
+
+    The first row is used as column names. Rows are gathered into column
+    batches of batch_rows and each batch is written as its own row group,
+    so only one batch is held in memory at a time.
+
+    Args:
+        schema: Optional pyarrow.Schema. By default the types are inferred
+            from the first batch and later batches must match them. As
+            Excel stores whole-number floats as ints, integer columns are
+            inferred as float64. While some column is still empty, up to
+            MAX_INFER_BATCHES batches are held back to infer it from; after
+            that it's written as strings.
+        na_values: Cell values written as nulls.
+
+    Returns:
+        The number of data rows written.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    rows = iter_rows(xlsx_path, sheet)
+    names = [str(name) for name in next(rows)]
+    na_values = set(na_values)
+    writer = None
+    count = 0
+
+    def infer_schema(inferred):
+        fields = []
+        for field in inferred:
+            if pa.types.is_integer(field.type):
+                field = field.with_type(pa.float64())
+            elif pa.types.is_null(field.type):
+                field = field.with_type(pa.string())
+            fields.append(field)
+        return pa.schema(fields)
+
+    pending = []
+
+    def write_batch(columns, final=False):
+        nonlocal writer, schema
+        data = dict(zip(names, columns))
+        if schema is None:
+            pending.append(data)
+            merged = {name: [value for batch in pending for value in batch[name]]
+                      for name in names}
+            inferred = pa.Table.from_pydict(merged).schema
+            if (any(pa.types.is_null(field.type) for field in inferred)
+                    and len(pending) < MAX_INFER_BATCHES and not final):
+                return
+            schema = infer_schema(inferred)
+            batches = pending[:]
+            pending.clear()
+        else:
+            batches = [data] if columns[0] else []
+        if writer is None:
+            writer = pq.ParquetWriter(parquet_path, schema)
+        for batch in batches:
+            if batch[names[0]]:
+                writer.write_table(pa.Table.from_pydict(batch,
+                                                        schema=schema))
+
+    try:
+        columns = [[] for _ in names]
+        for row in rows:
+            for column, value in zip(columns, row):
+                column.append(None if value in na_values else value)
+            count += 1
+            if count % batch_rows == 0:
+                write_batch(columns)
+                columns = [[] for _ in names]
+        write_batch(columns, final=True)
+    finally:
+        if writer is not None:
+            writer.close()
+    return count
+
+
+if __name__ == '__main__':
+    rows = read_rows('temp_data_01.xlsx')
+    print(len(rows), "rows;", rows[1])
+    print(xlsx_to_csv('temp_data_01.xlsx', 'temp_data_01_stream.csv'),
+          "rows written to temp_data_01_stream.csv")
@@ -0,0 +1,289 @@
+"""row_pipeline module: contains the pipeline function and Pipeline class.
+
+A Pipeline describes a filter-and-transform pass over the rows of a
+delimited file, such as the Lab 21 extraction of Cook County from the
+Illinois weather file:
+
+    with open("Illinois_weather_1979-2011.txt", newline='') as infile, \\
+            open("chicago_weather_1979-2011.csv", "w", newline='') as outfile:
+        reader = csv.reader(infile, delimiter="\\t")
+        stats = (pipeline(reader)
+                 .stop_at('---')
+                 .where(county='Cook')
+                 .drop(0, 1)
+                 .replace('Missing', '')
+                 .percent_to_fraction(-1)
+                 .write(outfile))
+    print(stats)
+
+The steps are only recorded as they're chained. write() turns them into the
+source of one generator function, with every step inlined into a single
+loop, and sends its output through one csv.writer. A pipeline built from a
+file path instead of a reader can also be sharded across processes.
+"""
+
+import csv
+import io
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from weather_csv import split_ranges
+
+class PipelineStats(namedtuple('PipelineStats', 'rows_in rows_out seconds')):
+    """Row counts and elapsed time for one run of a pipeline."""
+    __slots__ = ()
+
+    @property
+    def rows_per_second(self):
+        return self.rows_in / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        return (f"{self.rows_in:,} rows in, {self.rows_out:,} rows out in "
+                f"{self.seconds:.3f} s ({self.rows_per_second:,.0f} rows/s)")
+
+
+def _column_key(name):
+    """Normalize a header name so where(county=...) finds "County"."""
+    return name.strip().lower().replace(' ', '_')
+
+
+class Pipeline:
+    """A chain of row filters and transforms, compiled when it's run.
+
+    Steps are kept as plain tuples, so a pipeline can be sent to worker
+    processes and recompiled there.
+    """
+    def __init__(self, source, delimiter=',', header=True):
+        self.source = source
+        self.delimiter = delimiter
+        self.header = header
+        self.steps = []
+
+    def _add(self, *step):
+        self.steps.append(step)
+        return self
+
+    def stop_at(self, marker):
+        """Stop at the first row whose first field equals marker."""
+        return self._add('stop_at', marker)
+
+    def where(self, **conditions):
+        """Keep only rows matching every condition.
+
+        Keywords name columns by header (lowercase, spaces as underscores).
+        A string value matches a field equal to it, or a field starting
+        with it and a space, so county='Cook' matches 'Cook County, IL'.
+        A callable value is called with the field and should return True
+        to keep the row.
+        """
+        for column, value in conditions.items():
+            self._add('where', column, value)
+        return self
+
+    def replace(self, old, new):
+        """Replace every field equal to old with new."""
+        return self._add('replace', old, new)
+
+    def percent_to_fraction(self, column):
+        """Convert a field like '35.11%' in column to '0.3511'."""
+        return self._add('percent', column)
+
+    def drop(self, *columns):
+        """Remove columns (indexes or header names) from each row."""
+        return self._add('drop', columns)
+
+    # ---- compiling -----------------------------------------------------------
+
+    @staticmethod
+    def _index(column, header):
+        if isinstance(column, int):
+            if column < 0 and header is not None:
+                column += len(header)
+            return column
+        keys = [_column_key(name) for name in header or ()]
+        try:
+            return keys.index(_column_key(column))
+        except ValueError:
+            raise KeyError(f"no column {column!r} in header") from None
+
+    def compile(self, header=None):
+        """Return (output_header, process) for these steps.
+
+        output_header is the header with any dropped columns removed.
+        process(rows, counts) is a generator yielding output rows; it
+        stores the number of input rows read in counts[0].
+        """
+        # Track the header through drop steps, so column names and negative
+        # indexes in later steps refer to the row as it is at that point.
+        header = list(header) if header is not None else None
+        names = {}
+        lines = ["def process(rows, counts):",
+                 "    n = 0",
+                 "    for row in rows:",
+                 "        n += 1"]
+        for number, step in enumerate(self.steps):
+            kind = step[0]
+            if kind == 'stop_at':
+                names[f"_marker{number}"] = step[1]
+                lines += [f"        if row and row[0] == _marker{number}:",
+                          "            n -= 1",
+                          "            break"]
+            elif kind == 'where':
+                index = self._index(step[1], header)
+                value = step[2]
+                names[f"_value{number}"] = value
+                if callable(value):
+                    test = f"_value{number}(row[{index}])"
+                else:
+                    names[f"_prefix{number}"] = value + ' '
+                    test = (f"(row[{index}] == _value{number} or "
+                            f"row[{index}].startswith(_prefix{number}))")
+                lines += [f"        if not {test}:",
+                          "            continue"]
+            elif kind == 'replace':
+                names[f"_map{number}"] = {step[1]: step[2]}
+                lines += [f"        row = [_map{number}.get(f, f) for f in row]"]
+            elif kind == 'percent':
+                index = self._index(step[1], header)
+                lines += [f"        v = row[{index}]",
+                          "        if v.endswith('%'):",
+                          f"            row[{index}] = str(float(v[:-1]) / 100)"]
+            elif kind == 'drop':
+                indexes = {self._index(column, header) for column in step[1]}
+                if header is None and any(index < 0 for index in indexes):
+                    raise ValueError("negative drop indexes need a header")
+                for index in sorted(indexes, reverse=True):
+                    lines += [f"        del row[{index}]"]
+                    if header is not None:
+                        del header[index]
+        lines += ["        yield row",
+                  "    counts[0] = n"]
+        source = "\n".join(lines)
+        exec(compile(source, "<pipeline>", "exec"), names)
+        process = names['process']
+        process.source = source
+        return header, process
+
+    # ---- running -----------------------------------------------------------
+
+    def write(self, csv_out, processes=1):
+        """Run the pipeline, writing the output rows as CSV.
+
+        Args:
+            csv_out: An open text file (opened with newline='') or a path.
+            processes: Number of worker processes to shard the input
+                across; only possible when the pipeline reads from a path.
+
+        Returns:
+            A PipelineStats with the row counts and rows per second.
+        """
+        if isinstance(csv_out, (str, os.PathLike)):
+            with open(csv_out, 'w', newline='', buffering=1024 * 1024) as out:
+                return self.write(out, processes)
+        start = time.perf_counter()
+        from_path = isinstance(self.source, (str, os.PathLike))
+        if processes > 1:
+            if not from_path:
+                raise ValueError("sharding needs the pipeline to read from "
+                                 "a file path")
+            rows_in, rows_out = self._write_sharded(csv_out, processes)
+        elif from_path:
+            with open(self.source, newline='') as infile:
+                reader = csv.reader(infile, delimiter=self.delimiter)
+                rows_in, rows_out = self._write_rows(reader, csv_out)
+        else:
+            rows_in, rows_out = self._write_rows(self.source, csv_out)
+        return PipelineStats(rows_in, rows_out, time.perf_counter() - start)
+
+    def _write_rows(self, rows, csv_out):
+        rows = iter(rows)
+        writer = csv.writer(csv_out)
+        header = next(rows) if self.header else None
+        output_header, process = self.compile(header)
+        if output_header is not None:
+            writer.writerow(output_header)
+        counts = [0]
+        counted = _Counter(process(rows, counts))
+        writer.writerows(counted)
+        return counts[0], counted.count
+
+    def _write_sharded(self, csv_out, processes):
+        with open(self.source, 'rb') as infile:
+            header_line = infile.readline() if self.header else b''
+            data_start = infile.tell()
+        header = None
+        if self.header:
+            header = next(csv.reader([header_line.decode()],
+                                     delimiter=self.delimiter))
+            output_header, _ = self.compile(header)
+            csv.writer(csv_out).writerow(output_header)
+        ranges = split_ranges(self.source, data_start, processes * 4)
+        rows_in = rows_out = 0
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            shards = pool.map(_run_shard, *zip(*[
+                (self.source, start, end, self.delimiter, header, self.steps)
+                for start, end in ranges]))
+            for text, shard_in, shard_out, stopped in shards:
+                csv_out.write(text)
+                rows_in += shard_in
+                rows_out += shard_out
+                if stopped:
+                    break
+        return rows_in, rows_out
+
+
+class _Counter:
+    """Iterator wrapper counting the rows that pass through it."""
+    def __init__(self, rows):
+        self._rows = rows
+        self.count = 0
+
+    def __iter__(self):
+        for row in self._rows:
+            self.count += 1
+            yield row
+
+
+def _run_shard(path, start, end, delimiter, header, steps):
+    """Worker process: run the pipeline over one byte range of path and
+    return its CSV output and counts."""
+    with open(path, 'rb') as infile:
+        infile.seek(start)
+        text = infile.read(end - start).decode()
+    rows = list(csv.reader(io.StringIO(text, newline=''), delimiter=delimiter))
+    shard = Pipeline(None, delimiter, header=False)
+    shard.steps = steps
+    _, process = shard.compile(header)
+    out = io.StringIO()
+    counted = _Counter(process(rows, counts := [0]))
+    csv.writer(out).writerows(counted)
+    # If a stop_at step ended the loop early, later shards must be skipped.
+    stopped = counts[0] < len(rows)
+    return out.getvalue(), counts[0], counted.count, stopped
+
+
+def pipeline(source, delimiter=',', header=True):
+    """Start a Pipeline reading rows from source.
+
+    Args:
+        source: An iterable of rows (such as a csv.reader) or a file path.
+        delimiter: Field delimiter, used when source is a path.
+        header: Whether the first row is a header row.
+    """
+    return Pipeline(source, delimiter, header)
+
+
+if __name__ == '__main__':
+    with open("Illinois_weather_1979-2011.txt", newline='') as infile, \
+            open("chicago_weather_1979-2011.csv", "w", newline='') as outfile:
+        reader = csv.reader(infile, delimiter="\t")
+        stats = (pipeline(reader)
+                 .stop_at('---')
+                 .where(county='Cook')
+                 .drop(0, 1)
+                 .replace('Missing', '')
+                 .percent_to_fraction(-1)
+                 .write(outfile))
+    print(stats)
@@ -0,0 +1,235 @@
+"""forecast_scraper module: contains parse_forecast and scrape_directory.
+
+Lab 22's parse_html() builds a complete BeautifulSoup tree of the page with
+the pure-Python html.parser and then walks it twice with CSS selects, once
+for .forecast-label and once for .forecast-text. Only those two kinds of
+element are needed, so parse_forecast() offers three cheaper ways to find
+them:
+
+    'stream'    an html.parser subclass that keeps the text inside the
+                wanted elements and builds no tree at all (standard library)
+    'lxml'      lxml's C parser with a single XPath query
+    'strainer'  BeautifulSoup, but with a SoupStrainer so only the wanted
+                elements are turned into objects (lxml backend if installed)
+
+scrape_directory() runs one of them over a whole directory of saved pages
+in a process pool and writes every row through one buffered CSV writer:
+
+    scrape_directory("forecast_pages", "forecasts.csv")
+"""
+
+import csv
+import glob
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+
+FORECAST_CLASSES = ("forecast-label", "forecast-text")
+# Newer bs4 versions hand a SoupStrainer the raw class attribute, such as
+# "grid col-25 forecast-label", so match the class as a word within it.
+FORECAST_CLASS_PATTERN = re.compile(r"(?:^|\s)forecast-(?:label|text)(?:\s|$)")
+# Pages handed to a worker process at a time.
+CHUNKSIZE = 64
+
+
+class ForecastParser(HTMLParser):
+    """Streaming parser collecting the text of forecast label and text
+    elements, in document order.
+
+    After feed() and close(), labels and texts hold the strings found.
+    Like a tree parser, it includes the text of nested elements, and
+    elements still open at the end of the document are ended by close().
+    """
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.labels = []
+        self.texts = []
+        # One [tag, depth, target list, index in it, text parts] per open
+        # element being collected, outermost first; depth counts the
+        # open elements with the same tag, itself included.
+        self._open = []
+
+    def handle_starttag(self, tag, attrs):
+        for collector in self._open:
+            if collector[0] == tag:
+                collector[1] += 1
+        for name, value in attrs:
+            if name == 'class' and value:
+                classes = value.split()
+                if FORECAST_CLASSES[0] in classes:
+                    target = self.labels
+                elif FORECAST_CLASSES[1] in classes:
+                    target = self.texts
+                else:
+                    return
+                # Keep the element's place in document order; its text
+                # is filled in when it ends.
+                target.append(None)
+                self._open.append([tag, 1, target, len(target) - 1, []])
+                return
+
+    def handle_endtag(self, tag):
+        for collector in self._open:
+            if collector[0] == tag:
+                collector[1] -= 1
+        still_open = []
+        for collector in self._open:
+            if collector[1]:
+                still_open.append(collector)
+            else:
+                self._finish(collector)
+        self._open = still_open
+
+    def handle_data(self, data):
+        for collector in self._open:
+            collector[4].append(data)
+
+    @staticmethod
+    def _finish(collector):
+        _, _, target, index, parts = collector
+        target[index] = ''.join(parts)
+
+    def close(self):
+        super().close()
+        while self._open:
+            self._finish(self._open.pop())
+
+
+def _parse_stream(html):
+    parser = ForecastParser()
+    parser.feed(html)
+    parser.close()
+    return parser.labels, parser.texts
+
+
+def _parse_lxml(html):
+    import lxml.html
+
+    root = lxml.html.fromstring(html)
+    labels, texts = [], []
+    # One pass over the tree finds both classes, in document order.
+    for element in root.xpath(
+            "//*[contains(concat(' ', normalize-space(@class), ' '), "
+            "' forecast-label ') or "
+            "contains(concat(' ', normalize-space(@class), ' '), "
+            "' forecast-text ')]"):
+        classes = element.get('class').split()
+        target = labels if FORECAST_CLASSES[0] in classes else texts
+        target.append(element.text_content())
+    return labels, texts
+
+
+def _parse_strainer(html):
+    import bs4
+
+    try:
+        import lxml  # noqa: F401
+        features = "lxml"
+    except ImportError:
+        features = "html.parser"
+    strainer = bs4.SoupStrainer(class_=FORECAST_CLASS_PATTERN)
+    soup = bs4.BeautifulSoup(html, features, parse_only=strainer)
+    labels, texts = [], []
+    for element in soup.find_all(class_=list(FORECAST_CLASSES)):
+        target = labels if FORECAST_CLASSES[0] in element['class'] else texts
+        target.append(element.text)
+    return labels, texts
+
+
+PARSERS = {'stream': _parse_stream, 'lxml': _parse_lxml,
+           'strainer': _parse_strainer}
+
+
+def parse_forecast(html, method='stream'):
+    """Return a list of (label, forecast) pairs from a forecast page.
+
+    Gives the same result as parse_html() in chapter_22.py.
+
+    Args:
+        html: The page, as a str (or bytes for 'lxml' and 'strainer').
+        method: 'stream', 'lxml' or 'strainer'; see the module docstring.
+
+    Raises:
+        ValueError: If method isn't one of those.
+    """
+    try:
+        parse = PARSERS[method]
+    except KeyError:
+        raise ValueError(f"unknown method {method!r}; expected one of "
+                         f"{', '.join(PARSERS)}") from None
+    labels, texts = parse(html)
+    return list(zip(labels, texts))
+
+
+def _scrape_file(path, method):
+    """Worker process: parse one saved page."""
+    if method == 'stream':
+        with open(path, encoding='utf-8', errors='replace') as html_file:
+            html = html_file.read()
+    else:
+        # lxml and bs4 detect the encoding themselves from bytes.
+        with open(path, 'rb') as html_file:
+            html = html_file.read()
+    return os.path.basename(path), parse_forecast(html, method)
+
+
+def scrape_directory(directory, csv_path, pattern="*.html", method='stream',
+                     processes=None, chunksize=CHUNKSIZE):
+    """Scrape every saved forecast page in directory into one CSV file.
+
+    Each output row is (page file name, label, forecast). Pages are parsed
+    in a pool of worker processes; the rows come back to this process and
+    are written in file name order through a single buffered csv.writer.
+
+    Args:
+        directory: Directory holding the saved pages.
+        csv_path: Path of the CSV file to write.
+        pattern: Glob pattern selecting the pages.
+        method: Parser to use, as for parse_forecast().
+        processes: Number of worker processes (default: CPU count);
+            1 parses in this process.
+        chunksize: Pages sent to a worker at a time.
+
+    Returns:
+        A (pages, rows) tuple of counts.
+    """
+    if method not in PARSERS:
+        raise ValueError(f"unknown method {method!r}")
+    paths = sorted(glob.glob(os.path.join(directory, pattern)))
+    pages = rows = 0
+    with open(csv_path, 'w', newline='', buffering=1024 * 1024) as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(["page", "label", "forecast"])
+        if processes == 1:
+            results = (_scrape_file(path, method) for path in paths)
+            pages, rows = _write_results(writer, results)
+        else:
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                results = pool.map(_scrape_file, paths,
+                                   [method] * len(paths), chunksize=chunksize)
+                pages, rows = _write_results(writer, results)
+    return pages, rows
+
+
+def _write_results(writer, results):
+    rows = pages = 0
+    for name, pairs in results:
+        writer.writerows((name, label, text) for label, text in pairs)
+        rows += len(pairs)
+        pages += 1
+    return pages, rows
+
+
+if __name__ == '__main__':
+    with open("forecast.html") as html_file:
+        html = html_file.read()
+    for method in PARSERS:
+        start = time.perf_counter()
+        for _ in range(100):
+            values = parse_forecast(html, method)
+        elapsed = (time.perf_counter() - start) / 100
+        print(f"{method:>8}: {elapsed * 1000:.3f} ms per page, "
+              f"{len(values)} forecasts")
+    print(values[0])
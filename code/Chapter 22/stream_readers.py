@@ -0,0 +1,350 @@
+"""stream_readers module: contains iter_json, iter_xml, write_csv and
+write_sqlite.
+
+Section 22.3 reads JSON with json.load()/response.json() and XML with
+xmltodict.parse(), which build the whole document in memory, and more than
+once over: the raw text, then the parsed objects. The readers here yield
+one record at a time instead:
+
+    iter_json   an incremental parser for a JSON array (optionally nested
+                inside objects) or a stream of JSON values, such as JSON
+                Lines, that decodes each record as its text arrives
+    iter_xml    an ElementTree.iterparse() reader yielding each record
+                element as an xmltodict-style dict, and then clearing it
+
+Both take a path or an open file, including a streamed HTTP response
+(requests.get(url, stream=True).raw), and their records can go straight to
+write_csv() or write_sqlite(), so a payload of any size converts in
+constant memory:
+
+    with open("crime_all.json", "rb") as infile:
+        write_sqlite(iter_json(infile), "crime.db", "crime")
+"""
+
+import codecs
+import csv
+import json
+import os
+import sqlite3
+import xml.etree.ElementTree as ET
+
+CHUNK_SIZE = 64 * 1024
+# Rows sent to SQLite per executemany() call.
+SQLITE_BATCH_ROWS = 1000
+
+_WHITESPACE = " \t\n\r"
+_NUMBER_CHARS = "0123456789.eE+-"
+_decoder = json.JSONDecoder()
+
+
+class _JSONStream:
+    """Text buffer over a file, refilled in chunks, for iter_json."""
+    def __init__(self, infile, chunk_size):
+        self.infile = infile
+        self.chunk_size = chunk_size
+        self.decoder = None
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, size=None):
+        """Drop consumed text and read about size more characters.
+
+        Returns False once the file is exhausted.
+        """
+        if self.eof:
+            return False
+        text = ""
+        # A few bytes of a multi-byte character may decode to nothing yet.
+        while not text:
+            chunk = self.infile.read(size or self.chunk_size)
+            if not chunk:
+                self.eof = True
+            if isinstance(chunk, bytes):
+                if self.decoder is None:
+                    self.decoder = codecs.getincrementaldecoder('utf-8-sig')()
+                chunk = self.decoder.decode(chunk, final=self.eof)
+            text = chunk
+            if self.eof:
+                break
+        self.buffer = self.buffer[self.pos:] + text
+        self.pos = 0
+        return not self.eof
+
+    def peek(self):
+        """Return the next non-whitespace character, or '' at the end."""
+        while True:
+            while (self.pos < len(self.buffer)
+                   and self.buffer[self.pos] in _WHITESPACE):
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, chars):
+        char = self.peek()
+        if char == '' or char not in chars:
+            raise ValueError(f"expected one of {chars!r} in JSON, "
+                             f"found {char or 'end of input'!r}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Decode and return the next complete JSON value."""
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+                # A number cut off by the end of the buffer, as in "1" or
+                # "1.", may continue in the next chunk.
+                if self.eof or (end < len(self.buffer) and
+                                self.buffer[end] not in _NUMBER_CHARS):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # The value is longer than the buffer: read more, doubling the
+            # read size so a huge value isn't re-scanned once per chunk.
+            self.fill(size)
+            size *= 2
+
+
+def iter_json(source, path=(), chunk_size=CHUNK_SIZE):
+    """Yield the records of a JSON document without loading all of it.
+
+    If the document is an array, each of its items is yielded. Otherwise
+    the document is read as a sequence of JSON values, as in JSON Lines,
+    and each value is yielded. Only one record is decoded at a time.
+
+    Args:
+        source: A path, or a file opened in text or binary mode.
+        path: Keys leading to the array of records inside nested
+            objects, e.g. ('daily',) or ('data', 'items'). Values of
+            other keys on the way are decoded and discarded.
+        chunk_size: Characters (or bytes) read at a time.
+
+    Raises:
+        KeyError: If a key in path isn't found.
+        ValueError: If the document isn't valid JSON.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as infile:
+            yield from iter_json(infile, path, chunk_size)
+        return
+    stream = _JSONStream(source, chunk_size)
+    for key in path:
+        stream.expect('{')
+        while True:
+            if stream.peek() == '}':
+                raise KeyError(key)
+            name = stream.value()
+            stream.expect(':')
+            if name == key:
+                break
+            stream.value()
+            if stream.expect(',}') == '}':
+                raise KeyError(key)
+    if stream.peek() != '[':
+        if path:
+            raise ValueError(f"{'/'.join(path)} is not an array")
+        while stream.peek():
+            yield stream.value()
+        return
+    stream.expect('[')
+    if stream.peek() == ']':
+        return
+    while True:
+        yield stream.value()
+        if stream.expect(',]') == ']':
+            return
+
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def element_to_dict(element, strip_namespaces=True):
+    """Convert an element to a dict in the style of xmltodict.
+
+    Attributes become '@name' keys, child elements become keys (a list
+    if the tag repeats), and text becomes '#text', or the whole value if
+    the element has nothing else.
+    """
+    name = _local_name if strip_namespaces else str
+    result = {f"@{name(key)}": value for key, value in element.attrib.items()}
+    for child in element:
+        key = name(child.tag)
+        value = element_to_dict(child, strip_namespaces)
+        if key in result:
+            if not isinstance(result[key], list):
+                result[key] = [result[key]]
+            result[key].append(value)
+        else:
+            result[key] = value
+    text = (element.text or "").strip()
+    if not result:
+        return text or None
+    if text:
+        result['#text'] = text
+    return result
+
+
+def iter_xml(source, tag, strip_namespaces=True):
+    """Yield each record element of an XML document as a dict.
+
+    Elements are converted with element_to_dict() as soon as they end,
+    and then cleared, so the tree never holds more than one record.
+
+    Args:
+        source: A path, or a file opened in binary mode.
+        tag: The record element's tag: a local name such as 'data' (any
+            namespace) or a full '{namespace}data'. If record elements
+            are nested inside an element with the same tag, as in the
+            World Bank API's wb:data records inside a wb:data element,
+            only the innermost ones are records.
+        strip_namespaces: Drop namespaces from the keys of each dict.
+    """
+    match_local = not tag.startswith('{')
+    # Every open element, outermost first, so a finished element can be
+    # removed from its parent.
+    parents = []
+    # One flag per open element matching tag: True once a record has
+    # been found inside it, so it isn't a record itself.
+    open_matches = []
+    for event, element in ET.iterparse(source, events=('start', 'end')):
+        matches = (_local_name(element.tag) == tag if match_local
+                   else element.tag == tag)
+        if event == 'start':
+            parents.append(element)
+            if matches:
+                open_matches.append(False)
+            continue
+        parents.pop()
+        is_record = matches and not open_matches.pop()
+        if is_record:
+            yield element_to_dict(element, strip_namespaces)
+            if open_matches:
+                open_matches[-1] = True
+        # Anything that can't be part of a record still to come is no
+        # longer needed once it ends: detach it so its parent doesn't
+        # keep a stub per record.
+        if (is_record or not open_matches or open_matches[-1]) and parents:
+            element.clear()
+            parents[-1].remove(element)
+
+
+def flatten(record, prefix=""):
+    """Flatten nested dicts into one level with dotted keys; lists are
+    kept as JSON text."""
+    if not isinstance(record, dict):
+        return {prefix or "value": record}
+    flat = {}
+    for key, value in record.items():
+        name = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, list):
+            flat[name] = json.dumps(value)
+        else:
+            flat[name] = value
+    return flat
+
+
+def _first_and_rest(records):
+    records = iter(records)
+    for first in records:
+        return flatten(first), (flatten(record) for record in records)
+    return None, iter(())
+
+
+def write_csv(records, csv_path, fieldnames=None):
+    """Write records (dicts, flattened with flatten()) to a CSV file.
+
+    Args:
+        records: Any iterable of records; it's consumed lazily.
+        csv_path: Path of the CSV file to write.
+        fieldnames: Columns to write; by default the keys of the first
+            record. Keys not in fieldnames are ignored.
+
+    Returns:
+        The number of records written.
+    """
+    first, rest = _first_and_rest(records)
+    if first is None:
+        return 0
+    with open(csv_path, 'w', newline='', buffering=1024 * 1024) as outfile:
+        writer = csv.DictWriter(outfile, fieldnames or list(first),
+                                extrasaction='ignore')
+        writer.writeheader()
+        writer.writerow(first)
+        count = 1
+        for record in rest:
+            writer.writerow(record)
+            count += 1
+    return count
+
+
+def write_sqlite(records, db_path, table, columns=None,
+                 batch_rows=SQLITE_BATCH_ROWS):
+    """Insert records (dicts, flattened with flatten()) into a SQLite table.
+
+    The table is created if it doesn't exist. Rows are inserted in
+    batches, all in one transaction.
+
+    Args:
+        records: Any iterable of records; it's consumed lazily.
+        db_path: Path of the database file.
+        table: Name of the table.
+        columns: Columns to fill; by default the keys of the first record.
+            Missing keys are stored as NULL, and others are ignored.
+        batch_rows: Rows per executemany() call.
+
+    Returns:
+        The number of records inserted.
+    """
+    first, rest = _first_and_rest(records)
+    if first is None:
+        return 0
+    columns = columns or list(first)
+    quoted = ", ".join('"{}"'.format(column.replace('"', '""'))
+                       for column in columns)
+    insert = (f'INSERT INTO "{table}" ({quoted}) '
+              f'VALUES ({", ".join("?" * len(columns))})')
+    conn = sqlite3.connect(db_path)
+    count = 0
+    try:
+        with conn:
+            conn.execute(f'CREATE TABLE IF NOT EXISTS "{table}" ({quoted})')
+            batch = [tuple(first.get(column) for column in columns)]
+            for record in rest:
+                batch.append(tuple(record.get(column) for column in columns))
+                if len(batch) == batch_rows:
+                    conn.executemany(insert, batch)
+                    count += len(batch)
+                    batch = []
+            conn.executemany(insert, batch)
+            count += len(batch)
+    finally:
+        conn.close()
+    return count
+
+
+if __name__ == '__main__':
+    import requests
+
+    response = requests.get("https://api.worldbank.org/v2/country/CL/"
+                            "indicator/SP.POP.TOTL?format=xml", stream=True)
+    response.raw.decode_content = True
+    print(write_csv(iter_xml(response.raw, 'data'), "population.csv"),
+          "rows written to population.csv")
+
+    response = requests.get("https://data.cityofchicago.org/resource/"
+                            "6zsd-86xi.json?$where=date between "
+                            "'2015-01-10T12:00:00' and '2015-01-10T13:00:00'",
+                            stream=True)
+    response.raw.decode_content = True
+    print(write_sqlite(iter_json(response.raw), "crime.db", "crime"),
+          "rows written to crime.db")
@@ -0,0 +1,59 @@
+"""Tests for forecast_scraper's parsers, including unclosed markup.
+
+Run with: python -m unittest test_forecast_scraper
+"""
+
+import importlib.util
+import unittest
+
+from forecast_scraper import parse_forecast
+
+HAVE_LXML = importlib.util.find_spec('lxml') is not None
+HAVE_BS4 = importlib.util.find_spec('bs4') is not None
+
+# (page, expected pairs), the expected pairs being what parse_html() in
+# chapter_22.py returns.
+PAGES = [
+    ('<div class="row"><div class="forecast-label">Tonight</div>'
+     '<div class="forecast-text">Clear, low <b>50</b>.</div></div>',
+     [('Tonight', 'Clear, low 50.')]),
+    # The last text is never closed.
+    ('<div class="forecast-label">Tonight</div>'
+     '<div class="forecast-text">Clear</div>'
+     '<div class="forecast-label">Monday</div>'
+     '<div class="forecast-text">Sunny',
+     [('Tonight', 'Clear'), ('Monday', 'Sunny')]),
+    # Neither element is closed, so the text is inside the label.
+    ('<div class="forecast-label">Tonight<div class="forecast-text">Clear',
+     [('TonightClear', 'Clear')]),
+    # A stray end tag and a void element inside a text.
+    ('<div class="forecast-label">Tonight</span></div>'
+     '<div class="grid forecast-text">Clear<br>then cloudy</div>',
+     [('Tonight', 'Clearthen cloudy')]),
+]
+
+
+class ParseForecastTest(unittest.TestCase):
+    def check(self, method):
+        for html, expected in PAGES:
+            with self.subTest(html=html):
+                self.assertEqual(parse_forecast(html, method), expected)
+
+    def test_stream(self):
+        self.check('stream')
+
+    @unittest.skipUnless(HAVE_LXML, "lxml isn't installed")
+    def test_lxml(self):
+        self.check('lxml')
+
+    @unittest.skipUnless(HAVE_BS4, "bs4 isn't installed")
+    def test_strainer(self):
+        self.check('strainer')
+
+    def test_unknown_method(self):
+        with self.assertRaises(ValueError):
+            parse_forecast('', 'regex')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+"""Tests for weather_client against a local stand-in HTTP server.
+
+Run with: python -m unittest test_weather_client
+"""
+
+import asyncio
+import hashlib
+import http.server
+import tempfile
+import threading
+import unittest
+
+import weather_client
+from weather_client import FetchError, WeatherClient
+
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    """Serves server.pages (path -> body) with ETags; server.failures
+    (path -> list of (status, Retry-After)) are answered first."""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def _send(self, status, headers=(), body=b""):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        path = self.path.split('?')[0]
+        server.requests.append((path, dict(self.headers)))
+        failures = server.failures.get(path)
+        if failures:
+            status, retry_after = failures.pop(0)
+            self._send(status, [('Retry-After', retry_after)]
+                       if retry_after is not None else [])
+            return
+        if path not in server.pages:
+            self._send(404)
+            return
+        body = server.pages[path]
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if self.headers.get('If-None-Match') == etag:
+            self._send(304, [('ETag', etag)])
+            return
+        self._send(200, [('ETag', etag)], body)
+
+
+class WeatherClientTest(unittest.TestCase):
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0),
+                                                      StubHandler)
+        self.server.pages = {f'/city{i}': f'{{"day": {i}}}'.encode()
+                             for i in range(20)}
+        self.server.failures = {}
+        self.server.requests = []
+        self.server.connections = 0
+        threading.Thread(target=self.server.serve_forever,
+                         daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_port}"
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.directory.cleanup()
+
+    def run_client(self, work, **client_args):
+        async def run():
+            async with WeatherClient(self.directory.name, backoff=0.01,
+                                     **client_args) as client:
+                return await work(client)
+        return asyncio.run(run())
+
+    def test_connections_are_reused(self):
+        urls = [f"{self.base}/city{i}" for i in range(20)]
+        bodies = self.run_client(lambda client: client.fetch_many(urls),
+                                 concurrency=4, connections_per_host=2)
+        self.assertEqual(bodies, [self.server.pages[f'/city{i}']
+                                  for i in range(20)])
+        self.assertLessEqual(self.server.connections, 2)
+
+    def test_cached_response_is_revalidated_with_304(self):
+        url = f"{self.base}/city1"
+        first = self.run_client(lambda client: client.fetch(url))
+        second = self.run_client(lambda client: client.fetch(url))
+        self.assertEqual(first, second)
+        _, headers = self.server.requests[-1]
+        self.assertIn('If-None-Match', headers)
+
+    def test_fresh_cached_response_is_not_requested(self):
+        url = f"{self.base}/city1"
+        self.run_client(lambda client: client.fetch(url))
+        body = self.run_client(lambda client: client.fetch(url), max_age=60)
+        self.assertEqual(body, self.server.pages['/city1'])
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_server_errors_and_429_are_retried(self):
+        self.server.failures['/city2'] = [(503, None), (429, '0'),
+                                          (500, None)]
+        body = self.run_client(
+            lambda client: client.fetch(f"{self.base}/city2"))
+        self.assertEqual(body, self.server.pages['/city2'])
+        self.assertEqual(len(self.server.requests), 4)
+
+    def test_retries_run_out(self):
+        self.server.failures['/city2'] = [(503, None)] * 3
+        with self.assertRaises(FetchError) as caught:
+            self.run_client(lambda client: client.fetch(f"{self.base}/city2"),
+                            retries=2)
+        self.assertEqual(caught.exception.status, 503)
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_404_is_not_retried(self):
+        with self.assertRaises(FetchError) as caught:
+            self.run_client(
+                lambda client: client.fetch(f"{self.base}/nowhere"))
+        self.assertEqual(caught.exception.status, 404)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_backoff_does_not_hold_a_request_slot(self):
+        # With one slot, city4 is fetched while city3 waits to retry.
+        self.server.failures['/city3'] = [(503, '1')]
+        self.run_client(lambda client: client.fetch_many(
+            [f"{self.base}/city3", f"{self.base}/city4"]), concurrency=1)
+        self.assertEqual([path for path, _ in self.server.requests],
+                         ['/city3', '/city4', '/city3'])
+
+    def test_retry_after_is_capped(self):
+        class Response:
+            headers = {'Retry-After': '86400'}
+        client = WeatherClient(None)
+        self.assertEqual(client._retry_delay(0, Response()),
+                         weather_client.MAX_RETRY_AFTER)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,252 @@
+"""weather_client module: contains the WeatherClient class and fetch_all.
+
+Chapter 22 and the case study fetch each open-meteo archive and GHCN file
+with its own blocking requests.get() call. WeatherClient fetches them with
+aiohttp instead: one pooled session with keep-alive connections, a bound on
+how many requests are in flight, timeouts, retries with exponential backoff,
+and an on-disk response cache. Cached responses are revalidated with
+If-None-Match / If-Modified-Since, so unchanged files cost a 304 instead of
+a full download.
+
+    async with WeatherClient() as client:
+        history = await client.fetch_json(archive_url(41.879, -87.64975,
+                                                      "2024-07-01",
+                                                      "2024-07-31"))
+
+All URLs are absolute, so a client can be pointed at a local stand-in HTTP
+server just by building URLs for it.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import aiohttp
+
+ARCHIVE_API = "https://archive-api.open-meteo.com/v1/era5"
+GHCN_DAILY = "https://www.ncei.noaa.gov/pub/data/ghcn/daily"
+
+# Statuses worth retrying: rate limiting and server-side failures.
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+# Longest Retry-After, in seconds, the client will wait.
+MAX_RETRY_AFTER = 60
+
+
+class FetchError(Exception):
+    """Raised when a URL can't be fetched, after any retries."""
+    def __init__(self, url, status=None, message=""):
+        self.url = url
+        self.status = status
+        super().__init__(f"{url}: {status or ''} {message}".strip())
+
+
+def normalize_url(url, params=None):
+    """Return url with params added and the query sorted, so equivalent
+    requests share one cache entry."""
+    scheme, netloc, path, query, _ = urlsplit(url)
+    items = parse_qsl(query, keep_blank_values=True)
+    if params:
+        items.extend((key, str(value)) for key, value in params.items())
+    return urlunsplit((scheme.lower(), netloc.lower(), path,
+                       urlencode(sorted(items), safe=",:$'"), ''))
+
+
+def archive_url(latitude, longitude, start_date, end_date,
+                daily="temperature_2m_mean", base=ARCHIVE_API):
+    """Return the open-meteo archive URL for one location and date range."""
+    return normalize_url(base, {'latitude': latitude, 'longitude': longitude,
+                                'start_date': start_date,
+                                'end_date': end_date, 'daily': daily})
+
+
+def ghcn_url(station_id, base=GHCN_DAILY):
+    """Return the URL of a GHCN-Daily station's .dly file."""
+    return f"{base}/all/{station_id}.dly"
+
+
+class ResponseCache:
+    """On-disk cache of response bodies keyed by normalized URL.
+
+    Each entry is two files named after the SHA-256 of the URL: the body,
+    and a small JSON file with the URL, validators and fetch time.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode()).hexdigest()
+        base = os.path.join(self.directory, key[:2], key)
+        return base + ".body", base + ".json"
+
+    def get(self, url):
+        """Return (meta, body) for url, or (None, None) if not cached."""
+        body_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path) as meta_file:
+                meta = json.load(meta_file)
+            with open(body_path, 'rb') as body_file:
+                return meta, body_file.read()
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None, None
+
+    def put(self, url, body, headers):
+        """Store body along with the validators from headers."""
+        body_path, meta_path = self._paths(url)
+        os.makedirs(os.path.dirname(body_path), exist_ok=True)
+        meta = {'url': url, 'fetched': time.time(),
+                'etag': headers.get('ETag'),
+                'last_modified': headers.get('Last-Modified')}
+        # Write to temporary names first so a crash never leaves a body
+        # paired with the wrong metadata.
+        with open(body_path + ".tmp", 'wb') as body_file:
+            body_file.write(body)
+        os.replace(body_path + ".tmp", body_path)
+        self._write_meta(meta_path, meta)
+
+    def touch(self, url, meta):
+        """Record that a cached entry was revalidated just now."""
+        meta['fetched'] = time.time()
+        self._write_meta(self._paths(url)[1], meta)
+
+    @staticmethod
+    def _write_meta(meta_path, meta):
+        with open(meta_path + ".tmp", 'w') as meta_file:
+            json.dump(meta, meta_file)
+        os.replace(meta_path + ".tmp", meta_path)
+
+
+class WeatherClient:
+    """Pooled, concurrency-limited async HTTP client with a response cache.
+
+    Args:
+        cache_dir: Directory for cached responses, or None for no cache.
+        max_age: Seconds a cached response is used without revalidating
+            it; 0 (the default) always sends a conditional request.
+        concurrency: Maximum requests in flight at once.
+        connections_per_host: Size of the connection pool for each host.
+        timeout: Total seconds allowed for one request attempt.
+        retries: How many times to retry a failed request.
+        backoff: Base delay in seconds; attempt n waits about
+            backoff * 2 ** n, or the server's Retry-After if given (at
+            most MAX_RETRY_AFTER).
+    """
+    def __init__(self, cache_dir="weather_cache", max_age=0, concurrency=32,
+                 connections_per_host=16, timeout=60, retries=4, backoff=0.5):
+        self.cache = ResponseCache(cache_dir) if cache_dir else None
+        self.max_age = max_age
+        self.retries = retries
+        self.backoff = backoff
+        self._concurrency = concurrency
+        self._connections_per_host = connections_per_host
+        self._timeout = aiohttp.ClientTimeout(total=timeout)
+        self._session = None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self._concurrency,
+                                         limit_per_host=self._connections_per_host)
+        self._session = aiohttp.ClientSession(connector=connector,
+                                              timeout=self._timeout)
+        self._semaphore = asyncio.Semaphore(self._concurrency)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _retry_delay(self, attempt, response=None):
+        if response is not None:
+            retry_after = response.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                return min(int(retry_after), MAX_RETRY_AFTER)
+        # Jitter spreads out retries from many concurrent requests.
+        return self.backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+
+    async def fetch(self, url, params=None):
+        """Return the body of url as bytes, using the cache when possible.
+
+        Raises:
+            FetchError: For a non-retryable status, or once retries run out.
+        """
+        url = normalize_url(url, params)
+        meta, cached = (None, None)
+        if self.cache is not None:
+            meta, cached = await asyncio.to_thread(self.cache.get, url)
+            if meta and time.time() - meta['fetched'] < self.max_age:
+                return cached
+
+        headers = {}
+        if meta:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+        for attempt in range(self.retries + 1):
+            last_try = attempt == self.retries
+            # Only hold a slot while a request is in flight, not while
+            # backing off, so waiting retries don't block other URLs.
+            async with self._semaphore:
+                try:
+                    async with self._session.get(
+                            url, headers=headers) as response:
+                        if response.status == 304 and cached is not None:
+                            await asyncio.to_thread(self.cache.touch, url,
+                                                    meta)
+                            return cached
+                        if response.status == 200:
+                            body = await response.read()
+                            if self.cache is not None:
+                                await asyncio.to_thread(self.cache.put, url,
+                                                        body, response.headers)
+                            return body
+                        if response.status not in RETRY_STATUSES or last_try:
+                            raise FetchError(url, response.status,
+                                             response.reason or "")
+                        delay = self._retry_delay(attempt, response)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    if last_try:
+                        raise FetchError(url, message=repr(e)) from e
+                    delay = self._retry_delay(attempt)
+            await asyncio.sleep(delay)
+
+    async def fetch_text(self, url, params=None, encoding='utf-8'):
+        return (await self.fetch(url, params)).decode(encoding)
+
+    async def fetch_json(self, url, params=None):
+        return json.loads(await self.fetch(url, params))
+
+    async def fetch_many(self, urls, return_exceptions=False):
+        """Fetch every URL concurrently and return the bodies in order.
+
+        With return_exceptions=True, failed URLs give their FetchError
+        instead of stopping the rest.
+        """
+        return await asyncio.gather(*(self.fetch(url) for url in urls),
+                                    return_exceptions=return_exceptions)
+
+
+def fetch_all(urls, return_exceptions=False, **client_args):
+    """Blocking helper: fetch urls with a new WeatherClient."""
+    async def run():
+        async with WeatherClient(**client_args) as client:
+            return await client.fetch_many(urls, return_exceptions)
+    return asyncio.run(run())
+
+
+if __name__ == '__main__':
+    url = archive_url(41.879, -87.64975, "2024-07-01", "2024-07-31")
+    start = time.perf_counter()
+    history = json.loads(fetch_all([url])[0])
+    print(f"fetched in {time.perf_counter() - start:.2f} s")
+    print(list(zip(history["daily"]["time"],
+                   history["daily"]["temperature_2m_mean"]))[:5])
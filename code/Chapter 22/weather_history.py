@@ -0,0 +1,181 @@
+"""weather_history module: contains fetch_history and write_csv.
+
+Lab 22 fetches one hard-coded month of open-meteo history in one request.
+fetch_history() takes any date range and any number of locations, splits
+them into one tile per location and calendar year, and fetches the tiles
+concurrently through a WeatherClient. Each tile is saved in a local store
+with the span of dates it covers, so a later call only requests the days a
+tile is still missing. Re-running a daily update fetches just the new days.
+
+    history = fetch_history([(41.879, -87.64975)], "1990-01-01", "2024-07-31")
+    write_csv(history, "weather_history.csv")
+"""
+
+import asyncio
+import csv
+import json
+import os
+from datetime import date, timedelta
+
+from weather_client import ARCHIVE_API, WeatherClient, archive_url
+
+ONE_DAY = timedelta(days=1)
+
+
+def year_tiles(start, end):
+    """Split start..end (dates, inclusive) into (start, end) pairs that
+    don't cross a calendar year."""
+    tiles = []
+    for year in range(start.year, end.year + 1):
+        tiles.append((max(start, date(year, 1, 1)),
+                      min(end, date(year, 12, 31))))
+    return tiles
+
+
+class TileStore:
+    """Local store of fetched tiles: one JSON file per location, variable
+    and year, recording the contiguous span of days it holds."""
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, location, variable, year):
+        latitude, longitude = location
+        return os.path.join(self.directory, f"{latitude}_{longitude}",
+                            variable, f"{year}.json")
+
+    def load(self, location, variable, year):
+        """Return the stored tile dict, or None if nothing is stored."""
+        try:
+            with open(self._path(location, variable, year)) as tile_file:
+                return json.load(tile_file)
+        except FileNotFoundError:
+            return None
+
+    def save(self, location, variable, year, tile):
+        path = self._path(location, variable, year)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", 'w') as tile_file:
+            json.dump(tile, tile_file)
+        os.replace(path + ".tmp", path)
+
+
+def missing_spans(start, end, tile):
+    """Return the (start, end) spans of start..end that tile doesn't
+    cover; the stored span is always kept contiguous."""
+    if tile is None:
+        return [(start, end)]
+    have_start = date.fromisoformat(tile['start'])
+    have_end = date.fromisoformat(tile['end'])
+    spans = []
+    if start < have_start:
+        spans.append((start, have_start - ONE_DAY))
+    if end > have_end:
+        spans.append((have_end + ONE_DAY, end))
+    return spans
+
+
+def merge_tile(tile, fetched, variable):
+    """Merge one archive API response into a stored tile.
+
+    Trailing missing values (days the archive hasn't published yet) aren't
+    counted as covered, so they're requested again next time.
+    """
+    times = fetched['daily']['time']
+    values = fetched['daily'][variable]
+    while values and values[-1] is None:
+        times, values = times[:-1], values[:-1]
+    if not times:
+        return tile
+    series = dict(zip(tile['time'], tile['values'])) if tile else {}
+    series.update(zip(times, values))
+    ordered = sorted(series)
+    return {'start': min(ordered[0], tile['start']) if tile else ordered[0],
+            'end': max(ordered[-1], tile['end']) if tile else ordered[-1],
+            'time': ordered,
+            'values': [series[day] for day in ordered]}
+
+
+async def _fetch_history(client, store, locations, start, end, variable,
+                         base):
+    requests = []
+    tiles = {}
+    for location in locations:
+        for tile_start, tile_end in year_tiles(start, end):
+            key = (location, tile_start.year)
+            tiles[key] = store.load(location, variable, tile_start.year)
+            for span_start, span_end in missing_spans(tile_start, tile_end,
+                                                      tiles[key]):
+                url = archive_url(location[0], location[1],
+                                  span_start.isoformat(), span_end.isoformat(),
+                                  daily=variable, base=base)
+                requests.append((key, url))
+
+    responses = await asyncio.gather(*(client.fetch_json(url)
+                                       for _, url in requests))
+    changed = set()
+    for (key, _), response in zip(requests, responses):
+        tiles[key] = merge_tile(tiles[key], response, variable)
+        changed.add(key)
+    for key in changed:
+        if tiles[key] is not None:
+            store.save(key[0], variable, key[1], tiles[key])
+
+    rows = []
+    first, last = start.isoformat(), end.isoformat()
+    for (location, _), tile in tiles.items():
+        if tile is None:
+            continue
+        for day, value in zip(tile['time'], tile['values']):
+            if first <= day <= last:
+                rows.append((day, location, value))
+    rows.sort()
+    return {'time': [row[0] for row in rows],
+            'latitude': [row[1][0] for row in rows],
+            'longitude': [row[1][1] for row in rows],
+            variable: [row[2] for row in rows]}
+
+
+def fetch_history(locations, start_date, end_date,
+                  variable="temperature_2m_mean", store_dir="weather_history",
+                  base=ARCHIVE_API, **client_args):
+    """Fetch daily history for several locations over any date range.
+
+    Args:
+        locations: Iterable of (latitude, longitude) pairs.
+        start_date, end_date: Inclusive range, as dates or ISO strings.
+        variable: The open-meteo daily variable to fetch.
+        store_dir: Directory of the local tile store.
+        base: Archive API URL (e.g. a local stand-in server for testing).
+        client_args: Passed on to WeatherClient, e.g. concurrency.
+
+    Returns:
+        A dict of columns ('time', 'latitude', 'longitude' and variable),
+        sorted by time and then by location.
+    """
+    if isinstance(start_date, str):
+        start_date = date.fromisoformat(start_date)
+    if isinstance(end_date, str):
+        end_date = date.fromisoformat(end_date)
+    client_args.setdefault('cache_dir', None)
+    store = TileStore(store_dir)
+
+    async def run():
+        async with WeatherClient(**client_args) as client:
+            return await _fetch_history(client, store, list(locations),
+                                        start_date, end_date, variable, base)
+    return asyncio.run(run())
+
+
+def write_csv(history, path):
+    """Write the columns returned by fetch_history to a CSV file."""
+    names = list(history)
+    with open(path, 'w', newline='') as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(names)
+        writer.writerows(zip(*(history[name] for name in names)))
+
+
+if __name__ == '__main__':
+    history = fetch_history([(41.879, -87.64975)], "2024-07-01", "2024-07-31")
+    write_csv(history, "weather_history.csv")
+    print(len(history['time']), "days written to weather_history.csv")
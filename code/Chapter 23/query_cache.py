@@ -0,0 +1,289 @@
+"""query_cache module: contains the QueryCache and LocalCache classes.
+
+Section 23.6 shows Redis's set/get/setex, and the case study runs queries
+like
+
+    select * from weather where element='TMAX' order by year, month
+
+against SQLite every time they're needed. A QueryCache sits in front of a
+SQLite connection and keeps each query's result set, as JSON, under a key
+made from the normalized SQL and its parameters, with a time to live.
+query_many() reads the current generation (see below), looks up all its
+keys with one MGET and stores any misses in one pipeline, so a page of
+queries costs two or three round trips to the cache rather than one per
+query.
+
+The backend is anything with the few Redis methods used here (get, mget,
+set with ex=, incr and pipeline): a redis.Redis client, a
+fakeredis.FakeRedis for tests, or the in-process LocalCache below.
+
+Results are stored as JSON rather than pickles: anyone who can write to a
+shared Redis server could otherwise run code in every process reading
+from it. SQLite values (None, int, float, str and bytes) all round-trip.
+
+Every key includes a generation number kept in the backend. Reloading
+the data bumps it (invalidate()), so every older entry is ignored at once
+and left to expire, without scanning for keys.
+"""
+
+import base64
+import hashlib
+import json
+import re
+import sqlite3
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+
+DEFAULT_TTL = 300
+
+# SQL string literals and quoted identifiers, which normalizing must keep.
+_QUOTED = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")""")
+
+
+class _LocalPipeline:
+    """Queues commands for a LocalCache and runs them on execute()."""
+    def __init__(self, cache):
+        self._cache = cache
+        self._commands = []
+
+    def __getattr__(self, name):
+        method = getattr(self._cache, name)
+
+        def queue(*args, **kwargs):
+            self._commands.append((method, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        results = [method(*args, **kwargs)
+                   for method, args, kwargs in self._commands]
+        self._commands = []
+        return results
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._commands = []
+
+
+class LocalCache:
+    """In-process LRU cache with the Redis methods QueryCache uses.
+
+    Values are kept as bytes, as Redis returns them. Once maxsize keys
+    with a time to live are stored, the least recently used one is
+    dropped. Like Redis's volatile-lru policy, keys set without one (such
+    as QueryCache's generation counter) are never evicted.
+    """
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()      # key -> (value, expiry time)
+        self._persistent = {}
+
+    def _live(self, key):
+        if key in self._persistent:
+            return self._persistent[key]
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires = item
+        if time.monotonic() >= expires:
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def get(self, key):
+        return self._live(key)
+
+    def mget(self, keys, *args):
+        if isinstance(keys, str):
+            keys = [keys, *args]
+        return [self._live(key) for key in keys]
+
+    def set(self, key, value, ex=None):
+        if isinstance(value, str):
+            value = value.encode()
+        elif isinstance(value, (int, float)):
+            value = str(value).encode()
+        self.delete(key)
+        if not ex:
+            self._persistent[key] = value
+            return True
+        self._data[key] = (value, time.monotonic() + ex)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+        return True
+
+    def incr(self, key, amount=1):
+        value = int(self._live(key) or 0) + amount
+        if key in self._data:
+            self._data[key] = (str(value).encode(), self._data[key][1])
+        else:
+            self._persistent[key] = str(value).encode()
+        return value
+
+    def delete(self, *keys):
+        return sum((self._data.pop(key, None) is not None)
+                   + (self._persistent.pop(key, None) is not None)
+                   for key in keys)
+
+    def pipeline(self, transaction=True):
+        return _LocalPipeline(self)
+
+
+def make_backend(url=None, maxsize=1024):
+    """Return a cache backend for url.
+
+    None gives a LocalCache, "fakeredis" an in-memory fakeredis server,
+    and a redis:// URL a client for that Redis server.
+    """
+    if url is None:
+        return LocalCache(maxsize)
+    if url == "fakeredis":
+        import fakeredis
+        return fakeredis.FakeRedis()
+    import redis
+    return redis.Redis.from_url(url)
+
+
+def normalize_query(sql):
+    """Return sql with whitespace collapsed and keywords lowercased,
+    leaving quoted strings untouched, so equivalent queries share a key."""
+    parts = _QUOTED.split(sql.strip().rstrip(';').strip())
+    # split() puts the quoted parts at the odd indexes.
+    return "".join(part if index % 2 else re.sub(r"\s+", " ", part).lower()
+                   for index, part in enumerate(parts))
+
+
+def _tagged(params):
+    """Return params as JSON-encodable [type name, repr] pairs, with the
+    names first for named parameters, so values that print the same
+    (b'x' and "b'x'", 1 and '1') still differ."""
+    if isinstance(params, Mapping):
+        return ['named', [[name, type(value).__name__, repr(value)]
+                          for name, value in sorted(params.items())]]
+    return [[type(param).__name__, repr(param)] for param in params]
+
+
+def _encode_value(value):
+    if isinstance(value, bytes):
+        return {'$bytes': base64.b64encode(value).decode('ascii')}
+    raise TypeError(f"can't cache a {type(value).__name__} value")
+
+
+def _decode_value(obj):
+    if obj.keys() == {'$bytes'}:
+        return base64.b64decode(obj['$bytes'])
+    return obj
+
+
+def encode_rows(rows):
+    """Return query result rows as JSON bytes for the cache."""
+    return json.dumps(rows, default=_encode_value,
+                      separators=(',', ':')).encode()
+
+
+def decode_rows(data):
+    """Return the rows stored by encode_rows(), as a list of tuples."""
+    return [tuple(row) for row in json.loads(data,
+                                             object_hook=_decode_value)]
+
+
+class QueryCache:
+    """Cache of SQLite query results with a time to live.
+
+    Args:
+        db: A sqlite3 connection, or the path of a database file.
+        backend: A Redis-compatible client (see make_backend); by
+            default a new LocalCache.
+        ttl: Seconds each result is kept.
+        namespace: Prefix for every key, so several databases can share
+            one Redis server.
+    """
+    def __init__(self, db, backend=None, ttl=DEFAULT_TTL, namespace="weather"):
+        self.conn = sqlite3.connect(db) if isinstance(db, str) else db
+        self.backend = backend if backend is not None else LocalCache()
+        self.ttl = ttl
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+
+    def _generation(self):
+        return int(self.backend.get(f"{self.namespace}:generation") or 0)
+
+    def key(self, sql, params=(), generation=None):
+        """Return the cache key for a query and its parameters."""
+        if generation is None:
+            generation = self._generation()
+        text = json.dumps([normalize_query(sql), _tagged(params)])
+        digest = hashlib.sha1(text.encode()).hexdigest()
+        return f"{self.namespace}:{generation}:{digest}"
+
+    def query(self, sql, params=()):
+        """Return the rows of a query, from the cache if possible."""
+        return self.query_many([(sql, params)])[0]
+
+    def query_many(self, queries):
+        """Return the rows of several queries, given as (sql, params)
+        pairs, fetching cached results with one MGET. params is a
+        sequence for ? placeholders or a mapping for named ones."""
+        queries = [(sql, dict(params) if isinstance(params, Mapping)
+                    else tuple(params)) for sql, params in queries]
+        generation = self._generation()
+        keys = [self.key(sql, params, generation) for sql, params in queries]
+        cached = self.backend.mget(keys) if keys else []
+        results = []
+        misses = {}
+        for key, (sql, params), value in zip(keys, queries, cached):
+            if value is not None:
+                self.hits += 1
+                results.append(decode_rows(value))
+            elif key in misses:
+                results.append(misses[key])
+            else:
+                self.misses += 1
+                rows = self.conn.execute(sql, params).fetchall()
+                misses[key] = rows
+                results.append(rows)
+        if misses:
+            pipe = self.backend.pipeline()
+            for key, rows in misses.items():
+                pipe.set(key, encode_rows(rows), ex=self.ttl)
+            pipe.execute()
+        return results
+
+    def invalidate(self):
+        """Make every cached result stale, e.g. after reloading the data."""
+        self.backend.incr(f"{self.namespace}:generation")
+
+    def executemany(self, sql, rows):
+        """Run a write statement for each of rows, commit, and invalidate
+        the cache."""
+        with self.conn:
+            self.conn.executemany(sql, rows)
+        self.invalidate()
+
+
+if __name__ == '__main__':
+    import random
+
+    conn = sqlite3.connect(":memory:")
+    conn.execute("""CREATE TABLE weather (id text, year integer,
+                    month integer, element text, max real, min real,
+                    mean real, count integer)""")
+    cache = QueryCache(conn, make_backend())
+    cache.executemany("insert into weather values (?,?,?,?,?,?,?,?)",
+                      [("USC00110338", year, month, element,
+                        random.uniform(0, 400), random.uniform(-300, 0),
+                        random.uniform(-100, 300), 30)
+                       for year in range(1893, 2025) for month in range(1, 13)
+                       for element in ("TMAX", "TMIN", "PRCP", "SNOW")])
+    query = "select * from weather where element='TMAX' order by year, month"
+    for attempt in ("cold", "warm"):
+        start = time.perf_counter()
+        rows = cache.query(query)
+        print(f"{attempt}: {len(rows)} rows in "
+              f"{(time.perf_counter() - start) * 1000:.2f} ms")
+    print(f"{cache.hits} hits, {cache.misses} misses")
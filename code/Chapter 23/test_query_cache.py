@@ -0,0 +1,74 @@
+"""Tests for query_cache, using the in-process LocalCache backend.
+
+Run with: python -m unittest test_query_cache
+"""
+
+import sqlite3
+import unittest
+
+from query_cache import LocalCache, QueryCache, decode_rows, encode_rows
+
+
+class QueryCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.execute("create table w (e text, v real, raw blob)")
+        self.conn.executemany("insert into w values (?, ?, ?)",
+                              [("TMAX", 31.5, b"\x00\xff"),
+                               ("TMIN", -4.25, None)])
+        self.backend = LocalCache()
+        self.cache = QueryCache(self.conn, self.backend)
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_named_parameters_return_the_right_rows(self):
+        sql = "select v from w where e = :e"
+        self.assertEqual(self.cache.query(sql, {"e": "TMAX"}), [(31.5,)])
+        self.assertEqual(self.cache.query(sql, {"e": "TMIN"}), [(-4.25,)])
+        # Served from the cache the second time, still per value.
+        self.assertEqual(self.cache.query(sql, {"e": "TMAX"}), [(31.5,)])
+        self.assertEqual(self.cache.query(sql, {"e": "TMIN"}), [(-4.25,)])
+        self.assertEqual((self.cache.hits, self.cache.misses), (2, 2))
+
+    def test_named_parameter_keys(self):
+        sql = "select v from w where e = :e"
+        key = self.cache.key
+        self.assertNotEqual(key(sql, {"e": "TMAX"}), key(sql, {"e": "TMIN"}))
+        self.assertEqual(key(sql, {"a": 1, "b": 2}),
+                         key(sql, {"b": 2, "a": 1}))
+        self.assertNotEqual(key(sql, {"e": "TMAX"}), key(sql, ["TMAX"]))
+
+    def test_keys_tell_parameter_types_apart(self):
+        sql = "select ?"
+        keys = {self.cache.key(sql, [param])
+                for param in (b"x", "b'x'", 1, "1", 1.0, None, "None")}
+        self.assertEqual(len(keys), 7)
+
+    def test_cached_rows_round_trip(self):
+        sql = "select e, v, raw from w order by e"
+        first = self.cache.query(sql)
+        second = self.cache.query(sql)
+        self.assertEqual(first, second)
+        self.assertEqual(second[0], ("TMAX", 31.5, b"\x00\xff"))
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_cache_holds_json_not_pickles(self):
+        self.cache.query("select e, raw from w")
+        (value,) = [value for key, (value, _) in self.backend._data.items()]
+        self.assertTrue(value.startswith(b"[["))
+        self.assertEqual(decode_rows(value),
+                         [("TMAX", b"\x00\xff"), ("TMIN", None)])
+        self.assertEqual(decode_rows(encode_rows([(2 ** 62, "$bytes")])),
+                         [(2 ** 62, "$bytes")])
+
+    def test_invalidate_after_write(self):
+        sql = "select count(*) from w"
+        self.assertEqual(self.cache.query(sql), [(2,)])
+        self.cache.executemany("insert into w values (?, ?, ?)",
+                               [("PRCP", 0.0, None)])
+        self.assertEqual(self.cache.query(sql), [(3,)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,171 @@
+"""weather_db module: contains the People and Weather models, make_engine
+and bulk_insert.
+
+Section 23.4 adds rows through the ORM session one object at a time, so
+each row becomes its own INSERT when the session flushes. bulk_insert()
+sends rows in batches instead, through whichever path fits the caller:
+
+    with engine.begin() as conn:                # Core: executemany
+        bulk_insert(conn, weather, rows)
+    with Session(engine) as session:            # ORM bulk INSERT
+        bulk_insert(session, Weather, rows)
+        session.commit()
+
+With return_ids=True the batches are sent as INSERT ... RETURNING, which
+SQLAlchemy groups into multi-row statements ("insertmanyvalues") and which
+returns the new primary keys. make_engine() sets up a SQLite engine whose
+connection pool and journal mode let several threads read while one
+writes.
+"""
+
+import csv
+from itertools import batched
+
+from sqlalchemy import (Column, Float, Integer, String, create_engine, event,
+                        insert)
+from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import StaticPool
+
+# Rows per execute() call; a batch is held in memory as a list of dicts.
+BATCH_ROWS = 5000
+# Rows per multi-row INSERT ... VALUES when returning ids.
+INSERTMANYVALUES_PAGE_SIZE = 1000
+
+Base = declarative_base()
+
+
+class People(Base):
+    __tablename__ = "people"
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+    count = Column(Integer)
+
+
+class Weather(Base):
+    """One row of the Illinois weather file (section 21.2)."""
+    __tablename__ = "illinois_weather"
+    id = Column(Integer, primary_key=True)
+    month = Column(String)
+    month_code = Column(Integer)
+    county = Column(String)
+    county_code = Column(Integer)
+    avg_max_temp = Column(Float)
+    max_temp_count = Column(Integer)
+    max_temp_low = Column(Float)
+    max_temp_high = Column(Float)
+    avg_min_temp = Column(Float)
+    min_temp_count = Column(Integer)
+    min_temp_low = Column(Float)
+    min_temp_high = Column(Float)
+    heat_index = Column(Float)
+    heat_index_count = Column(Integer)
+    heat_index_low = Column(Float)
+    heat_index_high = Column(Float)
+    heat_index_coverage = Column(Float)
+
+
+people = People.__table__
+weather = Weather.__table__
+WEATHER_COLUMNS = [column.name for column in weather.columns
+                   if column.name != 'id']
+
+
+def make_engine(db_path, pool_size=5, max_overflow=10, echo=False):
+    """Return an engine for the SQLite database file db_path.
+
+    The pool keeps up to pool_size connections open (plus max_overflow
+    more under load), and connections may be used from any thread. Each
+    connection is switched to WAL journaling, so readers in other threads
+    aren't blocked while a bulk load is writing.
+
+    An in-memory database (":memory:" or "") exists only as long as its
+    connection, so it gets a single shared connection instead of a pool,
+    and pool_size and max_overflow are ignored.
+    """
+    if db_path in (":memory:", ""):
+        pool_args = {'poolclass': StaticPool}
+    else:
+        pool_args = {'pool_size': pool_size, 'max_overflow': max_overflow}
+    engine = create_engine(f"sqlite:///{db_path}", echo=echo, **pool_args,
+                           insertmanyvalues_page_size=INSERTMANYVALUES_PAGE_SIZE,
+                           connect_args={'check_same_thread': False,
+                                         'timeout': 30})
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+    return engine
+
+
+def bulk_insert(target, table, rows, batch_size=BATCH_ROWS, return_ids=False):
+    """Insert rows in batches, without building ORM objects.
+
+    Args:
+        target: A Connection (Core executemany) or a Session (ORM bulk
+            INSERT). The caller commits.
+        table: A Table, or a mapped class such as Weather.
+        rows: Any iterable of dicts keyed by column name; it's consumed
+            one batch at a time.
+        batch_size: Rows per execute() call.
+        return_ids: If True, use INSERT ... RETURNING and return the new
+            primary keys.
+
+    Returns:
+        The number of rows inserted, or the list of new ids if return_ids.
+    """
+    statement = insert(table)
+    if return_ids:
+        statement = statement.returning(*statement.table.primary_key.columns)
+    count = 0
+    ids = []
+    for batch in batched(rows, batch_size):
+        result = target.execute(statement, list(batch))
+        if return_ids:
+            ids.extend(result.scalars())
+        count += len(batch)
+    return ids if return_ids else count
+
+
+def _number(text, convert):
+    if text == 'Missing' or text == '':
+        return None
+    if text.endswith('%'):
+        return float(text[:-1]) / 100
+    return convert(text)
+
+
+def read_weather_rows(path="../Chapter 21/Illinois_weather_1979-2011.txt"):
+    """Yield the rows of the Illinois weather file as dicts for Weather.
+
+    The Notes column and the notes after the '---' line are skipped,
+    'Missing' becomes None and the coverage percentage becomes a fraction.
+    """
+    converters = [str, int, str, int] + [float, int, float, float] * 3
+    converters.append(float)
+    with open(path, newline='') as infile:
+        reader = csv.reader(infile, delimiter='\t')
+        next(reader)
+        for fields in reader:
+            if fields and fields[0] == '---':
+                break
+            values = fields[1:]
+            yield {name: (value if convert is str
+                          else _number(value, convert))
+                   for name, value, convert in zip(WEATHER_COLUMNS, values,
+                                                   converters)}
+
+
+if __name__ == '__main__':
+    from sqlalchemy import func, select
+
+    engine = make_engine("weather_bulk.db")
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        print(bulk_insert(conn, weather, read_weather_rows()), "rows loaded")
+        print(conn.execute(select(Weather.county, func.avg(Weather.avg_max_temp))
+                           .group_by(Weather.county).limit(3)).all())
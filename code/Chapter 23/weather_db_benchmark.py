@@ -0,0 +1,102 @@
+"""
+Bulk load benchmark: loading the Illinois weather file into SQLite
+
+Loads the same rows through each path SQLAlchemy offers, from one ORM
+object per row up to Core executemany, and reports rows per second. The
+file has about 1,200 rows, so its rows are repeated to make a bigger load.
+
+Run with: python weather_db_benchmark.py [copies]
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from sqlalchemy.orm import Session
+
+from weather_db import (WEATHER_COLUMNS, Base, Weather, bulk_insert,
+                        make_engine, read_weather_rows, weather)
+
+
+def benchmark(func, rows, runs=3):
+    """Load rows into a fresh database runs times; return the best time."""
+    times = []
+    for i in range(runs):
+        with tempfile.TemporaryDirectory() as directory:
+            engine = make_engine(os.path.join(directory, "weather.db"))
+            Base.metadata.create_all(engine)
+            start = time.perf_counter()
+            func(engine, rows)
+            times.append(time.perf_counter() - start)
+            engine.dispose()
+    return min(times)
+
+
+def orm_add(engine, rows):
+    """Section 23.4 style: one object and session.add() per row."""
+    with Session(engine) as session:
+        for row in rows:
+            session.add(Weather(**row))
+        session.commit()
+
+
+def orm_add_all(engine, rows):
+    """All objects added at once; the flush batches the INSERTs."""
+    with Session(engine) as session:
+        session.add_all([Weather(**row) for row in rows])
+        session.commit()
+
+
+def orm_bulk(engine, rows):
+    """session.execute(insert(Weather), rows): ORM bulk INSERT."""
+    with Session(engine) as session:
+        bulk_insert(session, Weather, rows)
+        session.commit()
+
+
+def core_returning(engine, rows):
+    """Core INSERT ... RETURNING, batched by insertmanyvalues."""
+    with engine.begin() as conn:
+        bulk_insert(conn, weather, rows, return_ids=True)
+
+
+def core_executemany(engine, rows):
+    """Core insert() with executemany, no ids returned."""
+    with engine.begin() as conn:
+        bulk_insert(conn, weather, rows)
+
+
+def sqlite3_executemany(engine, rows):
+    """Plain sqlite3 executemany, as a baseline without SQLAlchemy."""
+    conn = sqlite3.connect(engine.url.database)
+    placeholders = ", ".join("?" * len(WEATHER_COLUMNS))
+    with conn:
+        conn.executemany(f"INSERT INTO illinois_weather "
+                         f"({', '.join(WEATHER_COLUMNS)}) "
+                         f"VALUES ({placeholders})",
+                         [tuple(row.values()) for row in rows])
+    conn.close()
+
+
+PATHS = [orm_add, orm_add_all, orm_bulk, core_returning, core_executemany,
+         sqlite3_executemany]
+
+
+def main():
+    copies = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    rows = list(read_weather_rows()) * copies
+    print(f"Loading {len(rows):,} rows ({copies} copies of the file)\n")
+    print(f"  {'Path':22} | {'Seconds':>8} | {'Rows/s':>10} | Speedup")
+    print("  " + "-" * 55)
+    baseline = None
+    for path in PATHS:
+        seconds = benchmark(path, rows)
+        baseline = baseline or seconds
+        print(f"  {path.__name__:22} | {seconds:8.3f} | "
+              f"{len(rows) / seconds:10,.0f} | {baseline / seconds:6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
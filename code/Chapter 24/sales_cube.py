@@ -0,0 +1,140 @@
+"""sales_cube module: contains the SalesCube class.
+
+Section 24.4 merges sales_calls.csv and sales_revenue.csv with pd.merge()
+and then groups the merged frame by Month, by Territory, and by Team
+member and Month, each groupby() scanning every row again. A SalesCube
+joins the two on a sorted (Territory, Month) index once, sums Calls and
+Amount at the finest grain (Team member, Territory, Month) in a single
+grouped pass, and derives every coarser rollup from that small base
+table, as SQL's GROUP BY CUBE does. Rollups are cached, so asking for one
+again is a lookup:
+
+    cube = SalesCube.from_csv('sales_calls.csv', 'sales_revenue.csv')
+    cube.rollup('Month')
+    cube.rollup('Team member', 'Month')
+
+append() adds the rows for new months and updates the base table and
+every cached rollup with sums of only the new rows.
+"""
+
+import pandas as pd
+
+KEYS = ('Team member', 'Territory', 'Month')
+JOIN_KEYS = ['Territory', 'Month']
+MEASURES = ['Calls', 'Amount']
+# Rollups computed up front; others are computed when first asked for.
+ROLLUPS = [('Month',), ('Territory',), ('Team member',),
+           ('Team member', 'Month'), ('Territory', 'Month')]
+
+
+class SalesCube:
+    """Calls and revenue joined once, with cached sums at every grouping.
+
+    Args:
+        calls: DataFrame with Team member, Territory, Month and Calls.
+        revenue: DataFrame with Territory, Month and Amount.
+        rollups: Groupings to compute up front (default: ROLLUPS).
+    """
+    def __init__(self, calls, revenue, rollups=ROLLUPS):
+        self._revenue = self._index_revenue(revenue)
+        self.data = self._join(calls)
+        self._base = self._group(self.data)
+        self._rollups = {}
+        for keys in rollups:
+            self.rollup(*keys)
+
+    @classmethod
+    def from_csv(cls, calls_path, revenue_path, **kwargs):
+        return cls(pd.read_csv(calls_path), pd.read_csv(revenue_path),
+                   **kwargs)
+
+    @staticmethod
+    def _index_revenue(revenue):
+        revenue = revenue.set_index(JOIN_KEYS).sort_index()
+        if not revenue.index.is_unique:
+            raise ValueError("revenue has more than one row for a "
+                             "Territory and Month")
+        return revenue[['Amount']]
+
+    def _join(self, calls):
+        """Inner join calls to the revenue index, like pd.merge(on=...)."""
+        return (calls.join(self._revenue, on=JOIN_KEYS, how='inner')
+                .set_index(list(KEYS)).sort_index())
+
+    @staticmethod
+    def _group(data):
+        return data[MEASURES].groupby(level=list(KEYS)).sum()
+
+    @staticmethod
+    def _with_ratio(sums):
+        sums = sums.copy()
+        sums['Call_Amount'] = sums.Amount / sums.Calls
+        return sums
+
+    def rollup(self, *keys):
+        """Return the sums of Calls and Amount grouped by keys, plus the
+        amount per call. With no keys, return the grand totals as a
+        Series.
+
+        Raises:
+            KeyError: If a key isn't one of KEYS.
+        """
+        if not keys:
+            totals = self._base.sum().to_frame('Total').T
+            return self._with_ratio(totals).iloc[0]
+        unknown = set(keys) - set(KEYS)
+        if unknown:
+            raise KeyError(f"unknown grouping {sorted(unknown)}")
+        if keys not in self._rollups:
+            self._rollups[keys] = self._base.groupby(level=list(keys)).sum()
+        return self._with_ratio(self._rollups[keys])
+
+    def __getitem__(self, keys):
+        if isinstance(keys, str):
+            keys = (keys,)
+        return self.rollup(*keys)
+
+    def append(self, calls, revenue=None):
+        """Add rows for new months, updating the cached rollups with sums
+        of only the new rows.
+
+        Args:
+            calls: New rows in the sales_calls.csv layout.
+            revenue: New rows in the sales_revenue.csv layout, if the
+                months' revenue isn't in the cube already.
+
+        Raises:
+            ValueError: If revenue repeats a Territory and Month already
+                in the cube.
+        """
+        if revenue is not None:
+            self._revenue = self._index_revenue(
+                pd.concat([self._revenue.reset_index(), revenue]))
+        new = self._join(calls)
+        new_base = self._group(new)
+        self.data = pd.concat([self.data, new]).sort_index()
+        self._base = self._merge_sums(self._base, new_base)
+        for keys, sums in self._rollups.items():
+            self._rollups[keys] = self._merge_sums(
+                sums, new_base.groupby(level=list(keys)).sum())
+
+    @staticmethod
+    def _merge_sums(old, new):
+        """Add two grouped sums, keys in either, keeping integer dtypes."""
+        return pd.concat([old, new]).groupby(level=old.index.names).sum()
+
+
+if __name__ == '__main__':
+    cube = SalesCube.from_csv('sales_calls.csv', 'sales_revenue.csv')
+    print(cube['Month'])
+    print(cube['Territory'])
+    print(cube['Team member', 'Month'])
+
+    months = pd.DataFrame({'Month': [5, 5, 5], 'Territory': [1, 2, 3],
+                           'Team member': ['Ana', 'Ali', 'Jorge'],
+                           'Calls': [110, 95, 101]})
+    cube.append(months, pd.DataFrame({'Territory': [1, 2, 3],
+                                      'Month': [5, 5, 5],
+                                      'Amount': [60210, 48830, 51004]}))
+    print(cube['Month'])
+    print(cube.rollup())
@@ -0,0 +1,181 @@
+"""weather_frame module: contains load_weather_frame and memory_usage.
+
+Section 24.3.2 reads temp_data_01.csv with default dtypes, then strips the
+'%' from the coverage column, calls pd.to_numeric() and divides by 100, each
+a separate pass that copies the column and leaves object columns on the
+way. load_weather_frame() gives every column a compact dtype as it's read:
+
+    Notes, State                   category
+    State Code                     UInt8 (nullable)
+    Month Day, Year Code           datetime64[us], parsed with DATE_FORMAT
+    temperatures, heat indexes     float32, with 'Missing' as NaN
+    record counts                  UInt32 (nullable)
+    % Coverage                     float32 fraction (0.35 for '35.00%')
+
+The "Month Day, Year" text column repeats the date, so it isn't read unless
+asked for with usecols. With the C engine the file is read chunksize rows
+at a time, so a large export never exists as a frame of Python strings;
+the pyarrow engine reads it in one multithreaded pass instead.
+
+    temp = load_weather_frame('temp_data_01.csv')
+"""
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+DATE_FORMAT = '%Y/%m/%d'
+NA_VALUES = ['Missing']
+CHUNKSIZE = 100_000
+
+# Compact dtypes by column name, as the names appear in the header row.
+# Columns not listed here get FLOAT_DTYPE, or PERCENT_DTYPE if their name
+# ends with '% Coverage'.
+FLOAT_DTYPE = 'float32'
+PERCENT_DTYPE = 'float32'
+# Counts of a single state's export already reach the tens of thousands,
+# and aggregated or multi-year ones pass UInt16's 65,535.
+COUNT_DTYPE = 'UInt32'
+# Both engines' dates are converted to this, so they give the same frame.
+DATE_DTYPE = 'datetime64[us]'
+DTYPES = {
+    'Notes': 'category',
+    'State': 'category',
+    'State Code': 'UInt8',
+    'Month Day, Year': 'category',
+}
+DATE_COLUMN = 'Month Day, Year Code'
+SKIPPED_COLUMNS = ('Month Day, Year',)
+
+
+def _percent(text):
+    """Converter for '35.11%' fields: return 0.3511, NaN if missing."""
+    text = text.strip().rstrip('%')
+    if not text or text in NA_VALUES:
+        return float('nan')
+    return float(text) / 100
+
+
+def _column_dtype(name):
+    if name in DTYPES:
+        return DTYPES[name]
+    if name.startswith('Record Count'):
+        return COUNT_DTYPE
+    return FLOAT_DTYPE
+
+
+def _schema(path, usecols):
+    """Return (usecols, dtype, converters) for the file's header row."""
+    header = pd.read_csv(path, nrows=0).columns
+    if usecols is None:
+        usecols = [name for name in header if name not in SKIPPED_COLUMNS]
+    else:
+        missing = set(usecols) - set(header)
+        if missing:
+            raise ValueError(f"columns not in {path}: {sorted(missing)}")
+        usecols = [name for name in header if name in usecols]
+    dtype, converters = {}, {}
+    for name in usecols:
+        if name.endswith('% Coverage'):
+            converters[name] = _percent
+        elif name != DATE_COLUMN:
+            dtype[name] = _column_dtype(name)
+    return usecols, dtype, converters
+
+
+def _concat(chunks):
+    """Concatenate chunks, merging their categories so categorical
+    columns stay categorical."""
+    if len(chunks) == 1:
+        return chunks[0]
+    categorical = [name for name, dtype in chunks[0].dtypes.items()
+                   if isinstance(dtype, pd.CategoricalDtype)]
+    merged = {name: union_categoricals([chunk[name] for chunk in chunks])
+              for name in categorical}
+    frame = pd.concat([chunk.drop(columns=categorical) for chunk in chunks],
+                      ignore_index=True)
+    for name, values in merged.items():
+        frame[name] = values
+    return frame[chunks[0].columns]
+
+
+def _normalize(frame):
+    """Give the columns whose dtype depends on the engine the same dtype
+    from both: the date column DATE_DTYPE, whatever unit it was parsed
+    with, and categorical columns with no values object categories."""
+    if DATE_COLUMN in frame:
+        frame[DATE_COLUMN] = frame[DATE_COLUMN].astype(DATE_DTYPE)
+    for name, dtype in frame.dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype) and not len(
+                dtype.categories):
+            frame[name] = frame[name].astype(
+                pd.CategoricalDtype(pd.Index([], dtype=object)))
+    return frame
+
+
+def load_weather_frame(path, usecols=None, chunksize=CHUNKSIZE, engine='c'):
+    """Read a weather export such as temp_data_01.csv with compact dtypes.
+
+    Args:
+        path: Path of the CSV file.
+        usecols: Column names to read (default: all but "Month Day, Year").
+        chunksize: Rows parsed at a time with the C engine.
+        engine: 'c', or 'pyarrow' to read the whole file at once with
+            pyarrow's multithreaded parser.
+
+    Returns:
+        A DataFrame, in file column order.
+
+    Raises:
+        ValueError: If usecols names a column the file doesn't have.
+    """
+    usecols, dtype, converters = _schema(path, usecols)
+    parse_dates = [DATE_COLUMN] if DATE_COLUMN in usecols else []
+    if engine == 'pyarrow':
+        # pyarrow doesn't take converters, so percentages are read as
+        # text and converted in one vectorized step.
+        text = {name: 'string' for name in converters}
+        frame = pd.read_csv(path, usecols=usecols, engine='pyarrow',
+                            na_values=NA_VALUES, dtype={**dtype, **text},
+                            parse_dates=parse_dates, date_format=DATE_FORMAT)
+        for name in converters:
+            frame[name] = (pd.to_numeric(frame[name].str.rstrip('%'))
+                           .div(100).astype(PERCENT_DTYPE))
+        return _normalize(frame)
+    reader = pd.read_csv(path, usecols=usecols, na_values=NA_VALUES,
+                         dtype=dtype, converters=converters,
+                         parse_dates=parse_dates, date_format=DATE_FORMAT,
+                         chunksize=chunksize)
+    chunks = []
+    with reader:
+        for chunk in reader:
+            for name in converters:
+                chunk[name] = chunk[name].astype(PERCENT_DTYPE)
+            chunks.append(chunk)
+    return _normalize(_concat(chunks))
+
+
+def memory_usage(frame):
+    """Return the bytes a DataFrame uses, counting the contents of object
+    columns."""
+    return int(frame.memory_usage(deep=True).sum())
+
+
+def memory_report(path, **kwargs):
+    """Load path with pandas' default dtypes and with load_weather_frame,
+    and print the memory each takes.
+
+    Returns:
+        (default bytes, compact bytes)
+    """
+    default = memory_usage(pd.read_csv(path))
+    compact = memory_usage(load_weather_frame(path, **kwargs))
+    print(f"{path}: default dtypes {default:,} bytes, "
+          f"compact dtypes {compact:,} bytes ({default / compact:.1f}x)")
+    return default, compact
+
+
+if __name__ == '__main__':
+    temp = load_weather_frame('temp_data_01.csv')
+    print(temp.dtypes)
+    print(temp)
+    memory_report('temp_data_01.csv')
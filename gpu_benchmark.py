@@ -9,39 +9,58 @@ Run with: python3.12 gpu_benchmark.py
 """
 
 import time
-import traceback
-import numpy as np
 
-# We'll import cudf conditionally to allow testing pandas-only too
-HAS_CUDF = False
-cudf = None
-cp = None
-
-try:
-    # Import cupy first and set device
-    import cupy as cp_module
-    cp_module.cuda.Device(0).use()
-
-    # Import cudf after CUDA is initialized
-    import cudf as cudf_module
-
-    # Test that it works
-    test_arr = cp_module.array([1, 2, 3])
-    test_df = cudf_module.DataFrame({'test': test_arr})
-    del test_arr, test_df
-
-    # Set globals
-    cp = cp_module
-    cudf = cudf_module
-    HAS_CUDF = True
-    print(f"GPU detected: {cp.cuda.runtime.getDeviceProperties(0)['name'].decode()}")
-except ImportError as e:
-    print(f"Warning: cuDF not available ({e}), running pandas-only benchmark")
-except Exception as e:
-    print(f"Warning: CUDA initialization failed: {e}")
-    traceback.print_exc()
-
-import pandas as pd
+# cuDF and CuPy are probed for, and CUDA initialized, the first time
+# they're needed (probe_gpu()), not at import, so importing this module
+# to reuse benchmark() or format_speedup() stays fast. Reading HAS_CUDF,
+# cudf or cp from outside the module runs the probe too (PEP 562).
+_GPU_NAMES = ('HAS_CUDF', 'cudf', 'cp')
+_probed = False
+
+
+def probe_gpu():
+    """Import CuPy and cuDF and initialize CUDA, once.
+
+    Returns:
+        True if cuDF is usable, False to run pandas only.
+    """
+    global HAS_CUDF, cudf, cp, _probed
+    if _probed:
+        return HAS_CUDF
+    _probed = True
+    HAS_CUDF, cudf, cp = False, None, None
+    try:
+        # Import cupy first and set device
+        import cupy as cp_module
+        cp_module.cuda.Device(0).use()
+
+        # Import cudf after CUDA is initialized
+        import cudf as cudf_module
+
+        # Test that it works
+        test_arr = cp_module.array([1, 2, 3])
+        test_df = cudf_module.DataFrame({'test': test_arr})
+        del test_arr, test_df
+
+        # Set globals
+        cp = cp_module
+        cudf = cudf_module
+        HAS_CUDF = True
+        print(f"GPU detected: {cp.cuda.runtime.getDeviceProperties(0)['name'].decode()}")
+    except ImportError as e:
+        print(f"Warning: cuDF not available ({e}), running pandas-only benchmark")
+    except Exception as e:
+        import traceback
+        print(f"Warning: CUDA initialization failed: {e}")
+        traceback.print_exc()
+    return HAS_CUDF
+
+
+def __getattr__(name):
+    if name in _GPU_NAMES:
+        probe_gpu()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def benchmark(func, name, runs=3):
@@ -75,6 +94,7 @@ def print_result(operation, pandas_time, cudf_time):
 
 
 def main():
+    probe_gpu()
     print("=" * 80)
     print("GPU Benchmark: pandas vs cuDF (RAPIDS)")
     print("=" * 80)
@@ -102,6 +122,7 @@ def main():
             print(f"  Skipping - not enough memory for {n:,} rows")
             break
         except Exception as e:
+            import traceback
             print(f"  Error: {e}")
             traceback.print_exc()
             break
@@ -109,6 +130,10 @@ def main():
 
 def run_benchmarks(n):
     """Run all benchmarks for a given data size."""
+    import numpy as np
+    import pandas as pd
+
+    probe_gpu()
 
     print(f"\n  {'Operation':40} | {'pandas':>10} | {'cuDF':>10} | Speedup")
     print("  " + "-" * 75)
@@ -0,0 +1,120 @@
+"""
+Import-time benchmark: startup cost of the project's packages
+
+Short-lived command-line runs pay for everything a package does at import.
+For each package or module below this reports:
+
+  - its cumulative import time from `python -X importtime` (the package
+    and everything it imports), and the slowest module it pulled in
+  - cold start: wall time of `python -c "import <module>"` less that of
+    `python -c "pass"`, the best of several runs
+
+and fails (exit status 1) if any import goes over the budget, so it can
+be used as a regression check.
+
+Run with: python import_benchmark.py [--budget MS] [--runs N]
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# (directory to import from, module to import)
+TARGETS = [
+    ("code/Chapter 18", "text_processor"),
+    ("code/Chapter 18", "mathproj"),
+    ("code/Chapter 19", "package_name"),
+    ("code/Chapter 11", "n2w"),
+    (".", "gpu_benchmark"),
+]
+# Cumulative -X importtime budget per target, in milliseconds.
+BUDGET_MS = 10.0
+
+_IMPORT_TIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_times(directory, module):
+    """Return [(module name, self µs, cumulative µs)] for module and every
+    module it imported, from python -X importtime, module last.
+
+    Raises:
+        ImportError: If importing module fails.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.join(ROOT, directory), capture_output=True, text=True)
+    if result.returncode:
+        raise ImportError(result.stderr.strip().splitlines()[-1])
+    entries = []
+    for line in result.stderr.splitlines():
+        match = _IMPORT_TIME.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((name, int(self_us), int(cumulative_us),
+                            len(indent)))
+    # A module's imports are listed just before it, indented further.
+    last = max(i for i, entry in enumerate(entries) if entry[0] == module)
+    depth = entries[last][3]
+    first = last
+    while first and entries[first - 1][3] > depth:
+        first -= 1
+    return [entry[:3] for entry in entries[first:last + 1]]
+
+
+def cold_start(directory, code, runs):
+    """Return the best wall time, in seconds, of running code in a new
+    interpreter."""
+    best = float("inf")
+    for i in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code],
+                       cwd=os.path.join(ROOT, directory),
+                       stdout=subprocess.DEVNULL, check=True)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--budget", type=float, default=BUDGET_MS,
+                        help="import time budget per target, in ms")
+    parser.add_argument("--runs", type=int, default=5,
+                        help="cold start runs to take the best of")
+    args = parser.parse_args()
+
+    baseline = cold_start(".", "pass", args.runs)
+    print(f"Interpreter start: {baseline * 1000:.1f} ms "
+          f"(budget {args.budget:.1f} ms per import)\n")
+    print(f"  {'Module':16} | {'Import':>9} | {'Cold start':>10} | "
+          f"{'Slowest dependency':32} | Status")
+    print("  " + "-" * 86)
+    failures = 0
+    for directory, module in TARGETS:
+        try:
+            times = import_times(directory, module)
+        except ImportError as e:
+            failures += 1
+            print(f"  {module:16} | import failed: {e}")
+            continue
+        cumulative_ms = times[-1][2] / 1000
+        if len(times) > 1:
+            name, self_us, _ = max(times[:-1], key=lambda entry: entry[1])
+            slowest = f"{name} ({self_us / 1000:.1f} ms)"
+        else:
+            slowest = "-"
+        extra = cold_start(directory, f"import {module}", args.runs) - baseline
+        over = cumulative_ms > args.budget
+        failures += over
+        print(f"  {module:16} | {cumulative_ms:6.1f} ms | "
+              f"{extra * 1000:7.1f} ms | {slowest[:32]:32} | "
+              f"{'OVER' if over else 'ok'}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())